@@ -0,0 +1,57 @@
+from fastapi import FastAPI, HTTPException, status
+from starlette.formparsers import MultiPartParser
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .config import settings
+
+# Boundaries and part headers around the largest allowed upload
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies over `max_bytes` with 413 before they are read.
+
+    A Content-Length over the limit is refused straight away. Chunked bodies
+    are counted as they stream in, and the read that crosses the limit raises
+    413 from inside the route's body parsing, so nothing past the limit is
+    ever buffered or spooled.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": "Request body too large"}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="Request body too large"
+                    )
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+
+def setup_body_limit(app: FastAPI):
+    app.add_middleware(BodySizeLimitMiddleware, max_bytes=settings.MAX_UPLOAD_MB * 1024 * 1024 + MULTIPART_OVERHEAD)
+    # Starlette holds each multipart file in memory up to this size before
+    # spooling it to disk (1 MB by default); keep it to one upload chunk
+    MultiPartParser.max_file_size = settings.UPLOAD_CHUNK_KB * 1024
@@ -6,12 +6,60 @@ import os
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./foodnova.db"
+    DB_ASYNC: bool = False  # Serve order, catalog and receipt routes through an async engine (aiosqlite/asyncpg)
+    DATABASE_READ_URL: str = ""  # Optional replica for reports, exports and catalog reads
+    READ_REPLICA_MAX_LAG_SECONDS: int = 30
+    READ_REPLICA_CHECK_SECONDS: int = 5  # How long a replica health check is trusted
+    READ_REPLICA_HEARTBEAT_SECONDS: int = 5
+    
+    # Connection pool (per worker: total connections = workers * (size + overflow))
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # 0 disables; PostgreSQL only
+    
+    # SQLite ("production" = WAL, tuned pragmas, one serialized writer connection per worker)
+    SQLITE_PROFILE: str = "default"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE_MB: int = 256
+    SQLITE_CACHE_SIZE_MB: int = 64
+    
+    # Observability
+    SERVER_TIMING_ENABLED: bool = True  # Server-Timing header with per-request DB statement count and time
+    N_PLUS_ONE_THRESHOLD: int = 10  # Warn when one statement shape runs more often than this in a request
+    METRICS_ENABLED: bool = True  # Prometheus text format at /metrics
+    METRICS_TOKEN: str = ""  # If set, scrapes must send `Authorization: Bearer <token>`
+    
+    # Startup
+    SKIP_SCHEMA_INIT: bool = False  # Don't create tables or run migrations on boot (run `python -m app.db.migrate` out of band)
     
     # JWT
     JWT_SECRET: str = "change_this_secret_in_production"
     JWT_ACCESS_EXPIRES_MIN: int = 30
     JWT_REFRESH_EXPIRES_DAYS: int = 7
     JWT_ALGORITHM: str = "HS256"
+    TOKEN_CACHE_SIZE: int = 10000  # Verified access tokens kept per worker (0 disables the cache)
+    USER_CACHE_SIZE: int = 10000  # User profiles (name, email, role, is_active) kept per worker
+    USER_CACHE_TTL_SECONDS: int = 60  # Bounds how long another worker's change to a user can go unseen
+    REFRESH_REVOCATION_SYNC_SECONDS: int = 5  # How often workers pull refresh tokens revoked elsewhere
+    REFRESH_TOKEN_PURGE_SECONDS: int = 3600  # How often expired refresh token rows are deleted (0 disables)
+    REFRESH_REUSE_GRACE_SECONDS: int = 10  # A just-rotated refresh token may be replayed this long (parallel refreshes)
+    
+    # Passwords
+    BCRYPT_ROUNDS: int = 12  # Existing hashes are upgraded to this cost on the next login
+    PASSWORD_HASH_WORKERS: int = 2  # Processes dedicated to bcrypt (per API worker)
+    PASSWORD_HASH_MAX_QUEUE: int = 32  # Jobs waiting for a hash process before logins get 503
+    
+    # Rate limits: "<requests>/<second|minute|hour>" per bucket, empty to disable one
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS_URL: str = ""  # Share buckets across workers (needs `redis`); per worker if empty
+    RATE_LIMIT_LOGIN_PER_IP: str = "60/minute"
+    RATE_LIMIT_LOGIN_PER_ACCOUNT: str = "20/minute"
+    RATE_LIMIT_REGISTER_PER_IP: str = "20/hour"
+    RATE_LIMIT_CHECKOUT_PER_ACCOUNT: str = "30/minute"
+    RATE_LIMIT_RECEIPT_PER_ACCOUNT: str = "20/minute"
     
     # Admin
     ADMIN_EMAIL: str = "admin@foodnova.com"
@@ -21,9 +69,41 @@ class Settings(BaseSettings):
     FRONTEND_ORIGIN: str = "*"
     
     # Uploads
-    UPLOAD_DRIVER: str = "local"
+    UPLOAD_DRIVER: str = "local"  # local (UPLOAD_DIR) or s3 (S3_* below, needs boto3)
     UPLOAD_DIR: str = "./uploads"
     MAX_UPLOAD_MB: int = 10
+    UPLOAD_CHUNK_KB: int = 64  # Uploads are read, hashed and written this much at a time
+    UPLOAD_URL_TTL_SECONDS: int = 3600  # Signed file links last 1-2x this and are stable (cacheable) within it
+    UPLOAD_ACCEL_REDIRECT: str = ""  # nginx internal location serving UPLOAD_DIR, e.g. /_uploads/ (X-Accel-Redirect)
+    UPLOAD_GC_INTERVAL_SECONDS: int = 21600  # Sweep UPLOAD_DIR for files no receipt references; 0 disables
+    UPLOAD_GC_GRACE_HOURS: int = 24  # Only files (and stale temp files) older than this are removed
+    UPLOAD_GC_BATCH: int = 500  # Files checked against the database per query
+    UPLOAD_ARCHIVE_DIR: str = ""  # Cold tier (archive segments), e.g. on cheaper disk; empty: <UPLOAD_DIR>/.archive
+    UPLOAD_ARCHIVE_AFTER_DAYS: int = 90  # Receipts of delivered orders older than this move to the archive
+    UPLOAD_ARCHIVE_SEGMENT_MB: int = 256  # A new segment is started once the current one is this big
+    UPLOAD_ARCHIVE_INTERVAL_SECONDS: int = 86400  # How often the API runs the tiering job; 0 disables
+    THUMBNAIL_PX: int = 256  # Longest side of receipt thumbnails
+    PREVIEW_PX: int = 1600  # Longest side of receipt previews
+    THUMBNAIL_WORKERS: int = 1  # Processes rendering thumbnails (per API worker)
+    THUMBNAIL_MAX_QUEUE: int = 16  # Jobs waiting for a render process before new ones are skipped
+    S3_BUCKET: str = ""
+    S3_PREFIX: str = ""  # Key prefix inside the bucket, e.g. "receipts/"
+    S3_ENDPOINT_URL: str = ""  # MinIO, R2 and other S3-compatible stores; empty for AWS
+    S3_REGION: str = "us-east-1"
+    S3_ACCESS_KEY_ID: str = ""  # Empty: the default AWS credential chain (env, instance role)
+    S3_SECRET_ACCESS_KEY: str = ""
+    S3_MAX_POOL_CONNECTIONS: int = 20  # Shared client's connection pool (per API worker)
+    S3_MULTIPART_THRESHOLD_MB: int = 8  # Larger files go up in parallel parts
+    S3_MULTIPART_CHUNK_MB: int = 8
+    S3_PRESIGN_SECONDS: int = 900  # Lifetime of presigned PUT (direct upload) and GET URLs
+    
+    # Inventory
+    DEFAULT_REORDER_THRESHOLD: int = 10
+    LOW_STOCK_ALERT_PHONE: str = ""  # Admin phone that receives low-stock SMS alerts
+    
+    # Best sellers
+    TOP_SELLERS_SIZE: int = 50  # Ranked entries kept in memory per window
+    SALES_RANKING_REFRESH_SECONDS: int = 300
     
     # Africa's Talking SMS
     AT_USERNAME: str = ""
@@ -0,0 +1,168 @@
+"""
+Responses for write-once uploaded files.
+
+Every stored file key is written once and never changes (content hashes or
+random ids), so the key is the ETag and responses are cacheable forever:
+repeat views are answered with 304 before the file is touched, and a single
+byte range is served as 206 (PDF viewers fetch large receipts in pieces).
+
+The body goes out with zero copies where something below the app can do it:
+with UPLOAD_ACCEL_REDIRECT set, nginx serves the file itself (sendfile,
+ranges) once the API has checked the link; otherwise the ASGI zerocopysend
+or pathsend extension is used when the server offers one, and the file is
+streamed from the threadpool in chunks when it doesn't (uvicorn).
+"""
+import os
+from mimetypes import guess_type
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+import anyio
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from starlette.types import Receive, Scope, Send
+from .config import settings
+
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (first, last) byte of a single "bytes=" range, clamped to the file; None to
+    send the whole file (no header, other units, several ranges, or malformed)
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiable
+    return start, min(end, size - 1)
+
+
+class FileSliceResponse(Response):
+    """`count` bytes of a file from `offset`"""
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: Path, offset: int, count: int, status_code: int, headers: dict, media_type: str,
+                 whole_file: bool = True):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.offset = offset
+        self.count = count
+        self.whole_file = whole_file  # False: the served file is a part of `path` (an archive segment)
+        self.headers["content-length"] = str(count)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        extensions = scope.get("extensions") or {}
+        if scope["method"] == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b""})
+        elif "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as file:
+                await send({"type": "http.response.zerocopysend", "file": file,
+                            "offset": self.offset, "count": self.count})
+        elif "http.response.pathsend" in extensions and self.status_code == 200 and self.whole_file:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            async with await anyio.open_file(self.path, "rb") as file:
+                await file.seek(self.offset)
+                remaining = self.count
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining:
+                    await send({"type": "http.response.body", "body": b""})
+
+
+def conditional_headers(request: Request, file_key: str, ranges: bool = True) -> Tuple[dict, Optional[Response]]:
+    """Caching headers for a write-once file, and a 304 if the client already has it"""
+    etag = f'"{file_key}"'
+    headers = {"etag": etag, "cache-control": CACHE_CONTROL}
+    if ranges:
+        headers["accept-ranges"] = "bytes"
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return headers, Response(status_code=304, headers=headers)
+    return headers, None
+
+
+def ranged_response(request: Request, headers: dict, size: int, send_slice: Callable[[int, int, int], Response]) -> Response:
+    """Whole file or the requested range; send_slice(offset, count, status) builds the response"""
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", headers["etag"]) == headers["etag"]:
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+    if byte_range is None:
+        return send_slice(0, size, 200)
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return send_slice(start, end - start + 1, 206)
+
+
+def immutable_file_response(request: Request, path: Path, file_key: str) -> Response:
+    """Serve a write-once file with caching, conditional and range support; caller has checked access"""
+    headers, not_modified = conditional_headers(request, file_key)
+    if not_modified:
+        return not_modified
+
+    media_type = guess_type(path.name)[0] or "application/octet-stream"
+    if settings.UPLOAD_ACCEL_REDIRECT:
+        # The file's place under UPLOAD_DIR (sharded or not), which the nginx location aliases
+        internal = path.relative_to(Path(settings.UPLOAD_DIR).resolve()).as_posix()
+        headers["x-accel-redirect"] = settings.UPLOAD_ACCEL_REDIRECT.rstrip("/") + "/" + internal
+        return Response(headers=headers, media_type=media_type)
+
+    try:
+        size = os.stat(path).st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    return ranged_response(request, headers, size, lambda offset, count, status: FileSliceResponse(
+        path, offset, count, status, headers, media_type
+    ))
+
+
+async def archived_file_response(
+    request: Request, file_key: str, segment_path: Path, offset: int, size: int,
+    load: Optional[Callable[[], bytes]] = None,
+) -> Response:
+    """
+    Serve a file from an archive segment. Stored as is, it is `size` bytes at
+    `offset` and goes out like any file (ranges, zero-copy); a compressed one
+    is decompressed by `load` in the threadpool, after the 304 check, and
+    always sent whole: it doesn't advertise ranges, since each range request
+    would decompress the entire entry again
+    """
+    headers, not_modified = conditional_headers(request, file_key, ranges=load is None)
+    if not_modified:
+        return not_modified
+
+    media_type = guess_type(file_key)[0] or "application/octet-stream"
+    if load is None:
+        return ranged_response(request, headers, size, lambda start, count, status: FileSliceResponse(
+            segment_path, offset + start, count, status, headers, media_type, whole_file=False
+        ))
+    content = await run_in_threadpool(load)
+    return Response(content, headers=headers, media_type=media_type)
@@ -0,0 +1,204 @@
+"""
+Prometheus metrics, served in text format at /metrics.
+
+Request metrics are labelled with the route template (`/api/orders/{order_id}`),
+never the raw path, so label cardinality stays bounded. Pool gauges are read
+from the engines at scrape time.
+
+With several uvicorn/gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory shared by the workers; counters and histograms are then summed
+across workers. Pool gauges always describe the worker that answered the scrape.
+"""
+import os
+import time
+from fastapi import FastAPI, Request, Response, HTTPException, status
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .config import settings
+
+HTTP_REQUESTS = Counter(
+    "foodnova_http_requests_total", "HTTP requests by route and status code",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "foodnova_http_request_duration_seconds", "Time from request to the first response byte",
+    ["method", "route"],
+)
+HTTP_IN_PROGRESS = Gauge(
+    "foodnova_http_requests_in_progress", "Requests currently being served",
+    multiprocess_mode="livesum",
+)
+SMS_LATENCY = Histogram(
+    "foodnova_sms_send_duration_seconds", "Africa's Talking send latency",
+)
+SMS_FAILURES = Counter(
+    "foodnova_sms_failures_total", "SMS sends that errored or were not accepted",
+)
+UPLOAD_BYTES = Counter(
+    "foodnova_upload_bytes_total", "Bytes of uploaded files stored",
+    ["kind"],
+)
+UPLOAD_DEDUPLICATED = Counter(
+    "foodnova_upload_deduplicated_total", "Uploads whose content was already stored",
+    ["kind"],
+)
+UPLOAD_GC_FILES = Counter(
+    "foodnova_upload_gc_files_total", "Files removed by the upload GC (orphan, stale_temp)",
+    ["reason"],
+)
+CHECKOUTS = Counter(
+    "foodnova_checkouts_total", "Checkout attempts by outcome (success, out_of_stock, validation_error, error)",
+    ["outcome"],
+)
+
+PASSWORD_HASH_LATENCY = Histogram(
+    "foodnova_password_hash_duration_seconds", "bcrypt hash/verify time including the wait for a worker",
+    ["op"], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PASSWORD_HASH_QUEUE = Gauge(
+    "foodnova_password_hash_pending", "bcrypt jobs running or queued for the process pool",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "foodnova_password_hash_rejected_total", "Logins/registrations refused with 503 because the hash queue was full",
+)
+
+THUMBNAIL_JOBS = Counter(
+    "foodnova_thumbnail_jobs_total", "Receipt thumbnail jobs by outcome (rendered, reused, skipped, failed)",
+    ["outcome"],
+)
+THUMBNAIL_LATENCY = Histogram(
+    "foodnova_thumbnail_render_duration_seconds", "Thumbnail and preview render time including the wait for a worker",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+TOKEN_CACHE_LOOKUPS = Counter(
+    "foodnova_token_cache_lookups_total", "Verified-token cache lookups by result (hit, miss)",
+    ["result"],
+)
+
+USER_CACHE_LOOKUPS = Counter(
+    "foodnova_user_cache_lookups_total", "User profile cache lookups by result (hit, miss)",
+    ["result"],
+)
+
+RATE_LIMITED = Counter(
+    "foodnova_rate_limited_total", "Requests refused with 429, by route and bucket scope (ip, account)",
+    ["route", "scope"],
+)
+
+
+class PoolCollector:
+    """Connection pool gauges and checkout counters for each configured engine"""
+
+    def collect(self):
+        from ..db.pool_metrics import pool_status
+        from ..db import session
+
+        gauges = {
+            name: GaugeMetricFamily(f"foodnova_db_pool_{name}", doc, labels=["engine"])
+            for name, doc in (
+                ("size", "Configured pool size"),
+                ("in_use", "Connections checked out"),
+                ("idle", "Connections idle in the pool"),
+                ("overflow", "Connections open beyond the pool size"),
+            )
+        }
+        checkouts = CounterMetricFamily("foodnova_db_pool_checkouts", "Pool checkouts", labels=["engine"])
+        timeouts = CounterMetricFamily("foodnova_db_pool_checkout_timeouts", "Checkouts that gave up waiting", labels=["engine"])
+        waited = CounterMetricFamily("foodnova_db_pool_checkout_wait_seconds", "Time spent waiting for a connection", labels=["engine"])
+
+        engines = (
+            ("primary", session.engine), ("replica", session.read_engine),
+            ("async_primary", session.async_engine), ("async_replica", session.async_read_engine),
+        )
+        for label, engine in engines:
+            pool = pool_status(engine)
+            if pool is None:
+                continue
+            for name, family in gauges.items():
+                if name in pool:
+                    family.add_metric([label], pool[name])
+            if "checkouts" in pool:
+                checkouts.add_metric([label], pool["checkouts"])
+                timeouts.add_metric([label], pool["checkout_timeouts"])
+                waited.add_metric([label], pool["checkout_wait_total_ms"] / 1000)
+
+        yield from gauges.values()
+        yield from (checkouts, timeouts, waited)
+
+
+class MetricsMiddleware:
+    """
+    Counts requests and records latency per route template. Plain ASGI like
+    ServerTimingMiddleware; the route is known only after routing, from the
+    endpoint Starlette leaves in the scope.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.templates = None  # endpoint -> route path, built on first request
+
+    def route_template(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self.templates is None:
+            self.templates = {}
+            for route in scope["app"].routes:
+                self.templates.setdefault(getattr(route, "endpoint", None), getattr(route, "path", "unmatched"))
+        return self.templates.get(endpoint, "unmatched")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        elapsed = None
+
+        async def send_with_status(message: Message):
+            nonlocal status_code, elapsed
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter() - start
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            route = self.route_template(scope)
+            if elapsed is None:
+                elapsed = time.perf_counter() - start
+            HTTP_REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+            HTTP_LATENCY.labels(scope["method"], route).observe(elapsed)
+
+
+def _registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(PoolCollector())
+        return registry
+    REGISTRY.register(PoolCollector())
+    return REGISTRY
+
+
+def setup_metrics(app: FastAPI):
+    if not settings.METRICS_ENABLED:
+        return
+    registry = _registry()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics(request: Request):
+        if settings.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
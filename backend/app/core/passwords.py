@@ -0,0 +1,95 @@
+"""
+Password hashing off the event loop and out of the API process.
+
+bcrypt is ~250 ms of CPU per call at cost 12. Run in the AnyIO threadpool a
+burst of logins ties up the threads other sync routes need and holds the GIL
+for the hash's pure-Python parts, so catalog reads stall. Async routes
+instead await a small process pool here. Jobs beyond the pool size wait in a
+queue of at most PASSWORD_HASH_MAX_QUEUE; past that the request fails fast
+with 503 rather than piling up behind the CPU.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from .config import settings
+from .metrics import PASSWORD_HASH_LATENCY, PASSWORD_HASH_QUEUE, PASSWORD_HASH_REJECTED
+
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    # Hashes at any other cost verify fine and report needs_update, so logins
+    # upgrade them after BCRYPT_ROUNDS changes
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+
+# Run in the worker processes
+
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def _verify(password: str, hashed: str) -> Tuple[bool, bool]:
+    """(matches, hash should be upgraded to the current cost)"""
+    context = get_pwd_context()
+    ok = context.verify(password, hashed)
+    return ok, ok and context.needs_update(hashed)
+
+
+class PasswordHasher:
+    """Size-limited process pool for bcrypt with a bounded backlog"""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_pending = workers + max_queue
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created on first use; spawn rather than fork, since the API process
+        # already has threads and open database connections
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _run(self, op: str, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                PASSWORD_HASH_REJECTED.inc()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many sign-in attempts in progress, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+            PASSWORD_HASH_QUEUE.inc()
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            PASSWORD_HASH_LATENCY.labels(op).observe(time.perf_counter() - start)
+            with self._lock:
+                self.pending -= 1
+                PASSWORD_HASH_QUEUE.dec()
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash, password)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, bool]:
+        return await self._run("verify", _verify, password, hashed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
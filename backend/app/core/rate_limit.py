@@ -0,0 +1,170 @@
+"""
+Token-bucket rate limits for login, registration, checkout and receipt uploads.
+
+Limits are "<requests>/<second|minute|hour>" strings in Settings: the bucket
+holds that many requests and refills evenly over the period. Buckets live in
+this worker's memory unless RATE_LIMIT_REDIS_URL is set, in which case all
+workers share them in Redis (`pip install redis`). Checks run as the first
+dependency or statement of a route, so a rejected request never reaches
+bcrypt or the database.
+"""
+import logging
+import math
+import threading
+import time
+from typing import Tuple
+from fastapi import Depends, HTTPException, Request, status
+from .config import settings
+from .metrics import RATE_LIMITED
+from .security import get_current_user
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+def parse_limit(limit: str) -> Tuple[int, float]:
+    """"20/minute" -> (capacity 20, refill 1/3 token per second)"""
+    count, _, period = limit.partition("/")
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period.strip()]
+
+
+class MemoryBuckets:
+    """
+    Buckets for one worker: key -> (tokens, updated_at, full_at). A bucket that
+    has refilled completely is the same as no bucket, so it is swept once
+    `full_at` passes.
+    """
+
+    SWEEP_SECONDS = 60
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def take(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until one is available)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if now - self._last_sweep > self.SWEEP_SECONDS:
+                self._buckets = {k: b for k, b in self._buckets.items() if b[2] > now}
+                self._last_sweep = now
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+# Same algorithm as MemoryBuckets, atomic in Redis and on the Redis clock
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+
+class RedisBuckets:
+    """
+    Buckets shared by every worker. When Redis is unreachable this worker uses
+    its own memory: after a failure Redis is left alone for RETRY_SECONDS, then
+    a single request probes it, so an outage doesn't cost every request the
+    socket timeouts.
+    """
+
+    PREFIX = "foodnova:ratelimit:"
+    RETRY_SECONDS = 30
+
+    def __init__(self, url: str):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.script = self.client.register_script(TAKE_SCRIPT)
+        self.fallback = MemoryBuckets()
+        self._retry_at = None  # Monotonic time of the next probe while Redis is down
+        self._probe = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        if self._retry_at is not None and (time.monotonic() < self._retry_at or not self._probe.acquire(blocking=False)):
+            return self.fallback.take(key, capacity, rate)
+        probing = self._retry_at is not None
+        try:
+            allowed, wait = self.script(keys=[self.PREFIX + key], args=[capacity, rate])
+        except Exception as e:
+            if self._retry_at is None:  # Only on the way down, not for every failed probe
+                logger.warning(f"Rate limit backend unavailable, using in-process buckets: {e}")
+            self._retry_at = time.monotonic() + self.RETRY_SECONDS
+            return self.fallback.take(key, capacity, rate)
+        finally:
+            if probing:
+                self._probe.release()
+        if probing:
+            logger.warning("Rate limit backend reachable again, using shared buckets")
+            self._retry_at = None
+        return bool(allowed), float(wait)
+
+
+class RateLimiter:
+    def __init__(self):
+        self._buckets = None  # created on first use, so importing the app never connects to Redis
+
+    @property
+    def buckets(self):
+        if self._buckets is None:
+            self._buckets = RedisBuckets(settings.RATE_LIMIT_REDIS_URL) if settings.RATE_LIMIT_REDIS_URL else MemoryBuckets()
+        return self._buckets
+
+    def check(self, route: str, scope: str, subject: str, limit: str):
+        """Spend one request from the route's bucket for this IP/account, or raise 429"""
+        if not settings.RATE_LIMIT_ENABLED or not limit:
+            return
+        capacity, rate = parse_limit(limit)
+        allowed, wait = self.buckets.take(f"{route}:{scope}:{subject}", capacity, rate)
+        if not allowed:
+            RATE_LIMITED.labels(route, scope).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please slow down",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+
+rate_limiter = RateLimiter()
+
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+    return request.client.host if request.client else "unknown"
+
+
+def limit_per_ip(route: str, setting: str):
+    """Dependency: one bucket per client IP for this route, sized by `settings.<setting>`"""
+    def dependency(request: Request):
+        rate_limiter.check(route, "ip", client_ip(request), getattr(settings, setting))
+    return dependency
+
+
+def limit_per_account(route: str, setting: str):
+    """Dependency: one bucket per signed-in user for this route, sized by `settings.<setting>`"""
+    def dependency(current_user: dict = Depends(get_current_user)):
+        rate_limiter.check(route, "account", current_user.get("sub"), getattr(settings, setting))
+    return dependency
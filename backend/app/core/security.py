@@ -1,21 +1,24 @@
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Any
-from passlib.context import CryptContext
-from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from .config import settings
+from .passwords import get_pwd_context
+from .token_cache import token_cache, token_key
+from ..services.user_profiles import get_user_profile
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib (with its bcrypt backend) and python-jose are imported on first use
+# rather than at startup; see benchmarks/cold_start.py
 security = HTTPBearer()
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -24,18 +27,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.JWT_ACCESS_EXPIRES_MIN)
-    to_encode.update({"exp": expire, "type": "access"})
+    # iat to the millisecond, so a token issued right after a revocation isn't caught by it
+    to_encode.update({"exp": expire, "iat": round(time.time(), 3), "type": "access"})
+    from jose import jwt
     return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
 
 def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=settings.JWT_REFRESH_EXPIRES_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    to_encode.update({"exp": expire, "iat": round(time.time(), 3), "type": "refresh"})
+    from jose import jwt
     return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
 
 def decode_token(token: str) -> dict:
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
         return payload
@@ -49,11 +56,29 @@ def decode_token(token: str) -> dict:
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
-    payload = decode_token(token)
-    if payload.get("type") != "access":
+    key = token_key(token)
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = decode_token(token)
+        if payload.get("type") != "access":
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token type"
+            )
+        token_cache.put(key, payload)
+    if token_cache.is_revoked(key, payload):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token type"
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # Cached profile, so disabled accounts are locked out without a query per request
+    profile = await get_user_profile(int(payload.get("sub")))
+    if not profile or not profile.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found or inactive",
+            headers={"WWW-Authenticate": "Bearer"},
         )
     return payload
 
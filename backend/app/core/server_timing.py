@@ -0,0 +1,46 @@
+import time
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .config import settings
+from ..db.query_stats import QueryStats, current_query_stats, warn_repeated_queries
+
+
+class ServerTimingMiddleware:
+    """
+    Adds `Server-Timing: db;dur=..;desc="N queries", app;dur=..` to every HTTP
+    response and warns about repeated statement shapes (likely N+1 queries).
+
+    Plain ASGI rather than BaseHTTPMiddleware so streaming responses pass
+    through untouched. Headers go out before a streamed body is produced, so
+    for those the figures cover the work done up to the first byte.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - start) * 1000
+                value = f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries", app;dur={total_ms:.2f}'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            warn_repeated_queries(stats, settings.N_PLUS_ONE_THRESHOLD, f"{scope['method']} {scope['path']}")
+
+
+def setup_server_timing(app: FastAPI):
+    if settings.SERVER_TIMING_ENABLED:
+        app.add_middleware(ServerTimingMiddleware)
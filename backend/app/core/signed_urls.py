@@ -0,0 +1,36 @@
+"""
+Signed, expiring links to uploaded files.
+
+Receipt files are opened straight from <a> and <img> tags, which can't carry
+the bearer token, so the API signs each file URL as it returns it from a
+route that has already checked the caller against the order (its owner, or
+an admin). The signature covers the file key and an expiry rounded up to a
+window of UPLOAD_URL_TTL_SECONDS: a link stays the same for the whole
+window, so the browser cache keeps serving it across page loads.
+"""
+import hashlib
+import hmac
+import time
+from typing import Optional
+from .config import settings
+
+
+def _signature(file_key: str, expires: int) -> str:
+    message = f"{file_key}:{expires}".encode()
+    return hmac.new(settings.JWT_SECRET.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def sign_upload_url(url: Optional[str]) -> Optional[str]:
+    """`url` (ending in a file key) with ?exp=&sig=; valid for one to two TTL windows"""
+    if not url:
+        return url
+    ttl = settings.UPLOAD_URL_TTL_SECONDS
+    expires = (int(time.time()) // ttl + 2) * ttl
+    file_key = url.rsplit("/api/uploads/", 1)[-1]
+    return f"{url}?exp={expires}&sig={_signature(file_key, expires)}"
+
+
+def verify_upload_signature(file_key: str, expires: int, signature: str) -> bool:
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(file_key, expires), signature)
@@ -0,0 +1,98 @@
+"""
+Thumbnails and previews of uploaded receipts, rendered out of the API process.
+
+Receipts are phone photos and PDFs of several megabytes; admins reviewing
+them over a slow link want something small first. Each stored file gets a
+WebP thumbnail (THUMBNAIL_PX) and a WebP preview (PREVIEW_PX), both from the
+first page for PDFs. Decoding is CPU-heavy and holds the GIL, so it runs in a
+small process pool like bcrypt. Jobs beyond THUMBNAIL_WORKERS +
+THUMBNAIL_MAX_QUEUE are skipped: the receipt just has no thumbnail. Needs
+Pillow, and pypdfium2 for PDFs; both are imported in the workers only.
+"""
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from .config import settings
+from .metrics import THUMBNAIL_JOBS, THUMBNAIL_LATENCY
+
+
+# Run in the worker processes
+
+def _open_page(source_path: str, is_pdf: bool, max_px: int):
+    """The image, or a PDF's first page, decoded at roughly `max_px` on its longest side"""
+    if is_pdf:
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(source_path)
+        try:
+            page = pdf[0]
+            scale = max_px / max(page.get_size())
+            return page.render(scale=scale).to_pil().convert("RGB")
+        finally:
+            pdf.close()
+    from PIL import Image, ImageOps
+    image = Image.open(source_path)
+    # JPEGs decode straight to a reduced scale instead of full resolution
+    image.draft("RGB", (max_px, max_px))
+    return ImageOps.exif_transpose(image).convert("RGB")
+
+
+def _render(source_path: str, is_pdf: bool, staging_dir: Optional[str], preview_px: int, thumbnail_px: int) -> Tuple[str, str]:
+    """Write the preview and thumbnail to temp files; (preview path, thumbnail path)"""
+    image = _open_page(source_path, is_pdf, preview_px)
+    paths = []
+    for max_px, quality in ((preview_px, 80), (thumbnail_px, 70)):
+        image.thumbnail((max_px, max_px))  # shrinks in place, never enlarges
+        fd, path = tempfile.mkstemp(dir=staging_dir, prefix="render-", suffix=".webp")
+        with os.fdopen(fd, "wb") as out:
+            image.save(out, "WEBP", quality=quality)
+        paths.append(path)
+    return paths[0], paths[1]
+
+
+class ThumbnailRenderer:
+    """Size-limited process pool for image decoding with a bounded backlog"""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_pending = workers + max_queue
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def render(self, source_path: str, is_pdf: bool, staging_dir: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """(preview path, thumbnail path) in `staging_dir`, or None if the queue is full"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                THUMBNAIL_JOBS.labels("skipped").inc()
+                return None
+            self.pending += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), _render, source_path, is_pdf, staging_dir,
+                settings.PREVIEW_PX, settings.THUMBNAIL_PX,
+            )
+        finally:
+            THUMBNAIL_LATENCY.observe(time.perf_counter() - start)
+            with self._lock:
+                self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+thumbnail_renderer = ThumbnailRenderer(settings.THUMBNAIL_WORKERS, settings.THUMBNAIL_MAX_QUEUE)
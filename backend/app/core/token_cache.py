@@ -0,0 +1,87 @@
+"""
+Verified access tokens, so repeat requests skip the HMAC check and JSON decode.
+
+Entries are keyed by a SHA-256 of the token (the token itself never sits in
+memory as a key) and live until the token's `exp`. Revocation is checked on
+every lookup, cached or not: single tokens by digest, and everything a user
+was issued before a cut-off time (disable, password change, logout-all).
+State is per worker process, like the rest of the in-memory caches.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from .config import settings
+from .metrics import TOKEN_CACHE_LOOKUPS
+
+
+def token_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenCache:
+    """Thread-safe LRU of decoded token payloads with revocation lists"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, dict]" = OrderedDict()
+        self._revoked = {}  # token key -> exp, kept until the token would have expired anyway
+        self._revoked_before = {}  # user id (sub) -> tokens issued before this time are invalid
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None and payload["exp"] <= time.time():
+                del self._entries[key]
+                payload = None
+            if payload is None:
+                TOKEN_CACHE_LOOKUPS.labels("miss").inc()
+                return None
+            self._entries.move_to_end(key)
+        TOKEN_CACHE_LOOKUPS.labels("hit").inc()
+        return payload
+
+    def put(self, key: bytes, payload: dict):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, key: bytes, payload: dict) -> bool:
+        if key in self._revoked:
+            return True
+        cutoff = self._revoked_before.get(payload.get("sub"))
+        return cutoff is not None and payload.get("iat", 0) < cutoff
+
+    def revoke(self, key: bytes, exp: float):
+        """Reject one token from now on"""
+        with self._lock:
+            self._entries.pop(key, None)
+            now = time.time()
+            self._revoked = {k: e for k, e in self._revoked.items() if e > now}
+            self._revoked[key] = exp
+
+    def revoke_user(self, user_id: int, at: Optional[float] = None):
+        """Reject every token issued to this user up to `at` (default now)"""
+        sub = str(user_id)
+        with self._lock:
+            now = time.time()
+            cutoff = now if at is None else at
+            self._revoked_before[sub] = max(cutoff, self._revoked_before.get(sub, 0))
+            # Access tokens older than their lifetime are expired anyway
+            horizon = now - settings.JWT_ACCESS_EXPIRES_MIN * 60
+            self._revoked_before = {s: t for s, t in self._revoked_before.items() if t > horizon}
+            for key in [k for k, p in self._entries.items() if p.get("sub") == sub]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
@@ -1,18 +1,45 @@
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 from ..db.session import engine
 from ..db.base import Base
+from ..db.migrations import pending_migrations, run_migrations, take_startup_lock
 from ..models import User, Category, Product, Pack, PackVariant, PackVariantItem
 from ..core.config import settings
 from ..core.security import hash_password
 
 
+def init_schema(engine: Engine):
+    """Create missing tables and apply pending migrations (one locked transaction)"""
+    run_migrations(engine, Base.metadata)
+
+
+def check_schema(engine: Engine):
+    """SKIP_SCHEMA_INIT mode: only warn when the database is behind the code"""
+    pending = pending_migrations(engine)
+    if pending:
+        print(f"WARNING: {len(pending)} pending migration(s); run `python -m app.db.migrate`")
+
+
 def init_db(db: Session):
     """Initialize database with tables and seed data"""
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    if settings.SKIP_SCHEMA_INIT:
+        check_schema(engine)
+    else:
+        init_schema(engine)
+    seed_db(db)
+
+
+def seed_db(db: Session):
+    """
+    Insert the admin user and starter catalog in a single transaction, once.
+    When several workers boot together, the lock makes the others wait and
+    then find the seed already committed.
+    """
+    take_startup_lock(db.connection())
     
     # Check if already seeded
-    if db.query(User).first():
+    if db.query(User.id).first():
+        db.rollback()
         print("Database already seeded, skipping...")
         return
     
@@ -25,55 +52,34 @@ def init_db(db: Session):
         full_name="Admin User",
         role="admin"
     )
-    db.add(admin)
     
     # Create categories
-    categories = [
-        Category(name="Rice"),
-        Category(name="Oil"),
-        Category(name="Pasta & Noodles")
-    ]
-    for cat in categories:
-        db.add(cat)
-    db.commit()
-    
-    # Get category IDs
-    rice_cat = db.query(Category).filter(Category.name == "Rice").first()
-    oil_cat = db.query(Category).filter(Category.name == "Oil").first()
-    pasta_cat = db.query(Category).filter(Category.name == "Pasta & Noodles").first()
-    
-    # Create products
-    products = [
-        Product(
-            name="Rice 5kg",
-            price=8500,
-            stock_qty=100,
-            category_id=rice_cat.id,
-            image_url="https://images.unsplash.com/photo-1586201375761-83865001e31c?w=400"
-        ),
-        Product(
-            name="Palm Oil 1L",
-            price=2500,
-            stock_qty=100,
-            category_id=oil_cat.id,
-            image_url="https://images.unsplash.com/photo-1474979266404-7eaacbcd87c5?w=400"
-        ),
-        Product(
-            name="Indomie Pack",
-            price=1500,
-            stock_qty=200,
-            category_id=pasta_cat.id,
-            image_url="https://images.unsplash.com/photo-1612929633738-8fe44f7ec841?w=400"
-        )
-    ]
-    for prod in products:
-        db.add(prod)
-    db.commit()
+    rice_cat = Category(name="Rice")
+    oil_cat = Category(name="Oil")
+    pasta_cat = Category(name="Pasta & Noodles")
     
-    # Get product IDs
-    rice = db.query(Product).filter(Product.name == "Rice 5kg").first()
-    oil = db.query(Product).filter(Product.name == "Palm Oil 1L").first()
-    noodles = db.query(Product).filter(Product.name == "Indomie Pack").first()
+    # Create products (linked through relationships; ids are assigned at flush)
+    rice = Product(
+        name="Rice 5kg",
+        price=8500,
+        stock_qty=100,
+        category=rice_cat,
+        image_url="https://images.unsplash.com/photo-1586201375761-83865001e31c?w=400"
+    )
+    oil = Product(
+        name="Palm Oil 1L",
+        price=2500,
+        stock_qty=100,
+        category=oil_cat,
+        image_url="https://images.unsplash.com/photo-1474979266404-7eaacbcd87c5?w=400"
+    )
+    noodles = Product(
+        name="Indomie Pack",
+        price=1500,
+        stock_qty=200,
+        category=pasta_cat,
+        image_url="https://images.unsplash.com/photo-1612929633738-8fe44f7ec841?w=400"
+    )
     
     # Create packs
     packs_data = [
@@ -85,17 +91,17 @@ def init_db(db: Session):
                     "name": "Basic",
                     "price": 10000,
                     "items": [
-                        {"product_id": rice.id, "qty": 1},
-                        {"product_id": noodles.id, "qty": 2}
+                        {"product": rice, "qty": 1},
+                        {"product": noodles, "qty": 2}
                     ]
                 },
                 {
                     "name": "Plus",
                     "price": 12500,
                     "items": [
-                        {"product_id": rice.id, "qty": 1},
-                        {"product_id": oil.id, "qty": 1},
-                        {"product_id": noodles.id, "qty": 2}
+                        {"product": rice, "qty": 1},
+                        {"product": oil, "qty": 1},
+                        {"product": noodles, "qty": 2}
                     ]
                 }
             ]
@@ -108,18 +114,18 @@ def init_db(db: Session):
                     "name": "Standard",
                     "price": 22000,
                     "items": [
-                        {"product_id": rice.id, "qty": 2},
-                        {"product_id": oil.id, "qty": 2},
-                        {"product_id": noodles.id, "qty": 4}
+                        {"product": rice, "qty": 2},
+                        {"product": oil, "qty": 2},
+                        {"product": noodles, "qty": 4}
                     ]
                 },
                 {
                     "name": "Large",
                     "price": 35000,
                     "items": [
-                        {"product_id": rice.id, "qty": 3},
-                        {"product_id": oil.id, "qty": 3},
-                        {"product_id": noodles.id, "qty": 6}
+                        {"product": rice, "qty": 3},
+                        {"product": oil, "qty": 3},
+                        {"product": noodles, "qty": 6}
                     ]
                 }
             ]
@@ -132,51 +138,43 @@ def init_db(db: Session):
                     "name": "Gold",
                     "price": 45000,
                     "items": [
-                        {"product_id": rice.id, "qty": 4},
-                        {"product_id": oil.id, "qty": 4},
-                        {"product_id": noodles.id, "qty": 8}
+                        {"product": rice, "qty": 4},
+                        {"product": oil, "qty": 4},
+                        {"product": noodles, "qty": 8}
                     ]
                 },
                 {
                     "name": "Platinum",
                     "price": 65000,
                     "items": [
-                        {"product_id": rice.id, "qty": 6},
-                        {"product_id": oil.id, "qty": 6},
-                        {"product_id": noodles.id, "qty": 12}
+                        {"product": rice, "qty": 6},
+                        {"product": oil, "qty": 6},
+                        {"product": noodles, "qty": 12}
                     ]
                 }
             ]
         }
     ]
     
-    for pack_data in packs_data:
-        pack = Pack(
+    packs = [
+        Pack(
             name=pack_data["name"],
-            description=pack_data["description"]
-        )
-        db.add(pack)
-        db.commit()
-        db.refresh(pack)
-        
-        for variant_data in pack_data["variants"]:
-            variant = PackVariant(
-                pack_id=pack.id,
-                name=variant_data["name"],
-                price=variant_data["price"]
-            )
-            db.add(variant)
-            db.commit()
-            db.refresh(variant)
-            
-            for item_data in variant_data["items"]:
-                item = PackVariantItem(
-                    variant_id=variant.id,
-                    product_id=item_data["product_id"],
-                    qty=item_data["qty"]
+            description=pack_data["description"],
+            variants=[
+                PackVariant(
+                    name=variant_data["name"],
+                    price=variant_data["price"],
+                    items=[PackVariantItem(**item_data) for item_data in variant_data["items"]]
                 )
-                db.add(item)
-        
-        db.commit()
+                for variant_data in pack_data["variants"]
+            ]
+        )
+        for pack_data in packs_data
+    ]
+    
+    db.add(admin)
+    db.add_all([rice, oil, noodles])
+    db.add_all(packs)
+    db.commit()
     
     print("Database seeded successfully!")
@@ -0,0 +1,33 @@
+"""
+Schema migration CLI
+
+    python -m app.db.migrate            # create missing tables, apply pending migrations
+    python -m app.db.migrate status     # list applied and pending migrations
+"""
+import argparse
+import logging
+from .base import Base
+from .session import engine
+from .migrations import applied_versions, discover_migrations, run_migrations
+from .. import models  # noqa: F401  (registers tables on Base.metadata)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FoodNova schema migrations")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status"])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
+    if args.command == "status":
+        done = applied_versions(engine)
+        for version, module in discover_migrations():
+            state = "applied" if version in done else "pending"
+            print(f"{version:04d}  {state:<8} {module.description}")
+        return
+    
+    applied = run_migrations(engine, Base.metadata)
+    print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Versioned schema migrations.
+
+Each module in this package named `v<NNNN>_<description>.py` defines
+`description` and `upgrade(conn)`. Pending migrations run in version order
+and are recorded in `schema_migrations`, all in one transaction under a
+database-wide lock, so workers booting together apply them exactly once.
+Migrations must be idempotent: on a fresh database `create_all` has already
+built the current schema, and the migration only needs to record itself.
+
+Run at startup from the app lifespan, or out of band with
+`python -m app.db.migrate`.
+"""
+import importlib
+import logging
+import pkgutil
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple, Union
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, literal, select, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# Kept off Base.metadata so create_all and the models never touch it
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MODULE_PATTERN = re.compile(r"^v(\d{4})_\w+$")
+
+# Arbitrary application-wide key for pg_advisory_xact_lock
+STARTUP_LOCK_KEY = 7_301_966_415
+
+
+def discover_migrations() -> List[Tuple[int, object]]:
+    """(version, module) pairs for every migration module, in version order"""
+    found = []
+    for info in pkgutil.iter_modules(__path__):
+        match = MODULE_PATTERN.match(info.name)
+        if match:
+            found.append((int(match.group(1)), importlib.import_module(f"{__name__}.{info.name}")))
+    return sorted(found, key=lambda m: m[0])
+
+
+def take_startup_lock(conn: Connection):
+    """
+    Hold a database-wide lock until the connection's transaction ends. Schema
+    init and seeding take it, so concurrent workers run them one at a time.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": STARTUP_LOCK_KEY})
+    elif conn.dialect.name == "sqlite" and not conn.connection.dbapi_connection.in_transaction:
+        # The SQLite production profile already opened the transaction with BEGIN IMMEDIATE
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def applied_versions(bind: Union[Engine, Connection]) -> set:
+    """Recorded versions; empty when schema_migrations doesn't exist yet"""
+    if isinstance(bind, Engine):
+        with bind.connect() as conn:
+            return applied_versions(conn)
+    if not inspect(bind).has_table(schema_migrations.name):
+        return set()
+    return {row[0] for row in bind.execute(select(schema_migrations.c.version))}
+
+
+def pending_migrations(bind: Union[Engine, Connection]) -> List[Tuple[int, object]]:
+    done = applied_versions(bind)
+    return [(version, module) for version, module in discover_migrations() if version not in done]
+
+
+def run_migrations(engine: Engine, metadata: Optional[MetaData] = None) -> List[int]:
+    """
+    Create missing tables from `metadata` (if given), then apply pending
+    migrations; returns the versions applied by this call
+    """
+    applied = []
+    with engine.begin() as conn:
+        take_startup_lock(conn)
+        if metadata is not None:
+            metadata.create_all(bind=conn)
+        migration_metadata.create_all(bind=conn)
+        for version, module in pending_migrations(conn):
+            module.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version,
+                description=module.description,
+                applied_at=datetime.now(timezone.utc).replace(tzinfo=None)
+            ))
+            logger.info(f"Applied migration {version:04d}: {module.description}")
+            applied.append(version)
+    return applied
+
+
+# ----- Helpers for migration modules -----
+
+def create_index(conn: Connection, name: str, table: str, columns: List[str], where: str = None):
+    """CREATE INDEX IF NOT EXISTS, with an optional partial-index predicate"""
+    ddl = f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    if where:
+        ddl += f" WHERE {where}"
+    conn.exec_driver_sql(ddl)
+
+
+def add_column(conn: Connection, column: Column):
+    """
+    Add a model column to its existing table unless it's already there.
+    Pass the mapped column (e.g. `Product.__table__.c.reorder_threshold`) so
+    type, default and nullability come from the model.
+    """
+    table_name = column.table.name
+    if column.name in {c["name"] for c in inspect(conn).get_columns(table_name)}:
+        return
+    dialect = conn.dialect
+    ddl = f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+    if column.default is not None and not callable(column.default.arg):
+        default = literal(column.default.arg).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {default}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    conn.exec_driver_sql(ddl)
@@ -0,0 +1,21 @@
+"""Indexes for the foreign keys and filters used by every hot endpoint"""
+from . import create_index
+
+description = "Add foreign-key and filter indexes for orders, receipts, payments, packs and products"
+
+INDEXES = [
+    ("ix_orders_user_id", "orders", ["user_id"]),
+    ("ix_orders_created_at", "orders", ["created_at"]),
+    ("ix_orders_status", "orders", ["status"]),
+    ("ix_order_items_order_id", "order_items", ["order_id"]),
+    ("ix_receipts_order_id", "receipts", ["order_id"]),
+    ("ix_payments_order_id", "payments", ["order_id"]),
+    ("ix_pack_variants_pack_id", "pack_variants", ["pack_id"]),
+    ("ix_pack_variant_items_variant_id", "pack_variant_items", ["variant_id"]),
+    ("ix_products_category_id_is_active", "products", ["category_id", "is_active"]),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
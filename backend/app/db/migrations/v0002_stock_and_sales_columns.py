@@ -0,0 +1,15 @@
+"""Columns added for low-stock alerts and best-seller tracking"""
+from . import add_column
+from ...models.order import OrderItem
+from ...models.product import Product
+
+description = "Add product reorder thresholds, low-stock alert flag and order_items.pack_variant_id"
+
+
+def upgrade(conn):
+    add_column(conn, Product.__table__.c.reorder_threshold)
+    add_column(conn, Product.__table__.c.low_stock_alerted)
+    add_column(conn, OrderItem.__table__.c.pack_variant_id)
+    for index in Product.__table__.indexes:
+        if index.name == "ix_products_low_stock":
+            index.create(conn, checkfirst=True)
@@ -0,0 +1,10 @@
+"""Content addresses for receipt files"""
+from . import add_column, create_index
+from ...models.receipt import Receipt
+
+description = "Add receipts.content_hash and its index (stored_files is created by create_all)"
+
+
+def upgrade(conn):
+    add_column(conn, Receipt.__table__.c.content_hash)
+    create_index(conn, "ix_receipts_content_hash", "receipts", ["content_hash"])
@@ -0,0 +1,13 @@
+"""Thumbnail and preview renditions of receipt files"""
+from . import add_column
+from ...models.receipt import Receipt
+from ...models.stored_file import StoredFile
+
+description = "Add receipt thumbnail/preview URLs and stored_files rendition keys"
+
+
+def upgrade(conn):
+    add_column(conn, Receipt.__table__.c.thumbnail_url)
+    add_column(conn, Receipt.__table__.c.preview_url)
+    add_column(conn, StoredFile.__table__.c.thumbnail_key)
+    add_column(conn, StoredFile.__table__.c.preview_key)
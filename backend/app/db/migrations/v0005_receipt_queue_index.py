@@ -0,0 +1,8 @@
+"""Index for the admin receipt review queue"""
+from . import create_index
+
+description = "Add receipts (status, uploaded_at, id) index for the keyset-paginated review queue"
+
+
+def upgrade(conn):
+    create_index(conn, "ix_receipts_status_uploaded_at", "receipts", ["status", "uploaded_at", "id"])
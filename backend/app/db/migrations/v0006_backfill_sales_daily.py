@@ -0,0 +1,9 @@
+"""One-time backfill of sales_daily from order history"""
+from datetime import timedelta
+from ...services.sales_ranking import WINDOWS, backfill_sales_daily, today_utc
+
+description = "Backfill sales_daily from the orders of the longest ranking window"
+
+
+def upgrade(conn):
+    backfill_sales_daily(conn, today_utc() - timedelta(days=max(WINDOWS) - 1))
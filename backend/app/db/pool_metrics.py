@@ -0,0 +1,103 @@
+import threading
+import time
+from typing import Optional
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    """Checkout counters for one connection pool (per worker process)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total_seconds = 0.0
+        self.wait_max_seconds = 0.0
+        self.waits_over_100ms = 0
+        self.peak_in_use = 0
+        self.peak_overflow = 0
+
+    def record_checkout(self, wait_seconds: float, in_use: int, overflow: int):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_seconds += wait_seconds
+            if wait_seconds > self.wait_max_seconds:
+                self.wait_max_seconds = wait_seconds
+            if wait_seconds > 0.1:
+                self.waits_over_100ms += 1
+            if in_use > self.peak_in_use:
+                self.peak_in_use = in_use
+            if overflow > self.peak_overflow:
+                self.peak_overflow = overflow
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "checkout_wait_avg_ms": round(self.wait_total_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "checkout_wait_max_ms": round(self.wait_max_seconds * 1000, 3),
+                "checkout_wait_total_ms": round(self.wait_total_seconds * 1000, 3),
+                "checkouts_waited_over_100ms": self.waits_over_100ms,
+                "peak_in_use": self.peak_in_use,
+                "peak_overflow": self.peak_overflow,
+            }
+
+
+class CheckoutTimingMixin:
+    """Times every pool checkout, including time spent waiting for a free slot"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        self.stats.record_checkout(time.perf_counter() - start, self.checkedout(), max(self.overflow(), 0))
+        return conn
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep counting into the same stats
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+class InstrumentedQueuePool(CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_status(engine: Optional[Engine]) -> Optional[dict]:
+    """Live pool gauges plus checkout counters, or None when there is no engine"""
+    if engine is None:
+        return None
+    pool = getattr(engine, "sync_engine", engine).pool  # AsyncEngine wraps a sync engine
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
@@ -0,0 +1,82 @@
+"""
+Per-request SQL statement counting.
+
+Cursor events on every Engine (sync engines and the sync core of async ones)
+add to the QueryStats of the current context. The Server-Timing middleware
+opens one per request; tests can open one with `track_queries()`. Requests
+run their sync endpoints and dependencies in the threadpool with a copy of
+the request context, so those statements are counted too.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Statements executed and time spent in the database for one unit of work"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0  # seconds
+        self.shapes = Counter()  # statement text (parameters are bound) -> executions
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statement shapes executed more than `threshold` times, most frequent first"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+@contextmanager
+def track_queries():
+    """Count the statements executed inside the block: `with track_queries() as stats: ...`"""
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+
+
+@contextmanager
+def untracked():
+    """Leave housekeeping statements (e.g. replica health checks) out of the current count"""
+    token = current_query_stats.set(None)
+    try:
+        yield
+    finally:
+        current_query_stats.reset(token)
+
+
+def warn_repeated_queries(stats: QueryStats, threshold: int, where: str):
+    """Log statement shapes repeated often enough to look like an N+1 query"""
+    for shape, n in stats.repeated(threshold):
+        statement = " ".join(shape.split())
+        logger.warning(f"Possible N+1 in {where}: statement ran {n} times: {statement[:200]}")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_query_stats.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_query_stats.get()
+    starts = conn.info.get("query_start")
+    if stats is not None and starts:
+        stats.record(statement, time.perf_counter() - starts.pop())
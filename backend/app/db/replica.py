@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+from ..models.heartbeat import ReplicaHeartbeat
+from .query_stats import untracked
+
+logger = logging.getLogger(__name__)
+
+
+def utcnow_naive() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def write_heartbeat(primary: Engine):
+    """Bump the heartbeat row on the primary (called periodically from the app lifespan)"""
+    now = utcnow_naive()
+    with primary.begin() as conn:
+        updated = conn.execute(
+            update(ReplicaHeartbeat).where(ReplicaHeartbeat.id == 1).values(beat_at=now)
+        ).rowcount
+        if not updated:
+            conn.execute(ReplicaHeartbeat.__table__.insert().values(id=1, beat_at=now))
+
+
+async def run_heartbeat_writer(primary: Engine, interval_seconds: int):
+    """Background task started from the app lifespan when a replica is configured"""
+    while True:
+        try:
+            await run_in_threadpool(write_heartbeat, primary)
+        except Exception as e:
+            logger.error(f"Replica heartbeat failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+class ReplicaMonitor:
+    """
+    Decides whether reads may go to the replica.
+
+    Lag is measured as the age of the replicated heartbeat row. The result of a
+    check is reused for `check_seconds` so the hot path costs one clock read;
+    only one thread re-checks at a time and the others keep the previous answer.
+    """
+
+    def __init__(self, engine: Engine, max_lag_seconds: float, check_seconds: float):
+        self.engine = engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self.lag_seconds: Optional[float] = None
+        self._usable = False
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def check(self) -> bool:
+        try:
+            with untracked(), self.engine.connect() as conn:
+                beat_at = conn.execute(
+                    select(ReplicaHeartbeat.beat_at).where(ReplicaHeartbeat.id == 1)
+                ).scalar()
+        except SQLAlchemyError as e:
+            if self._usable:
+                logger.warning(f"Read replica unavailable, falling back to primary: {e}")
+            self.lag_seconds = None
+            return False
+        
+        if beat_at is None:
+            self.lag_seconds = None
+            return False
+        self.lag_seconds = max(0.0, (utcnow_naive() - beat_at).total_seconds())
+        if self.lag_seconds > self.max_lag_seconds and self._usable:
+            logger.warning(f"Read replica lagging {self.lag_seconds:.1f}s, falling back to primary")
+        return self.lag_seconds <= self.max_lag_seconds
+
+    def is_fresh(self) -> bool:
+        return time.monotonic() - self._checked_at < self.check_seconds
+
+    async def is_usable_async(self) -> bool:
+        """is_usable for async code: a due re-check runs in the threadpool, off the event loop"""
+        if self.is_fresh():
+            return self._usable
+        return await run_in_threadpool(self.is_usable)
+
+    def is_usable(self) -> bool:
+        if self.is_fresh():
+            return self._usable
+        if not self._lock.acquire(blocking=False):
+            return self._usable
+        try:
+            self._usable = self.check()
+            self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+        return self._usable
@@ -1,17 +1,156 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
 from ..core.config import settings
+from .pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+from .query_stats import untracked
+from .replica import ReplicaMonitor
 
-# Create engine based on DATABASE_URL
-if settings.DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False}
+
+def is_sqlite_file(url: str) -> bool:
+    db_url = make_url(url)
+    return db_url.get_backend_name() == "sqlite" and db_url.database not in (None, "", ":memory:")
+
+
+def to_async_url(url: str) -> URL:
+    """Swap in the async driver: aiosqlite for SQLite, asyncpg for PostgreSQL (psycopg 3 is async already)"""
+    db_url = make_url(url)
+    backend = db_url.get_backend_name()
+    if backend == "sqlite":
+        return db_url.set(drivername="sqlite+aiosqlite")
+    if backend == "postgresql" and db_url.drivername != "postgresql+psycopg":
+        return db_url.set(drivername="postgresql+asyncpg")
+    return db_url
+
+
+def _engine_options(url: str, is_async: bool, pool_overrides: dict) -> dict:
+    db_url = make_url(url)
+    connect_args = {}
+    
+    if db_url.get_backend_name() == "sqlite":
+        connect_args["check_same_thread"] = False
+        if not is_sqlite_file(url):
+            # In-memory SQLite lives in a single connection; keep SQLAlchemy's default pool
+            return {"connect_args": connect_args}
+    
+    if db_url.get_backend_name() == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        if is_async and to_async_url(url).drivername == "postgresql+asyncpg":
+            connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+    
+    options = {
+        "connect_args": connect_args,
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    options.update(pool_overrides)
+    return options
+
+
+def create_db_engine(url: str, **pool_overrides):
+    """Create an engine based on the database URL, with pool settings from Settings"""
+    return create_engine(url, **_engine_options(url, False, pool_overrides))
+
+
+def create_async_db_engine(url: str, **pool_overrides):
+    """Async counterpart of create_db_engine"""
+    return create_async_engine(to_async_url(url), **_engine_options(url, True, pool_overrides))
+
+
+def apply_sqlite_profile(engine: Engine, writer: bool):
+    """
+    Production SQLite settings, applied to every new connection.
+
+    WAL lets readers run alongside the single writer, and synchronous=NORMAL
+    only fsyncs at checkpoints instead of on every commit. The writer engine
+    starts each transaction with BEGIN IMMEDIATE so it takes the write lock up
+    front (waiting up to busy_timeout) rather than failing with "database is
+    locked" when a deferred transaction tries to upgrade. Reader connections are
+    query_only, so nothing on the read path can take the write lock.
+    """
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself (see the "begin" listener below)
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_MB * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if not writer:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    
+    @event.listens_for(engine, "begin")
+    def begin_transaction(conn):
+        with untracked():  # transaction control, not a query the request made
+            conn.exec_driver_sql("BEGIN IMMEDIATE" if writer else "BEGIN")
+
+
+SQLITE_PRODUCTION = settings.SQLITE_PROFILE == "production" and is_sqlite_file(settings.DATABASE_URL)
+
+# A single pooled connection is the write queue: sessions wait for it in
+# pool order, so writes in this worker never contend for SQLite's lock
+WRITER_POOL = {"pool_size": 1, "max_overflow": 0} if SQLITE_PRODUCTION else {}
+
+engine = create_db_engine(settings.DATABASE_URL, **WRITER_POOL)
+if SQLITE_PRODUCTION:
+    apply_sqlite_profile(engine, writer=True)
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Optional read replica for reports, exports and catalog reads. With the SQLite
+# production profile and no replica, reads use separate connections to the same
+# file; WAL readers see every committed write, so there is no lag to check.
+if settings.DATABASE_READ_URL:
+    read_engine = create_db_engine(settings.DATABASE_READ_URL)
+    replica_monitor = ReplicaMonitor(
+        read_engine,
+        max_lag_seconds=settings.READ_REPLICA_MAX_LAG_SECONDS,
+        check_seconds=settings.READ_REPLICA_CHECK_SECONDS
     )
+elif SQLITE_PRODUCTION:
+    read_engine = create_db_engine(settings.DATABASE_URL)
+    apply_sqlite_profile(read_engine, writer=False)
+    replica_monitor = None
 else:
-    engine = create_engine(settings.DATABASE_URL)
+    read_engine = None
+    replica_monitor = None
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine) if read_engine else None
+
+# Async engines (DB_ASYNC=true): routes on get_async_db talk to the database from
+# the event loop instead of occupying a threadpool slot per request
+if settings.DB_ASYNC:
+    async_engine = create_async_db_engine(settings.DATABASE_URL, **WRITER_POOL)
+    if SQLITE_PRODUCTION:
+        apply_sqlite_profile(async_engine.sync_engine, writer=True)
+    if settings.DATABASE_READ_URL or SQLITE_PRODUCTION:
+        async_read_engine = create_async_db_engine(settings.DATABASE_READ_URL or settings.DATABASE_URL)
+        if not settings.DATABASE_READ_URL:
+            apply_sqlite_profile(async_read_engine.sync_engine, writer=False)
+    else:
+        async_read_engine = None
+else:
+    async_engine = None
+    async_read_engine = None
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) if async_engine else None
+
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False) if async_read_engine else None
 
 
 def get_db():
@@ -20,3 +159,150 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def read_session():
+    """Session on the read engine when it is reachable and within lag tolerance, else on the primary"""
+    if ReadSessionLocal is not None and (replica_monitor is None or replica_monitor.is_usable()):
+        return ReadSessionLocal()
+    return SessionLocal()
+
+
+def get_read_db():
+    """Dependency for read-only routes; never write through this session"""
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _prebuffered(execution_options) -> dict:
+    # Fetch every row (and run eager loads) in the worker thread, as AsyncSession
+    # does; consuming a live cursor on the event loop would do I/O there
+    return {**(execution_options or {}), "prebuffer_rows": True}
+
+
+class SyncSessionAdapter:
+    """
+    The AsyncSession API over a regular Session, for deployments with DB_ASYNC off.
+
+    Each awaited call runs in the threadpool, so routes written against
+    get_async_db work unchanged on either setting.
+    """
+    
+    def __init__(self, session: Session):
+        self.sync_session = session
+    
+    def add(self, instance):
+        self.sync_session.add(instance)
+    
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+    
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+    
+    async def execute(self, statement, params=None, execution_options=None, **kwargs):
+        return await run_in_threadpool(
+            self.sync_session.execute, statement, params, execution_options=_prebuffered(execution_options), **kwargs
+        )
+    
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+    
+    async def scalars(self, statement, params=None, execution_options=None, **kwargs):
+        return await run_in_threadpool(
+            self.sync_session.scalars, statement, params, execution_options=_prebuffered(execution_options), **kwargs
+        )
+    
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+    
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+    
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+    
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+    
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+    
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+    
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+_adapter_slots = {}
+
+
+def _pool_capacity(bind) -> Optional[int]:
+    pool = bind.pool
+    if isinstance(pool, QueuePool):
+        return pool.size() + max(pool._max_overflow, 0)
+    return None
+
+
+@asynccontextmanager
+async def _adapted_session(maker):
+    """
+    Open a SyncSessionAdapter once its engine has a free connection.
+
+    The adapter hops into the threadpool for every call while holding a pooled
+    connection, so if threads could block on an exhausted pool, the requests
+    holding connections would wait for a thread that never frees up. Queueing
+    here, on the event loop, keeps pool waits out of the threadpool.
+    """
+    bind = maker.kw["bind"]
+    if bind not in _adapter_slots:
+        capacity = _pool_capacity(bind)
+        _adapter_slots[bind] = asyncio.Semaphore(capacity) if capacity else None
+    slots = _adapter_slots[bind]
+    if slots:
+        await slots.acquire()
+    db = SyncSessionAdapter(maker(expire_on_commit=False))
+    try:
+        yield db
+    finally:
+        await db.close()
+        if slots:
+            slots.release()
+
+
+@asynccontextmanager
+async def async_session():
+    """
+    get_async_db as a context manager, for routes that do slow non-database work
+    (password hashing) and must not hold a pooled connection while they wait
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    async with _adapted_session(SessionLocal) as db:
+        yield db
+
+
+async def get_async_db():
+    """Awaitable session: a real AsyncSession with DB_ASYNC on, otherwise a threadpool-backed adapter"""
+    async with async_session() as db:
+        yield db
+
+
+async def get_async_read_db():
+    """Read-only counterpart of get_async_db, following the same replica rules as get_read_db"""
+    use_replica = ReadSessionLocal is not None and (
+        replica_monitor is None or await replica_monitor.is_usable_async()
+    )
+    if AsyncSessionLocal is not None:
+        maker = AsyncReadSessionLocal if use_replica and AsyncReadSessionLocal else AsyncSessionLocal
+        async with maker() as db:
+            yield db
+        return
+    async with _adapted_session(ReadSessionLocal if use_replica else SessionLocal) as db:
+        yield db
@@ -1,31 +1,98 @@
+import asyncio
+import time
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from .core.cors import setup_cors
+from .core.body_limit import setup_body_limit
+from .core.server_timing import setup_server_timing
+from .core.metrics import setup_metrics
+from .core.passwords import password_hasher
+from .core.thumbnails import thumbnail_renderer
 from .core.config import settings
 from .db.session import SessionLocal, engine
-from .db.base import Base
-from .db.init_db import init_db
+from .db.replica import run_heartbeat_writer
+from .db.init_db import check_schema, init_schema, seed_db
 from .routes import auth, categories, products, packs, orders, admin, uploads
-from .routes import admin_categories, admin_packs
+from .routes import admin_categories, admin_packs, admin_inventory, admin_exports, admin_metrics
 from .services.sms import init_sms_service
+from .services.inventory import on_low_stock, sms_low_stock_listener
+from .services.sales_ranking import run_sales_ranking_refresher
+from .services.refresh_tokens import run_refresh_token_purge, run_revocation_sync
+from .services.upload_files import run_upload_archiver, run_upload_gc
+
+
+class StartupTimer:
+    """Prints how long each startup phase took"""
+    
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+    
+    def phase(self, name: str):
+        now = time.perf_counter()
+        print(f"Startup: {name} took {(now - self.last) * 1000:.0f} ms")
+        self.last = now
+    
+    def done(self):
+        print(f"Startup: ready in {(time.perf_counter() - self.started) * 1000:.0f} ms")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: create tables and seed data
-    Base.metadata.create_all(bind=engine)
+    timer = StartupTimer()
+    
+    # Startup: create tables (unless migrations run out of band) and seed data
+    if settings.SKIP_SCHEMA_INIT:
+        check_schema(engine)
+        timer.phase("schema check")
+    else:
+        init_schema(engine)
+        timer.phase("schema init")
+    
     db = SessionLocal()
     try:
-        init_db(db)
+        seed_db(db)
     finally:
         db.close()
+    timer.phase("seed")
     
     # Initialize SMS service
     if settings.AT_USERNAME and settings.AT_API_KEY:
         init_sms_service(settings.AT_USERNAME, settings.AT_API_KEY)
+        if settings.LOW_STOCK_ALERT_PHONE:
+            on_low_stock(sms_low_stock_listener)
+        timer.phase("sms")
+    
+    # Keep best-seller rankings fresh (ages out old days, merges other workers' sales)
+    ranking_task = asyncio.create_task(
+        run_sales_ranking_refresher(settings.SALES_RANKING_REFRESH_SECONDS)
+    )
+    
+    # Revoked refresh tokens: load once, then pick up revocations made by other workers
+    revocation_task = asyncio.create_task(
+        run_revocation_sync(settings.REFRESH_REVOCATION_SYNC_SECONDS)
+    )
+    
+    background_tasks = [ranking_task, revocation_task]
+    if settings.REFRESH_TOKEN_PURGE_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_refresh_token_purge(settings.REFRESH_TOKEN_PURGE_SECONDS)))
+    # Orphaned receipt files on local storage, abandoned direct uploads on s3
+    if settings.UPLOAD_GC_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_upload_gc(settings.UPLOAD_GC_INTERVAL_SECONDS)))
+    # Old receipts move to the compressed archive segments
+    if settings.UPLOAD_DRIVER == "local" and settings.UPLOAD_ARCHIVE_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_upload_archiver(settings.UPLOAD_ARCHIVE_INTERVAL_SECONDS)))
+    if settings.DATABASE_READ_URL:
+        background_tasks.append(asyncio.create_task(
+            run_heartbeat_writer(engine, settings.READ_REPLICA_HEARTBEAT_SECONDS)
+        ))
+    timer.done()
     
     yield
     # Shutdown
+    for task in background_tasks:
+        task.cancel()
+    password_hasher.shutdown()
+    thumbnail_renderer.shutdown()
 
 
 app = FastAPI(
@@ -35,8 +102,11 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Setup CORS
+# Setup CORS (outside the body limit, so 413s carry CORS headers)
+setup_body_limit(app)
 setup_cors(app)
+setup_server_timing(app)
+setup_metrics(app)
 
 # Include routers with /api prefix
 app.include_router(auth.router, prefix="/api")
@@ -47,6 +117,9 @@ app.include_router(orders.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
 app.include_router(admin_categories.router, prefix="/api")
 app.include_router(admin_packs.router, prefix="/api")
+app.include_router(admin_inventory.router, prefix="/api")
+app.include_router(admin_exports.router, prefix="/api")
+app.include_router(admin_metrics.router, prefix="/api")
 app.include_router(uploads.router, prefix="/api")
 
 
@@ -5,6 +5,11 @@ from .pack import Pack, PackVariant, PackVariantItem
 from .order import Order, OrderItem
 from .payment import Payment
 from .receipt import Receipt
+from .sales import SalesDaily
+from .heartbeat import ReplicaHeartbeat
+from .refresh_token import RefreshToken
+from .stored_file import StoredFile
+from .archived_file import ArchivedFile
 
 __all__ = [
     "User",
@@ -16,5 +21,10 @@ __all__ = [
     "Order",
     "OrderItem",
     "Payment",
-    "Receipt"
+    "Receipt",
+    "SalesDaily",
+    "ReplicaHeartbeat",
+    "RefreshToken",
+    "StoredFile",
+    "ArchivedFile"
 ]
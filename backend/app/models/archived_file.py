@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime
+from datetime import datetime, timezone
+from ..db.base import Base
+
+
+class ArchivedFile(Base):
+    """
+    Where a cold upload lives in the archive segments (services.receipt_archive):
+    the stored bytes are `stored_size` bytes at `offset` in segment `segment`
+    """
+    __tablename__ = "archived_files"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    file_key = Column(String(255), nullable=False, unique=True)
+    segment = Column(Integer, nullable=False)
+    offset = Column(BigInteger, nullable=False)
+    stored_size = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=False)  # Original size
+    compressed = Column(Boolean, nullable=False, default=False)  # zlib; kept raw when that doesn't save space
+    crc32 = Column(BigInteger, nullable=False)  # Of the original bytes
+    archived_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
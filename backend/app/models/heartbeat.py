@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, DateTime
+from ..db.base import Base
+
+
+class ReplicaHeartbeat(Base):
+    """Single row bumped on the primary; its age on a replica is the replication lag"""
+    __tablename__ = "replica_heartbeat"
+    
+    id = Column(Integer, primary_key=True)
+    beat_at = Column(DateTime, nullable=False)  # Naive UTC
@@ -8,12 +8,12 @@ class Order(Base):
     __tablename__ = "orders"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    status = Column(String(50), default="pending")  # pending, paid, confirmed, cancelled
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String(50), default="pending", index=True)  # pending, paid, confirmed, cancelled
     total_amount = Column(Integer, nullable=False)
     delivery_address = Column(Text, nullable=False)
     phone = Column(String(50), nullable=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
@@ -25,8 +25,9 @@ class OrderItem(Base):
     __tablename__ = "order_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=True)
+    pack_variant_id = Column(Integer, ForeignKey("pack_variants.id"), nullable=True)
     name_snapshot = Column(String(255), nullable=False)
     unit_price = Column(Integer, nullable=False)
     qty = Column(Integer, nullable=False)
@@ -18,7 +18,7 @@ class PackVariant(Base):
     __tablename__ = "pack_variants"
     
     id = Column(Integer, primary_key=True, index=True)
-    pack_id = Column(Integer, ForeignKey("packs.id"), nullable=False)
+    pack_id = Column(Integer, ForeignKey("packs.id"), nullable=False, index=True)
     name = Column(String(255), nullable=False)
     price = Column(Integer, nullable=False)
     
@@ -30,7 +30,7 @@ class PackVariantItem(Base):
     __tablename__ = "pack_variant_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    variant_id = Column(Integer, ForeignKey("pack_variants.id"), nullable=False)
+    variant_id = Column(Integer, ForeignKey("pack_variants.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     qty = Column(Integer, nullable=False)
     
@@ -8,7 +8,7 @@ class Payment(Base):
     __tablename__ = "payments"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     method = Column(String(50), default="etransfer")  # etransfer, bank, cash, paystack, stripe
     reference = Column(String(255), nullable=True)
     status = Column(String(50), default="pending")  # pending, verified, failed
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Index, and_
 from sqlalchemy.orm import relationship
 from ..db.base import Base
+from ..core.config import settings
 
 
 class Product(Base):
@@ -13,5 +14,24 @@ class Product(Base):
     image_url = Column(String(500), nullable=True)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     is_active = Column(Boolean, default=True)
+    reorder_threshold = Column(Integer, nullable=False, default=settings.DEFAULT_REORDER_THRESHOLD)
+    low_stock_alerted = Column(Boolean, nullable=False, default=False)  # Set once an alert fired, cleared on restock
     
     category = relationship("Category", back_populates="products")
+    
+    __table_args__ = (
+        Index("ix_products_category_id_is_active", "category_id", "is_active"),
+    )
+
+
+# Queries must use this exact clause so the planner can match the partial index below
+LOW_STOCK_CLAUSE = and_(Product.is_active == True, Product.stock_qty <= Product.reorder_threshold)
+
+# Partial index: only rows that are currently low on stock are indexed,
+# so the low-stock feed stays a tiny index scan however big the catalog gets.
+Index(
+    "ix_products_low_stock",
+    Product.stock_qty,
+    sqlite_where=LOW_STOCK_CLAUSE,
+    postgresql_where=LOW_STOCK_CLAUSE,
+)
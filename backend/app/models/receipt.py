@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from ..db.base import Base
@@ -8,13 +8,21 @@ class Receipt(Base):
     __tablename__ = "receipts"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     file_url = Column(String(500), nullable=False)
     file_key = Column(String(255), nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the file, see StoredFile
+    thumbnail_url = Column(String(500), nullable=True)  # Filled in after upload, see core.thumbnails
+    preview_url = Column(String(500), nullable=True)
     uploaded_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     status = Column(String(50), default="submitted")  # submitted, approved, rejected
     admin_note = Column(Text, nullable=True)
     
     order = relationship("Order", back_populates="receipts")
     user = relationship("User", back_populates="receipts")
+    
+    __table_args__ = (
+        # The admin review queue: one status, oldest first, paged by (uploaded_at, id)
+        Index("ix_receipts_status_uploaded_at", "status", "uploaded_at", "id"),
+    )
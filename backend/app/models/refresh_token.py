@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from ..db.base import Base
+
+
+class RefreshToken(Base):
+    """
+    One issued refresh token. Each login starts a family; every refresh
+    revokes the presented token (reason "rotated") and issues the next one in
+    the same family. Presenting a rotated token again revokes the family.
+    """
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(32), nullable=False, unique=True)
+    family = Column(String(32), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    issued_at = Column(DateTime, nullable=False)  # Naive UTC, like expires_at and revoked_at
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=True, index=True)
+    revoke_reason = Column(String(20), nullable=True)  # rotated, logout, logout_all, reuse
+    replaced_by = Column(String(32), nullable=True)  # jti issued when this one was rotated
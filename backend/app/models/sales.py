@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Date, UniqueConstraint
+from ..db.base import Base
+
+
+class SalesDaily(Base):
+    """Units and revenue sold per product / pack variant per UTC day"""
+    __tablename__ = "sales_daily"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    item_type = Column(String(20), nullable=False)  # product, pack_variant
+    item_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False, index=True)
+    qty = Column(Integer, nullable=False, default=0)
+    revenue = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint("item_type", "item_id", "day", name="uq_sales_daily_item_day"),
+    )
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime, timezone
+from ..db.base import Base
+
+
+class StoredFile(Base):
+    """
+    One stored copy of an uploaded file, addressed by the SHA-256 of its
+    content. Every record pointing at the same content shares it; ref_count is
+    how many do.
+    """
+    __tablename__ = "stored_files"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), nullable=False, unique=True)
+    file_key = Column(String(255), nullable=False)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    thumbnail_key = Column(String(255), nullable=True)  # Set once the renditions exist
+    preview_key = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
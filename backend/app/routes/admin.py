@@ -1,19 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import List, Literal, Optional
 from datetime import datetime, timezone
-from ..db.session import get_db
+from ..db.session import get_db, get_read_db
 from ..models.order import Order, OrderItem
 from ..models.product import Product
 from ..models.category import Category
 from ..models.receipt import Receipt
 from ..models.payment import Payment
-from ..models.user import User
 from ..schemas.order import OrderResponse, OrderListResponse, OrderItemResponse, OrderStatusUpdate
-from ..schemas.product import ProductCreate, ProductUpdate, ProductResponse
-from ..schemas.receipt import ReceiptResponse, ReceiptStatusUpdate, PaymentResponse, PaymentStatusUpdate
+from ..schemas.product import ProductCreate, ProductUpdate, ProductResponse, TopSellerReport
+from ..schemas.receipt import ReceiptResponse, ReceiptStatusUpdate, ReceiptQueuePage, PaymentResponse, PaymentStatusUpdate
 from ..core.security import get_admin_user
+from ..core.signed_urls import sign_upload_url
 from ..services.sms import get_sms_service
+from ..services.inventory import sync_low_stock_state, emit_low_stock
+from ..services.receipt_queue import receipt_queue
+from ..services.sales_ranking import publish_sales, record_status_change, sales_ranking, WINDOWS
+from ..services.user_profiles import load_user_profile
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -23,22 +28,23 @@ router = APIRouter(prefix="/admin", tags=["Admin"])
 @router.get("/orders", response_model=List[OrderListResponse])
 def get_all_orders(
     current_user: dict = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    orders = db.query(Order).order_by(Order.created_at.desc()).all()
+    item_count = (
+        db.query(func.count(OrderItem.id)).filter(OrderItem.order_id == Order.id).correlate(Order).scalar_subquery()
+    )
+    rows = db.query(Order, item_count).order_by(Order.created_at.desc()).all()
     
-    result = []
-    for order in orders:
-        items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-        result.append(OrderListResponse(
+    return [
+        OrderListResponse(
             id=order.id,
             status=order.status,
             total_amount=order.total_amount,
             created_at=order.created_at,
-            item_count=len(items)
-        ))
-    
-    return result
+            item_count=count
+        )
+        for order, count in rows
+    ]
 
 
 @router.get("/orders/{order_id}")
@@ -47,14 +53,26 @@ def get_order_detail(
     current_user: dict = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = (
+        db.query(Order)
+        .options(joinedload(Order.user), selectinload(Order.items))
+        .filter(Order.id == order_id)
+        .first()
+    )
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
+    items = order.items
+    user = order.user
     receipt = db.query(Receipt).filter(Receipt.order_id == order.id).order_by(Receipt.uploaded_at.desc()).first()
     payment = db.query(Payment).filter(Payment.order_id == order.id).first()
-    user = db.query(User).filter(User.id == order.user_id).first()
+    # The same file attached to other orders: a re-used bank receipt
+    reused_on_orders = [
+        order_id for (order_id,) in
+        db.query(Receipt.order_id)
+        .filter(Receipt.content_hash == receipt.content_hash, Receipt.order_id != order.id)
+        .distinct().order_by(Receipt.order_id)
+    ] if receipt and receipt.content_hash else []
     
     return {
         "id": order.id,
@@ -79,10 +97,14 @@ def get_order_detail(
         ],
         "receipt": {
             "id": receipt.id,
-            "file_url": receipt.file_url,
+            "file_url": sign_upload_url(receipt.file_url),
+            "thumbnail_url": sign_upload_url(receipt.thumbnail_url),
+            "preview_url": sign_upload_url(receipt.preview_url),
             "status": receipt.status,
             "admin_note": receipt.admin_note,
-            "uploaded_at": receipt.uploaded_at.isoformat()
+            "uploaded_at": receipt.uploaded_at.isoformat(),
+            "content_hash": receipt.content_hash,
+            "reused_on_orders": reused_on_orders
         } if receipt else None,
         "payment": {
             "id": payment.id,
@@ -111,12 +133,14 @@ def update_order_status(
     
     old_status = order.status
     order.status = data.status
+    sales = record_status_change(db, order, old_status, data.status)
     db.commit()
+    publish_sales(sales)
     
     # Send SMS notification for status change
     sms = get_sms_service()
     if sms and old_status != data.status:
-        user = db.query(User).filter(User.id == order.user_id).first()
+        user = load_user_profile(db, order.user_id)
         customer_name = user.full_name if user else "Customer"
         
         if data.status == "paid":
@@ -138,15 +162,11 @@ def get_all_products(
     current_user: dict = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    products = db.query(Product).all()
+    products = db.query(Product).options(joinedload(Product.category)).all()
     
     result = []
     for p in products:
-        category_name = None
-        if p.category_id:
-            cat = db.query(Category).filter(Category.id == p.category_id).first()
-            if cat:
-                category_name = cat.name
+        category_name = p.category.name if p.category else None
         
         result.append(ProductResponse(
             id=p.id,
@@ -156,6 +176,7 @@ def get_all_products(
             image_url=p.image_url,
             category_id=p.category_id,
             is_active=p.is_active,
+            reorder_threshold=p.reorder_threshold,
             category_name=category_name
         ))
     
@@ -169,9 +190,13 @@ def create_product(
     db: Session = Depends(get_db)
 ):
     product = Product(**data.model_dump())
+    product.low_stock_alerted = False
+    crossed = sync_low_stock_state(product)
     db.add(product)
     db.commit()
     db.refresh(product)
+    if crossed:
+        emit_low_stock([product])
     
     category_name = None
     if product.category_id:
@@ -187,6 +212,7 @@ def create_product(
         image_url=product.image_url,
         category_id=product.category_id,
         is_active=product.is_active,
+        reorder_threshold=product.reorder_threshold,
         category_name=category_name
     )
 
@@ -206,8 +232,11 @@ def update_product(
     for key, value in update_data.items():
         setattr(product, key, value)
     
+    crossed = sync_low_stock_state(product)
     db.commit()
     db.refresh(product)
+    if crossed:
+        emit_low_stock([product])
     
     category_name = None
     if product.category_id:
@@ -223,6 +252,7 @@ def update_product(
         image_url=product.image_url,
         category_id=product.category_id,
         is_active=product.is_active,
+        reorder_threshold=product.reorder_threshold,
         category_name=category_name
     )
 
@@ -246,6 +276,18 @@ def delete_product(
 
 # ===== RECEIPTS =====
 
+@router.get("/receipts", response_model=ReceiptQueuePage)
+def get_receipt_queue(
+    status: Literal["submitted", "approved", "rejected"] = Query("submitted"),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    current_user: dict = Depends(get_admin_user),
+    db: Session = Depends(get_read_db)
+):
+    """Receipts awaiting review (or in another status), oldest first; follow next_cursor for more"""
+    return receipt_queue(db, status, limit, cursor)
+
+
 @router.patch("/receipts/{receipt_id}")
 def update_receipt_status(
     receipt_id: int,
@@ -267,7 +309,7 @@ def update_receipt_status(
     
     # Get order and user for SMS
     order = db.query(Order).filter(Order.id == receipt.order_id).first()
-    user = db.query(User).filter(User.id == receipt.user_id).first()
+    user = load_user_profile(db, receipt.user_id)
     customer_name = user.full_name if user else "Customer"
     
     # If approved, update payment and order status
@@ -322,3 +364,17 @@ def update_payment_status(
     db.commit()
     
     return {"message": "Payment status updated", "status": payment.status}
+
+
+# ===== REPORTS =====
+
+@router.get("/reports/top-sellers")
+def get_top_sellers_report(
+    limit: int = Query(20, ge=1, le=50),
+    item_type: Optional[Literal["product", "pack_variant"]] = Query(None),
+    current_user: dict = Depends(get_admin_user)
+):
+    return {
+        f"{window}d": [TopSellerReport(**r) for r in sales_ranking.top(window, limit, item_type)]
+        for window in WINDOWS
+    }
@@ -0,0 +1,25 @@
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from ..core.security import get_admin_user
+from ..services.exports import iter_orders_csv
+
+router = APIRouter(prefix="/admin/exports", tags=["Admin Exports"])
+
+
+@router.get("/orders.csv")
+def export_orders_csv(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    current_user: dict = Depends(get_admin_user)
+):
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must be on or before 'to'")
+    
+    filename = f"orders_{from_date or 'start'}_{to_date or 'now'}.csv"
+    return StreamingResponse(
+        iter_orders_csv(from_date, to_date),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+from ..db.session import get_db, get_read_db
+from ..models.product import Product
+from ..schemas.product import ProductResponse, BulkStockUpdate
+from ..core.security import get_admin_user
+from ..services.inventory import get_low_stock_products, bulk_update_stock
+
+router = APIRouter(prefix="/admin/inventory", tags=["Admin Inventory"])
+
+
+def _product_response(p: Product) -> ProductResponse:
+    return ProductResponse(
+        id=p.id,
+        name=p.name,
+        price=p.price,
+        stock_qty=p.stock_qty,
+        image_url=p.image_url,
+        category_id=p.category_id,
+        is_active=p.is_active,
+        reorder_threshold=p.reorder_threshold,
+        category_name=p.category.name if p.category else None
+    )
+
+
+@router.get("/low-stock", response_model=List[ProductResponse])
+def get_low_stock(
+    current_user: dict = Depends(get_admin_user),
+    db: Session = Depends(get_read_db)
+):
+    return [_product_response(p) for p in get_low_stock_products(db)]
+
+
+@router.patch("/stock", response_model=List[ProductResponse])
+def update_stock_levels(
+    data: BulkStockUpdate,
+    current_user: dict = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    updates = {item.product_id: item.stock_qty for item in data.items}
+    if any(qty < 0 for qty in updates.values()):
+        raise HTTPException(status_code=400, detail="Stock quantity cannot be negative")
+    
+    found = {pid for (pid,) in db.query(Product.id).filter(Product.id.in_(list(updates))).all()}
+    missing = set(updates) - found
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Products not found: {sorted(missing)}")
+    
+    products = bulk_update_stock(db, updates)
+    return [_product_response(p) for p in products]
@@ -0,0 +1,25 @@
+import os
+from fastapi import APIRouter, Depends
+from ..core.config import settings
+from ..core.security import get_admin_user
+from ..db.pool_metrics import pool_status
+from ..db.session import async_engine, async_read_engine, engine, read_engine, replica_monitor
+
+router = APIRouter(prefix="/admin/metrics", tags=["Admin Metrics"])
+
+
+@router.get("")
+def get_metrics(current_user: dict = Depends(get_admin_user)):
+    """Runtime metrics for the worker process that served this request"""
+    return {
+        "pid": os.getpid(),
+        "db_pool": {
+            "primary": pool_status(engine),
+            "replica": pool_status(read_engine),
+            "async_primary": pool_status(async_engine),
+            "async_replica": pool_status(async_read_engine),
+            "replica_in_use": replica_monitor.is_usable() if replica_monitor else False,
+            "replica_lag_seconds": replica_monitor.lag_seconds if replica_monitor else None,
+            "statement_timeout_ms": settings.DB_STATEMENT_TIMEOUT_MS or None,
+        },
+    }
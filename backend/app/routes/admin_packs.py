@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 from pydantic import BaseModel
 from ..db.session import get_db
@@ -46,19 +46,21 @@ def get_all_packs(
     current_user: dict = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    packs = db.query(Pack).all()
+    packs = (
+        db.query(Pack)
+        .options(selectinload(Pack.variants).selectinload(PackVariant.items).selectinload(PackVariantItem.product))
+        .all()
+    )
     result = []
     
     for pack in packs:
-        variants = db.query(PackVariant).filter(PackVariant.pack_id == pack.id).all()
         variant_data = []
         
-        for variant in variants:
-            items = db.query(PackVariantItem).filter(PackVariantItem.variant_id == variant.id).all()
+        for variant in pack.variants:
             item_data = []
             
-            for item in items:
-                product = db.query(Product).filter(Product.id == item.product_id).first()
+            for item in variant.items:
+                product = item.product
                 item_data.append({
                     "id": item.id,
                     "product_id": item.product_id,
@@ -79,7 +81,7 @@ def get_all_packs(
             "description": pack.description,
             "is_active": pack.is_active,
             "variants": variant_data,
-            "variant_count": len(variants)
+            "variant_count": len(variant_data)
         })
     
     return result
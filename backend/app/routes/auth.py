@@ -1,23 +1,39 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..db.session import get_db
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from ..db.session import async_session
 from ..models.user import User
 from ..schemas.auth import (
     RegisterRequest, LoginRequest, TokenResponse, 
     RefreshRequest, UserResponse
 )
-from ..core.security import (
-    hash_password, verify_password, create_access_token,
-    create_refresh_token, decode_token, get_current_user
-)
+from ..core.passwords import password_hasher
+from ..core.security import create_access_token, decode_token, get_current_user, security
+from ..core.token_cache import token_cache, token_key
+from ..core.config import settings
+from ..core.rate_limit import limit_per_ip, rate_limiter
+from ..services.refresh_tokens import revoke_family, revoke_user_sessions, rotate_refresh_token, start_session
+from ..services.user_profiles import get_user_profile, user_profiles
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
-@router.post("/register", response_model=UserResponse)
-def register(data: RegisterRequest, db: Session = Depends(get_db)):
+# register and login hash in the password pool (core/passwords.py) and open a
+# session only around their queries, so no pooled connection waits on bcrypt.
+# Their rate limits are dependencies, checked before either happens.
+
+def limit_login_per_account(data: LoginRequest):
+    rate_limiter.check("login", "account", data.email.lower(), settings.RATE_LIMIT_LOGIN_PER_ACCOUNT)
+
+
+@router.post("/register", response_model=UserResponse, dependencies=[
+    Depends(limit_per_ip("register", "RATE_LIMIT_REGISTER_PER_IP"))
+])
+async def register(data: RegisterRequest):
     # Check if email exists
-    existing = db.query(User).filter(User.email == data.email).first()
+    async with async_session() as db:
+        existing = await db.scalar(select(User).where(User.email == data.email))
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -25,23 +41,37 @@ def register(data: RegisterRequest, db: Session = Depends(get_db)):
         )
     
     # Create user
-    user = User(
-        email=data.email,
-        password_hash=hash_password(data.password),
-        full_name=data.full_name,
-        role="customer"
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    password_hash = await password_hasher.hash(data.password)
+    async with async_session() as db:
+        user = User(
+            email=data.email,
+            password_hash=password_hash,
+            full_name=data.full_name,
+            role="customer"
+        )
+        db.add(user)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Registered by a concurrent request since the check above
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
+        await db.refresh(user)
     
     return user
 
 
-@router.post("/login", response_model=TokenResponse)
-def login(data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
-    if not user or not verify_password(data.password, user.password_hash):
+@router.post("/login", response_model=TokenResponse, dependencies=[
+    Depends(limit_per_ip("login", "RATE_LIMIT_LOGIN_PER_IP")), Depends(limit_login_per_account)
+])
+async def login(data: LoginRequest):
+    async with async_session() as db:
+        user = await db.scalar(select(User).where(User.email == data.email))
+    valid, needs_rehash = await password_hasher.verify(data.password, user.password_hash) if user else (False, False)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -52,10 +82,24 @@ def login(data: LoginRequest, db: Session = Depends(get_db)):
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Account is disabled"
         )
+    user_profiles.put(user)  # warm the cache get_current_user reads
+    
+    # Hash was made at an older BCRYPT_ROUNDS: upgrade it while we have the password.
+    # Skipped (and retried next login) if the hashing pool is saturated.
+    if needs_rehash:
+        try:
+            password_hash = await password_hasher.hash(data.password)
+        except HTTPException:
+            password_hash = None
+        if password_hash:
+            async with async_session() as db:
+                await db.execute(update(User).where(User.id == user.id).values(password_hash=password_hash))
+                await db.commit()
     
     token_data = {"sub": str(user.id), "email": user.email, "role": user.role}
     access_token = create_access_token(token_data)
-    refresh_token = create_refresh_token(token_data)
+    async with async_session() as db:
+        refresh_token = await db.run_sync(start_session, user.id, token_data)
     
     return TokenResponse(
         access_token=access_token,
@@ -63,17 +107,22 @@ def login(data: LoginRequest, db: Session = Depends(get_db)):
     )
 
 
-@router.post("/refresh", response_model=TokenResponse)
-def refresh_token(data: RefreshRequest, db: Session = Depends(get_db)):
-    payload = decode_token(data.refresh_token)
-    if payload.get("type") != "refresh":
+def decode_refresh_token(token: str) -> dict:
+    payload = decode_token(token)
+    if payload.get("type") != "refresh" or not payload.get("jti") or not payload.get("fam"):
+        # Tokens from before rotation have no jti/fam; they can't be tracked, so they aren't honoured
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token"
         )
+    return payload
+
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh_token(data: RefreshRequest):
+    payload = decode_refresh_token(data.refresh_token)
     
-    user_id = int(payload.get("sub"))
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await get_user_profile(int(payload.get("sub")))
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -81,8 +130,10 @@ def refresh_token(data: RefreshRequest, db: Session = Depends(get_db)):
         )
     
     token_data = {"sub": str(user.id), "email": user.email, "role": user.role}
+    # The presented token is revoked and its successor issued in one transaction
+    async with async_session() as db:
+        new_refresh_token = await db.run_sync(rotate_refresh_token, payload, token_data)
     access_token = create_access_token(token_data)
-    new_refresh_token = create_refresh_token(token_data)
     
     return TokenResponse(
         access_token=access_token,
@@ -90,13 +141,36 @@ def refresh_token(data: RefreshRequest, db: Session = Depends(get_db)):
     )
 
 
-@router.get("/me", response_model=UserResponse)
-def get_me(
-    current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@router.post("/logout")
+async def logout(
+    data: RefreshRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: dict = Depends(get_current_user)
 ):
-    user_id = int(current_user.get("sub"))
-    user = db.query(User).filter(User.id == user_id).first()
+    """End this session: its refresh-token family and the access token used here"""
+    payload = decode_refresh_token(data.refresh_token)
+    if payload.get("sub") != current_user.get("sub"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Refresh token belongs to another user"
+        )
+    async with async_session() as db:
+        await db.run_sync(revoke_family, payload["fam"], "logout")
+    token_cache.revoke(token_key(credentials.credentials), current_user["exp"])
+    return {"message": "Logged out"}
+
+
+@router.post("/logout-all")
+async def logout_all(current_user: dict = Depends(get_current_user)):
+    """End every session of the user, on every device"""
+    async with async_session() as db:
+        await db.run_sync(revoke_user_sessions, int(current_user.get("sub")))
+    return {"message": "Logged out everywhere"}
+
+
+@router.get("/me", response_model=UserResponse)
+async def get_me(current_user: dict = Depends(get_current_user)):
+    user = await get_user_profile(int(current_user.get("sub")))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from ..db.session import get_db
+from ..db.session import get_async_read_db
 from ..models.category import Category
 from ..schemas.category import CategoryResponse
 
@@ -9,6 +10,6 @@ router = APIRouter(prefix="/categories", tags=["Categories"])
 
 
 @router.get("", response_model=List[CategoryResponse])
-def get_categories(db: Session = Depends(get_db)):
-    categories = db.query(Category).all()
+async def get_categories(db: AsyncSession = Depends(get_async_read_db)):
+    categories = (await db.scalars(select(Category))).all()
     return categories
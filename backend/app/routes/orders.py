@@ -1,140 +1,108 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List
-from ..db.session import get_db
+from ..db.session import get_async_db
 from ..models.order import Order, OrderItem
-from ..models.product import Product
-from ..models.pack import PackVariant, PackVariantItem
-from ..models.payment import Payment
 from ..models.receipt import Receipt
-from ..models.user import User
 from ..schemas.order import OrderCreate, OrderResponse, OrderListResponse, OrderItemResponse
-from ..schemas.receipt import ReceiptResponse
+from ..schemas.receipt import ReceiptResponse, DirectUploadRequest, DirectUploadResponse, DirectUploadComplete
 from ..core.security import get_current_user
-from ..services.inventory import check_stock, reduce_stock
-from ..services.receipts import save_receipt_file
+from ..core.rate_limit import limit_per_account
+from ..services.inventory import emit_low_stock
+from ..services.orders import checkout
+from ..services.sales_ranking import publish_sales
+from ..services.receipts import (
+    receipt_response, save_receipt_file, schedule_renditions, create_direct_upload, complete_direct_upload,
+    direct_upload_driver
+)
 from ..services.sms import get_sms_service
+from ..services.user_profiles import load_user_profile
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
 
-@router.post("", response_model=OrderResponse)
-async def create_order(
-    data: OrderCreate,
-    current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    user_id = int(current_user.get("sub"))
-    
-    order_items = []
-    total_amount = 0
+async def get_visible_order(db: AsyncSession, order_id: int, current_user: dict) -> Order:
+    """Load an order, enforcing that non-admin users only see their own"""
+    order = await db.get(Order, order_id)
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
     
-    for item in data.items:
-        if item.product_id:
-            # Regular product
-            product = db.query(Product).filter(
-                Product.id == item.product_id,
-                Product.is_active == True
-            ).first()
-            
-            if not product:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Product {item.product_id} not found"
-                )
-            
-            if not check_stock(db, product.id, item.qty):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Insufficient stock for {product.name}"
-                )
-            
-            line_total = product.price * item.qty
-            order_items.append({
-                "product_id": product.id,
-                "name_snapshot": product.name,
-                "unit_price": product.price,
-                "qty": item.qty,
-                "line_total": line_total
-            })
-            total_amount += line_total
-            
-        elif item.pack_variant_id:
-            # Pack variant
-            variant = db.query(PackVariant).filter(
-                PackVariant.id == item.pack_variant_id
-            ).first()
-            
-            if not variant:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Pack variant {item.pack_variant_id} not found"
-                )
-            
-            # Check stock for all items in pack
-            pack_items = db.query(PackVariantItem).filter(
-                PackVariantItem.variant_id == variant.id
-            ).all()
-            
-            for pi in pack_items:
-                if not check_stock(db, pi.product_id, pi.qty * item.qty):
-                    product = db.query(Product).filter(Product.id == pi.product_id).first()
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Insufficient stock for {product.name if product else 'product'}"
-                    )
-            
-            line_total = variant.price * item.qty
-            order_items.append({
-                "product_id": None,
-                "name_snapshot": f"{variant.pack.name} - {variant.name}",
-                "unit_price": variant.price,
-                "qty": item.qty,
-                "line_total": line_total
-            })
-            total_amount += line_total
+    if current_user.get("role") != "admin" and order.user_id != int(current_user.get("sub")):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    return order
+
+
+async def get_own_order(db: AsyncSession, order_id: int, user_id: int) -> Order:
+    """The caller's own order (receipts are uploaded by the customer, not admins)"""
+    order = await db.get(Order, order_id)
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
     
-    # Create order
-    order = Order(
+    if order.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    return order
+
+
+async def attach_receipt(db: AsyncSession, order: Order, user_id: int, file_url: str, file_key: str, content_hash: str):
+    """Record a stored receipt file against the order and start its thumbnails"""
+    receipt = Receipt(
+        order_id=order.id,
         user_id=user_id,
-        total_amount=total_amount,
-        delivery_address=data.delivery_address,
-        phone=data.phone,
-        status="pending"
+        file_url=file_url,
+        file_key=file_key,
+        content_hash=content_hash,
+        status="submitted"
     )
-    db.add(order)
-    db.commit()
-    db.refresh(order)
-    
-    # Create order items and reduce stock
-    for item_data in order_items:
-        order_item = OrderItem(
-            order_id=order.id,
-            **item_data
-        )
-        db.add(order_item)
-        
-        if item_data.get("product_id"):
-            reduce_stock(db, item_data["product_id"], item_data["qty"])
+    db.add(receipt)
+    await db.commit()
+    schedule_renditions(content_hash)
     
-    # Create payment record
-    payment = Payment(
-        order_id=order.id,
-        method=data.payment_method,
-        status="pending"
+    return receipt_response(receipt)
+
+
+async def get_latest_receipt(db: AsyncSession, order_id: int):
+    return await db.scalar(
+        select(Receipt).where(Receipt.order_id == order_id).order_by(Receipt.uploaded_at.desc()).limit(1)
     )
-    db.add(payment)
-    db.commit()
+
+
+@router.post("", response_model=OrderResponse, dependencies=[
+    Depends(limit_per_account("checkout", "RATE_LIMIT_CHECKOUT_PER_ACCOUNT"))
+])
+async def create_order(
+    data: OrderCreate,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    user_id = int(current_user.get("sub"))
+    
+    # Order, items, payment, stock and sales counters commit together
+    order, sales, crossed = await db.run_sync(checkout, user_id, data)
+    publish_sales(sales)
+    if crossed:
+        await run_in_threadpool(emit_low_stock, crossed)
     
     # Send SMS notification for order placed
     sms = get_sms_service()
     if sms:
-        user = db.query(User).filter(User.id == user_id).first()
+        # Through this route's session: a second one could wait forever on the writer slot it holds
+        user = await db.run_sync(load_user_profile, user_id)
         customer_name = user.full_name if user else "Customer"
-        sms.send_order_placed(order.phone, order.id, customer_name, order.total_amount)
-    
-    # Fetch order with items
-    items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
+        await run_in_threadpool(sms.send_order_placed, order.phone, order.id, customer_name, order.total_amount)
     
     return OrderResponse(
         id=order.id,
@@ -144,59 +112,47 @@ async def create_order(
         delivery_address=order.delivery_address,
         phone=order.phone,
         created_at=order.created_at,
-        items=[OrderItemResponse.model_validate(i) for i in items],
+        items=[OrderItemResponse.model_validate(i) for i in order.items],
         has_receipt=False,
         receipt_status=None
     )
 
 
 @router.get("/my", response_model=List[OrderListResponse])
-def get_my_orders(
+async def get_my_orders(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     user_id = int(current_user.get("sub"))
-    orders = db.query(Order).filter(Order.user_id == user_id).order_by(Order.created_at.desc()).all()
+    item_count = (
+        select(func.count(OrderItem.id)).where(OrderItem.order_id == Order.id).correlate(Order).scalar_subquery()
+    )
+    rows = await db.execute(
+        select(Order, item_count).where(Order.user_id == user_id).order_by(Order.created_at.desc())
+    )
     
-    result = []
-    for order in orders:
-        items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-        result.append(OrderListResponse(
+    return [
+        OrderListResponse(
             id=order.id,
             status=order.status,
             total_amount=order.total_amount,
             created_at=order.created_at,
-            item_count=len(items)
-        ))
-    
-    return result
+            item_count=count
+        )
+        for order, count in rows.all()
+    ]
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
-def get_order(
+async def get_order(
     order_id: int,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user_id = int(current_user.get("sub"))
-    role = current_user.get("role")
-    
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Order not found"
-        )
+    order = await get_visible_order(db, order_id, current_user)
     
-    # Non-admin users can only see their own orders
-    if role != "admin" and order.user_id != user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied"
-        )
-    
-    items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-    receipt = db.query(Receipt).filter(Receipt.order_id == order.id).order_by(Receipt.uploaded_at.desc()).first()
+    items = (await db.scalars(select(OrderItem).where(OrderItem.order_id == order.id))).all()
+    receipt = await get_latest_receipt(db, order.id)
     
     return OrderResponse(
         id=order.id,
@@ -212,77 +168,72 @@ def get_order(
     )
 
 
-@router.post("/{order_id}/receipt", response_model=ReceiptResponse)
+@router.post("/{order_id}/receipt", response_model=ReceiptResponse, dependencies=[
+    Depends(limit_per_account("receipt", "RATE_LIMIT_RECEIPT_PER_ACCOUNT"))
+])
 async def upload_receipt(
     order_id: int,
     request: Request,
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     user_id = int(current_user.get("sub"))
-    
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Order not found"
-        )
-    
-    if order.user_id != user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied"
-        )
+    order = await get_own_order(db, order_id, user_id)
     
     # Get base URL for file URL generation
     base_url = str(request.base_url).rstrip("/")
     
     # Save file
-    file_url, file_key = await save_receipt_file(file, base_url)
-    
-    # Create receipt record
-    receipt = Receipt(
-        order_id=order.id,
-        user_id=user_id,
-        file_url=file_url,
-        file_key=file_key,
-        status="submitted"
-    )
-    db.add(receipt)
-    db.commit()
-    db.refresh(receipt)
-    
-    return receipt
+    file_url, file_key, content_hash = await save_receipt_file(db, file, base_url)
+    return await attach_receipt(db, order, user_id, file_url, file_key, content_hash)
 
 
-@router.get("/{order_id}/receipt", response_model=ReceiptResponse)
-def get_order_receipt(
+@router.post("/{order_id}/receipt/upload-url", response_model=DirectUploadResponse, dependencies=[
+    Depends(direct_upload_driver),  # 404 before the rate limit spends a token
+    Depends(limit_per_account("receipt", "RATE_LIMIT_RECEIPT_PER_ACCOUNT"))
+])
+async def create_receipt_upload_url(
     order_id: int,
+    data: DirectUploadRequest,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """Presigned PUT straight to the bucket (UPLOAD_DRIVER=s3); 404 when uploads go through the API"""
     user_id = int(current_user.get("sub"))
-    role = current_user.get("role")
-    
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Order not found"
-        )
-    
-    if role != "admin" and order.user_id != user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied"
-        )
+    await get_own_order(db, order_id, user_id)
+    return await create_direct_upload(str(user_id), data.filename, data.size, data.sha256)
+
+
+@router.post("/{order_id}/receipt/complete", response_model=ReceiptResponse)
+async def complete_receipt_upload(
+    order_id: int,
+    data: DirectUploadComplete,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Attach a receipt the client has PUT to the URL from /receipt/upload-url"""
+    user_id = int(current_user.get("sub"))
+    order = await get_own_order(db, order_id, user_id)
+    base_url = str(request.base_url).rstrip("/")
+    file_url, file_key, content_hash = await complete_direct_upload(db, str(user_id), data.upload_key, base_url)
+    return await attach_receipt(db, order, user_id, file_url, file_key, content_hash)
+
+
+@router.get("/{order_id}/receipt", response_model=ReceiptResponse)
+async def get_order_receipt(
+    order_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await get_visible_order(db, order_id, current_user)
     
-    receipt = db.query(Receipt).filter(Receipt.order_id == order_id).order_by(Receipt.uploaded_at.desc()).first()
+    receipt = await get_latest_receipt(db, order_id)
     if not receipt:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No receipt found for this order"
         )
     
-    return receipt
+    return receipt_response(receipt)
@@ -1,21 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
-from ..db.session import get_db
+from ..db.session import get_async_read_db
 from ..models.pack import Pack, PackVariant, PackVariantItem
-from ..models.product import Product
 from ..schemas.pack import PackResponse, PackListResponse, PackVariantResponse, PackVariantItemResponse
 
 router = APIRouter(prefix="/packs", tags=["Packs"])
 
 
 @router.get("", response_model=List[PackListResponse])
-def get_packs(db: Session = Depends(get_db)):
-    packs = db.query(Pack).filter(Pack.is_active == True).all()
+async def get_packs(db: AsyncSession = Depends(get_async_read_db)):
+    packs = (await db.scalars(
+        select(Pack).options(selectinload(Pack.variants)).where(Pack.is_active == True)
+    )).all()
     
     result = []
     for pack in packs:
-        variants = db.query(PackVariant).filter(PackVariant.pack_id == pack.id).all()
+        variants = pack.variants
         min_price = min([v.price for v in variants]) if variants else None
         
         result.append(PackListResponse(
@@ -31,23 +34,29 @@ def get_packs(db: Session = Depends(get_db)):
 
 
 @router.get("/{pack_id}", response_model=PackResponse)
-def get_pack(pack_id: int, db: Session = Depends(get_db)):
-    pack = db.query(Pack).filter(Pack.id == pack_id, Pack.is_active == True).first()
+async def get_pack(pack_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    pack = await db.scalar(
+        select(Pack)
+        .options(
+            selectinload(Pack.variants)
+            .selectinload(PackVariant.items)
+            .selectinload(PackVariantItem.product)
+        )
+        .where(Pack.id == pack_id, Pack.is_active == True)
+    )
     if not pack:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pack not found"
         )
     
-    variants = db.query(PackVariant).filter(PackVariant.pack_id == pack_id).all()
     variant_responses = []
     
-    for variant in variants:
-        items = db.query(PackVariantItem).filter(PackVariantItem.variant_id == variant.id).all()
+    for variant in pack.variants:
         item_responses = []
         
-        for item in items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
+        for item in variant.items:
+            product = item.product
             if product:
                 item_responses.append(PackVariantItemResponse(
                     id=item.id,
@@ -1,33 +1,42 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from ..db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Literal, Optional
+from ..db.session import get_async_read_db
 from ..models.product import Product
-from ..models.category import Category
-from ..schemas.product import ProductResponse
+from ..schemas.product import ProductResponse, TopSellerResponse
+from ..services.sales_ranking import sales_ranking, WINDOWS
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
 
+@router.get("/top", response_model=List[TopSellerResponse])
+def get_top_sellers(
+    window: int = Query(30),
+    limit: int = Query(10, ge=1, le=50),
+    item_type: Optional[Literal["product", "pack_variant"]] = Query(None)
+):
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Invalid window. Must be one of: {list(WINDOWS)}")
+    return sales_ranking.top(window, limit, item_type)
+
+
 @router.get("", response_model=List[ProductResponse])
-def get_products(
+async def get_products(
     category_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    query = db.query(Product).filter(Product.is_active == True)
+    query = select(Product).options(selectinload(Product.category)).where(Product.is_active == True)
     
     if category_id:
-        query = query.filter(Product.category_id == category_id)
+        query = query.where(Product.category_id == category_id)
     
-    products = query.all()
+    products = (await db.scalars(query)).all()
     
     result = []
     for p in products:
-        category_name = None
-        if p.category_id:
-            cat = db.query(Category).filter(Category.id == p.category_id).first()
-            if cat:
-                category_name = cat.name
+        category_name = p.category.name if p.category else None
         
         result.append(ProductResponse(
             id=p.id,
@@ -37,6 +46,7 @@ def get_products(
             image_url=p.image_url,
             category_id=p.category_id,
             is_active=p.is_active,
+            reorder_threshold=p.reorder_threshold,
             category_name=category_name
         ))
     
@@ -1,16 +1,60 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from pathlib import Path
+from functools import partial
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse
+from sqlalchemy import select
 from ..core.config import settings
+from ..core.file_serving import archived_file_response, immutable_file_response
+from ..core.signed_urls import verify_upload_signature
+from ..db.session import async_session
+from ..models.archived_file import ArchivedFile
+from ..services.receipt_archive import ReceiptArchive
+from ..schemas.receipt import UploadCapabilities
+from ..services.receipts import get_storage_driver
 
 router = APIRouter(prefix="/uploads", tags=["Uploads"])
 
 
+@router.get("/capabilities", response_model=UploadCapabilities)
+async def get_upload_capabilities():
+    """Lets clients skip hashing and the upload-url call when the driver can't take direct uploads"""
+    return UploadCapabilities(direct_upload=get_storage_driver().supports_direct_upload)
+
+
 @router.get("/{filename}")
-async def get_uploaded_file(filename: str):
-    file_path = Path(settings.UPLOAD_DIR) / filename
+async def get_uploaded_file(
+    filename: str,
+    request: Request,
+    exp: int = Query(0),
+    sig: str = Query("")
+):
+    # Links are signed by the order routes after checking the caller owns the order (or is an admin)
+    if not verify_upload_signature(filename, exp, sig):
+        raise HTTPException(status_code=403, detail="Link expired or invalid")
+    
+    driver = get_storage_driver()
+    direct_url = driver.download_url(filename)
+    if direct_url:
+        # Cached for half the presigned URL's life, so repeat views reuse the bucket response too
+        return RedirectResponse(direct_url, status_code=307, headers={
+            "cache-control": f"private, max-age={settings.S3_PRESIGN_SECONDS // 2}"
+        })
     
-    if not file_path.exists():
+    file_path = driver.resolve(filename)
+    if file_path is None:
+        # Not in the hot tier: moved to the archive segments, or missing
+        return await serve_archived(request, filename)
+    
+    return immutable_file_response(request, file_path, filename)
+
+
+async def serve_archived(request: Request, file_key: str):
+    async with async_session() as db:
+        entry = await db.scalar(select(ArchivedFile).where(ArchivedFile.file_key == file_key))
+    if entry is None:
         raise HTTPException(status_code=404, detail="File not found")
     
-    return FileResponse(file_path)
+    archive = ReceiptArchive()
+    return await archived_file_response(
+        request, file_key, archive.segment_path(entry.segment), entry.offset, entry.size,
+        load=partial(archive.read, entry) if entry.compressed else None,
+    )
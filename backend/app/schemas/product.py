@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from ..core.config import settings
 
 
 class ProductBase(BaseModel):
@@ -8,6 +9,7 @@ class ProductBase(BaseModel):
     stock_qty: int = 0
     image_url: Optional[str] = None
     category_id: Optional[int] = None
+    reorder_threshold: int = settings.DEFAULT_REORDER_THRESHOLD
 
 
 class ProductCreate(ProductBase):
@@ -21,6 +23,7 @@ class ProductUpdate(BaseModel):
     image_url: Optional[str] = None
     category_id: Optional[int] = None
     is_active: Optional[bool] = None
+    reorder_threshold: Optional[int] = None
 
 
 class ProductResponse(ProductBase):
@@ -30,3 +33,23 @@ class ProductResponse(ProductBase):
     
     class Config:
         from_attributes = True
+
+
+class StockLevel(BaseModel):
+    product_id: int
+    stock_qty: int
+
+
+class BulkStockUpdate(BaseModel):
+    items: List[StockLevel]
+
+
+class TopSellerResponse(BaseModel):
+    item_type: str  # product, pack_variant
+    item_id: int
+    name: str
+    units_sold: int
+
+
+class TopSellerReport(TopSellerResponse):
+    revenue: int
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 
 
@@ -8,6 +8,8 @@ class ReceiptResponse(BaseModel):
     order_id: int
     user_id: int
     file_url: str
+    thumbnail_url: Optional[str] = None
+    preview_url: Optional[str] = None
     uploaded_at: datetime
     status: str
     admin_note: Optional[str] = None
@@ -16,6 +18,45 @@ class ReceiptResponse(BaseModel):
         from_attributes = True
 
 
+class UploadCapabilities(BaseModel):
+    direct_upload: bool  # Receipts can be PUT straight to the bucket via /receipt/upload-url
+
+
+class DirectUploadRequest(BaseModel):
+    filename: str
+    size: int = Field(gt=0)
+    sha256: str = Field(pattern=r"^[0-9a-f]{64}$")  # Hex SHA-256 of the file, enforced by the bucket
+
+
+class DirectUploadResponse(BaseModel):
+    upload_key: str
+    upload_url: str
+    headers: Dict[str, str]  # Send these with the PUT
+    expires_in: int
+
+
+class DirectUploadComplete(BaseModel):
+    upload_key: str
+
+
+class ReceiptQueueItem(BaseModel):
+    id: int
+    order_id: int
+    status: str
+    uploaded_at: datetime
+    file_url: str
+    thumbnail_url: Optional[str] = None
+    order_total: int
+    order_status: str
+    customer_name: Optional[str] = None
+    reused: bool = False  # The same file is attached to another order
+
+
+class ReceiptQueuePage(BaseModel):
+    items: List[ReceiptQueueItem]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page; None on the last one
+
+
 class ReceiptStatusUpdate(BaseModel):
     status: str  # approved, rejected
     admin_note: Optional[str] = None
@@ -0,0 +1,71 @@
+import csv
+import io
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional
+from sqlalchemy import select
+from ..db.session import read_session
+from ..models.order import Order, OrderItem
+from ..models.payment import Payment
+from ..models.user import User
+
+ORDER_LINE_COLUMNS = [
+    "order_id", "created_at", "order_status", "order_total",
+    "customer_name", "customer_email", "phone", "delivery_address",
+    "payment_method", "payment_status",
+    "item_id", "product_id", "pack_variant_id", "item_name", "unit_price", "qty", "line_total",
+]
+
+FETCH_SIZE = 1000  # Rows pulled per round trip from the server-side cursor
+FLUSH_BYTES = 64 * 1024  # Response chunk size
+
+
+def order_lines_query(start: Optional[date] = None, end: Optional[date] = None):
+    """One row per order line, joined with customer and payment"""
+    stmt = (
+        select(
+            Order.id, Order.created_at, Order.status, Order.total_amount,
+            User.full_name, User.email, Order.phone, Order.delivery_address,
+            Payment.method, Payment.status,
+            OrderItem.id, OrderItem.product_id, OrderItem.pack_variant_id, OrderItem.name_snapshot,
+            OrderItem.unit_price, OrderItem.qty, OrderItem.line_total,
+        )
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .join(User, User.id == Order.user_id)
+        .outerjoin(Payment, Payment.order_id == Order.id)
+        .order_by(Order.id, OrderItem.id)
+    )
+    if start:
+        stmt = stmt.where(Order.created_at >= datetime.combine(start, datetime.min.time()))
+    if end:
+        # `end` is inclusive
+        stmt = stmt.where(Order.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return stmt.execution_options(yield_per=FETCH_SIZE)
+
+
+def iter_orders_csv(start: Optional[date] = None, end: Optional[date] = None) -> Iterator[str]:
+    """
+    Yield the order-lines CSV in ~64KB chunks.
+
+    Rows are streamed from a server-side cursor and written straight out, so
+    memory stays flat regardless of how many lines the range covers. The
+    generator owns its (replica) session because it outlives the request's
+    dependencies.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ORDER_LINE_COLUMNS)
+
+    db = read_session()
+    try:
+        for row in db.execute(order_lines_query(start, end)):
+            row = list(row)
+            row[1] = row[1].isoformat() if row[1] else ""
+            writer.writerow(row)
+            if buffer.tell() >= FLUSH_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+    finally:
+        db.close()
+
+    yield buffer.getvalue()
@@ -1,5 +1,56 @@
-from sqlalchemy.orm import Session
-from ..models.product import Product
+import logging
+from typing import Callable, Iterable, List
+from sqlalchemy.orm import Session, joinedload
+from ..models.product import Product, LOW_STOCK_CLAUSE
+from ..core.config import settings
+from .sms import get_sms_service
+
+logger = logging.getLogger(__name__)
+
+# Callbacks invoked with a Product once it drops to/below its reorder threshold
+low_stock_listeners: List[Callable[[Product], None]] = []
+
+
+def on_low_stock(listener: Callable[[Product], None]):
+    """Register a callback fired once per product each time it runs low"""
+    low_stock_listeners.append(listener)
+    return listener
+
+
+def is_low_stock(product: Product) -> bool:
+    # is_active is still None on a product that hasn't been flushed yet
+    return product.is_active is not False and product.stock_qty <= product.reorder_threshold
+
+
+def sync_low_stock_state(product: Product) -> bool:
+    """
+    Update the product's alert flag after a stock change.
+
+    Returns True when the product has just crossed its threshold and an alert
+    should be emitted. The flag stays set until the product is restocked above
+    the threshold, so repeated sales below it don't re-alert.
+    """
+    if is_low_stock(product):
+        if not product.low_stock_alerted:
+            product.low_stock_alerted = True
+            return True
+    elif product.low_stock_alerted:
+        product.low_stock_alerted = False
+    return False
+
+
+def emit_low_stock(products: Iterable[Product]):
+    """Notify listeners; call after commit so alerts never fire for rolled-back stock"""
+    for product in products:
+        logger.warning(
+            f"Low stock: {product.name} (id={product.id}) has {product.stock_qty} left, "
+            f"threshold {product.reorder_threshold}"
+        )
+        for listener in low_stock_listeners:
+            try:
+                listener(product)
+            except Exception as e:
+                logger.error(f"Low-stock listener failed for product {product.id}: {e}")
 
 
 def check_stock(db: Session, product_id: int, qty: int) -> bool:
@@ -16,7 +67,10 @@ def reduce_stock(db: Session, product_id: int, qty: int) -> bool:
     if not product or product.stock_qty < qty:
         return False
     product.stock_qty -= qty
+    crossed = sync_low_stock_state(product)
     db.commit()
+    if crossed:
+        emit_low_stock([product])
     return True
 
 
@@ -26,6 +80,7 @@ def restore_stock(db: Session, product_id: int, qty: int) -> bool:
     if not product:
         return False
     product.stock_qty += qty
+    sync_low_stock_state(product)
     db.commit()
     return True
 
@@ -36,5 +91,49 @@ def update_stock(db: Session, product_id: int, new_qty: int) -> bool:
     if not product:
         return False
     product.stock_qty = new_qty
+    crossed = sync_low_stock_state(product)
     db.commit()
+    if crossed:
+        emit_low_stock([product])
     return True
+
+
+def bulk_update_stock(db: Session, updates: dict) -> List[Product]:
+    """
+    Set stock for many products in one transaction.
+    `updates` maps product_id -> new stock_qty. Returns the updated products.
+    """
+    products = (
+        db.query(Product)
+        .options(joinedload(Product.category))
+        .filter(Product.id.in_(list(updates.keys())))
+        .all()
+    )
+    crossed = []
+    for product in products:
+        product.stock_qty = updates[product.id]
+        if sync_low_stock_state(product):
+            crossed.append(product)
+    db.commit()
+    emit_low_stock(crossed)
+    return products
+
+
+def get_low_stock_products(db: Session) -> List[Product]:
+    """Active products at or below their reorder threshold (served by ix_products_low_stock)"""
+    return (
+        db.query(Product)
+        .options(joinedload(Product.category))
+        .filter(LOW_STOCK_CLAUSE)
+        .order_by(Product.stock_qty.asc())
+        .all()
+    )
+
+
+def sms_low_stock_listener(product: Product):
+    """Text the configured admin phone when a product runs low"""
+    sms = get_sms_service()
+    if sms and settings.LOW_STOCK_ALERT_PHONE:
+        sms.send_low_stock_alert(
+            settings.LOW_STOCK_ALERT_PHONE, product.name, product.stock_qty, product.reorder_threshold
+        )
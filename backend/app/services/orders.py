@@ -0,0 +1,146 @@
+from typing import List, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from ..core.metrics import CHECKOUTS
+from ..models.order import Order, OrderItem
+from ..models.pack import PackVariant, PackVariantItem
+from ..models.payment import Payment
+from ..models.product import Product
+from ..schemas.order import OrderCreate
+from .inventory import sync_low_stock_state
+from .sales_ranking import record_sales
+
+
+class OutOfStock(HTTPException):
+    """400 for a cart the stock can't cover; a subclass so checkout outcomes can tell it apart"""
+
+    def __init__(self, name: str):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Insufficient stock for {name}")
+
+
+def place_order(db: Session, user_id: int, data: OrderCreate) -> Tuple[Order, List[tuple], List[Product]]:
+    """
+    Validate the cart, create the order, its items and payment, and take the stock,
+    all in the caller's transaction (nothing is committed here).
+
+    Written against a sync Session so async routes can run it in one hop with
+    `AsyncSession.run_sync`. Returns the order plus the sales entries and the
+    products that crossed their reorder threshold, both to be published once
+    the caller commits.
+    """
+    order_items = []
+    total_amount = 0
+    stock_needed = {}  # product_id -> units, summed across products and packs
+
+    for item in data.items:
+        if item.product_id:
+            # Regular product
+            product = db.execute(
+                select(Product).where(Product.id == item.product_id, Product.is_active == True)
+            ).scalar_one_or_none()
+
+            if not product:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Product {item.product_id} not found"
+                )
+
+            if product.stock_qty < item.qty:
+                raise OutOfStock(product.name)
+
+            stock_needed[product.id] = stock_needed.get(product.id, 0) + item.qty
+            line_total = product.price * item.qty
+            order_items.append({
+                "product_id": product.id,
+                "pack_variant_id": None,
+                "name_snapshot": product.name,
+                "unit_price": product.price,
+                "qty": item.qty,
+                "line_total": line_total
+            })
+            total_amount += line_total
+
+        elif item.pack_variant_id:
+            # Pack variant
+            variant = db.execute(
+                select(PackVariant)
+                .options(
+                    selectinload(PackVariant.pack),
+                    selectinload(PackVariant.items).selectinload(PackVariantItem.product)
+                )
+                .where(PackVariant.id == item.pack_variant_id)
+            ).scalar_one_or_none()
+
+            if not variant:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Pack variant {item.pack_variant_id} not found"
+                )
+
+            # Check stock for all items in pack
+            for pi in variant.items:
+                if not pi.product or pi.product.stock_qty < pi.qty * item.qty:
+                    raise OutOfStock(pi.product.name if pi.product else "product")
+
+            line_total = variant.price * item.qty
+            order_items.append({
+                "product_id": None,
+                "pack_variant_id": variant.id,
+                "name_snapshot": f"{variant.pack.name} - {variant.name}",
+                "unit_price": variant.price,
+                "qty": item.qty,
+                "line_total": line_total
+            })
+            total_amount += line_total
+
+    order = Order(
+        user_id=user_id,
+        total_amount=total_amount,
+        delivery_address=data.delivery_address,
+        phone=data.phone,
+        status="pending",
+        items=[OrderItem(**item_data) for item_data in order_items]
+    )
+    order.payments = [Payment(method=data.payment_method, status="pending")]
+    db.add(order)
+
+    # Take stock for regular products (pack stock is checked but not reduced)
+    crossed = []
+    for product_id, qty in stock_needed.items():
+        product = db.get(Product, product_id)
+        if product.stock_qty < qty:
+            raise OutOfStock(product.name)
+        product.stock_qty -= qty
+        if sync_low_stock_state(product):
+            crossed.append(product)
+
+    sales = record_sales(db, order_items)
+    db.flush()
+    return order, sales, crossed
+
+
+def checkout(db: Session, user_id: int, data: OrderCreate) -> Tuple[Order, List[tuple], List[Product]]:
+    """
+    place_order plus commit in a single call, so the write transaction is held
+    for one trip to the database worker rather than across several awaits.
+    Counts the outcome; malformed request bodies never get here (FastAPI
+    answers them with 422).
+    """
+    try:
+        result = place_order(db, user_id, data)
+        db.commit()
+    except OutOfStock:
+        db.rollback()
+        CHECKOUTS.labels("out_of_stock").inc()
+        raise
+    except HTTPException:
+        db.rollback()
+        CHECKOUTS.labels("validation_error").inc()
+        raise
+    except Exception:
+        db.rollback()
+        CHECKOUTS.labels("error").inc()
+        raise
+    CHECKOUTS.labels("success").inc()
+    return result
@@ -0,0 +1,142 @@
+"""
+Cold tier for old upload files: compressed, append-only archive segments.
+
+A segment is a file of entries written back to back and never rewritten:
+
+    header  MAGIC, key length, flags, crc32, size, stored size   (ENTRY_HEADER)
+    key     utf-8
+    data    the file's bytes, zlib-compressed unless that saves under
+            MIN_SAVING (JPEG/PNG/WebP are already compressed; PDFs shrink)
+
+archived_files indexes each key to (segment, data offset, stored size), so a
+read is one indexed lookup and one positioned read; uncompressed entries are
+served straight from the segment at that offset, ranges and zero-copy
+included, and compressed ones are sent whole. The headers make every segment self-describing, so the index can be
+rebuilt by scanning (iter_entries). Writes happen under a lock file, one
+writer at a time; a new segment starts once the current one reaches
+UPLOAD_ARCHIVE_SEGMENT_MB.
+"""
+import fcntl
+import os
+import struct
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+from ..core.config import settings
+
+MAGIC = b"FNA1"
+ENTRY_HEADER = struct.Struct(">4sHBIQQ")  # magic, key length, flags, crc32, size, stored size
+FLAG_ZLIB = 1
+MIN_SAVING = 0.05
+
+
+def archive_dir() -> Path:
+    return Path(settings.UPLOAD_ARCHIVE_DIR or os.path.join(settings.UPLOAD_DIR, ".archive"))
+
+
+class SegmentWriter:
+    """Appends entries to the newest segment; use through ReceiptArchive.writer()"""
+
+    def __init__(self, directory: Path, segment_bytes: int):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        numbers = [int(p.stem) for p in directory.glob("*.seg") if p.stem.isdigit()]
+        self.segment = max(numbers, default=1)  # Appends continue the newest segment
+        self.file = None
+
+    def _open(self):
+        self.file = open(self.directory / f"{self.segment:06d}.seg", "ab")
+
+    def append(self, file_key: str, content: bytes) -> dict:
+        """Write one entry; returns its archived_files columns. Call sync() before indexing it."""
+        if self.file is None:
+            self._open()
+        if self.file.tell() >= self.segment_bytes:
+            self.close()
+            self.segment += 1
+            self._open()
+        packed = zlib.compress(content, 6)
+        compressed = len(packed) <= len(content) * (1 - MIN_SAVING)
+        data = packed if compressed else content
+        key = file_key.encode()
+        crc = zlib.crc32(content)
+        offset = self.file.tell()
+        self.file.write(ENTRY_HEADER.pack(MAGIC, len(key), FLAG_ZLIB if compressed else 0, crc, len(content), len(data)))
+        self.file.write(key)
+        self.file.write(data)
+        return {
+            "file_key": file_key, "segment": self.segment, "offset": offset + ENTRY_HEADER.size + len(key),
+            "stored_size": len(data), "size": len(content), "compressed": compressed, "crc32": crc,
+        }
+
+    def sync(self):
+        """Make appended entries durable; the index must never point at bytes that could be lost"""
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+
+class ReceiptArchive:
+    """Archive segments in one directory"""
+
+    def __init__(self, directory: Path = None, segment_bytes: int = None):
+        self.directory = Path(directory or archive_dir())
+        self.segment_bytes = segment_bytes or settings.UPLOAD_ARCHIVE_SEGMENT_MB * 1024 * 1024
+
+    def segment_path(self, segment: int) -> Path:
+        return self.directory / f"{segment:06d}.seg"
+
+    @contextmanager
+    def writer(self) -> Iterator[Optional[SegmentWriter]]:
+        """The single writer, or None if another process holds it"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / ".lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield None
+                return
+            writer = SegmentWriter(self.directory, self.segment_bytes)
+            try:
+                yield writer
+            finally:
+                writer.close()
+
+    def read(self, entry) -> bytes:
+        """The original bytes of an archived_files row, checked against its crc32"""
+        with open(self.segment_path(entry.segment), "rb") as f:
+            data = os.pread(f.fileno(), entry.stored_size, entry.offset)
+        if entry.compressed:
+            data = zlib.decompress(data)
+        if len(data) != entry.size or zlib.crc32(data) != entry.crc32:
+            raise IOError(f"Archived file {entry.file_key} is corrupt")
+        return data
+
+    def segments(self) -> list:
+        return sorted(int(p.stem) for p in self.directory.glob("*.seg") if p.stem.isdigit())
+
+    def iter_entries(self, segment: int) -> Iterator[dict]:
+        """archived_files columns for every entry of a segment, read from its headers"""
+        with open(self.segment_path(segment), "rb") as f:
+            while True:
+                position = f.tell()
+                header = f.read(ENTRY_HEADER.size)
+                if len(header) < ENTRY_HEADER.size:
+                    return
+                magic, key_length, flags, crc, size, stored = ENTRY_HEADER.unpack(header)
+                if magic != MAGIC:
+                    raise IOError(f"Segment {segment} is corrupt at byte {position}")
+                key = f.read(key_length).decode()
+                offset = f.tell()
+                f.seek(stored, os.SEEK_CUR)
+                yield {
+                    "file_key": key, "segment": segment, "offset": offset, "stored_size": stored,
+                    "size": size, "compressed": bool(flags & FLAG_ZLIB), "crc32": crc,
+                }
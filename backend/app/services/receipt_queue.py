@@ -0,0 +1,78 @@
+"""
+Admin receipt review queue.
+
+Receipts in one status, oldest upload first, with the order total, customer
+name and thumbnail joined in, so a page is a single query. Pages are keyset
+paginated on (uploaded_at, id), walking ix_receipts_status_uploaded_at: the
+cursor is the last row's position rather than an offset, so every page is an
+index seek however deep the queue, and approving receipts while paging never
+skips or repeats one.
+"""
+import base64
+import binascii
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import exists, select, tuple_
+from sqlalchemy.orm import Session, aliased
+from ..core.signed_urls import sign_upload_url
+from ..models.order import Order
+from ..models.receipt import Receipt
+from ..models.user import User
+
+
+def encode_cursor(uploaded_at: datetime, receipt_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{uploaded_at.isoformat()}|{receipt_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        uploaded_at, receipt_id = raw.split("|")
+        return datetime.fromisoformat(uploaded_at), int(receipt_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def receipt_queue(db: Session, status: str, limit: int, cursor: Optional[str] = None) -> dict:
+    """One page of the queue: {"items": [...], "next_cursor": str or None}"""
+    other = aliased(Receipt)
+    reused = exists().where(
+        other.content_hash == Receipt.content_hash, other.order_id != Receipt.order_id
+    ).correlate(Receipt)
+    query = (
+        select(
+            Receipt.id, Receipt.order_id, Receipt.status, Receipt.uploaded_at, Receipt.file_url,
+            Receipt.thumbnail_url, Receipt.content_hash.is_not(None) & reused,
+            Order.total_amount, Order.status, User.full_name,
+        )
+        .join(Order, Order.id == Receipt.order_id)
+        .outerjoin(User, User.id == Order.user_id)
+        .where(Receipt.status == status)
+        .order_by(Receipt.uploaded_at, Receipt.id)
+        .limit(limit + 1)
+    )
+    if cursor:
+        query = query.where(tuple_(Receipt.uploaded_at, Receipt.id) > decode_cursor(cursor))
+    rows = db.execute(query).all()
+
+    page = rows[:limit]
+    return {
+        "items": [
+            {
+                "id": receipt_id,
+                "order_id": order_id,
+                "status": receipt_status,
+                "uploaded_at": uploaded_at,
+                "file_url": sign_upload_url(file_url),
+                "thumbnail_url": sign_upload_url(thumbnail_url),
+                "reused": bool(is_reused),
+                "order_total": total_amount,
+                "order_status": order_status,
+                "customer_name": customer_name,
+            }
+            for (receipt_id, order_id, receipt_status, uploaded_at, file_url, thumbnail_url, is_reused,
+                 total_amount, order_status, customer_name) in page
+        ],
+        "next_cursor": encode_cursor(page[-1].uploaded_at, page[-1].id) if len(rows) > limit else None,
+    }
@@ -1,18 +1,47 @@
+import asyncio
+import hashlib
+import logging
 import os
-import uuid
+import tempfile
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
 from fastapi import UploadFile, HTTPException
+from sqlalchemy import exists, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from ..core.config import settings
+from ..core.signed_urls import sign_upload_url
+from ..core.metrics import THUMBNAIL_JOBS, UPLOAD_BYTES, UPLOAD_DEDUPLICATED
+from ..core.thumbnails import thumbnail_renderer
+from ..db.session import async_session
+from ..models.archived_file import ArchivedFile
+from ..models.receipt import Receipt
+from ..models.stored_file import StoredFile
+from ..schemas.receipt import ReceiptResponse
+from .receipt_archive import ReceiptArchive
+
+logger = logging.getLogger(__name__)
 
 
 ALLOWED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".pdf"}
 MAX_SIZE_BYTES = settings.MAX_UPLOAD_MB * 1024 * 1024
+CHUNK_SIZE = settings.UPLOAD_CHUNK_KB * 1024
+HEX_DIGITS = "0123456789abcdef"
 
 
 class StorageDriver:
     """Abstract storage driver for receipts"""
     
-    def save(self, file: UploadFile, filename: str) -> str:
+    # Where uploads are spooled before save(); None for the system temp dir
+    staging_dir: Optional[Path] = None
+    # Whether clients can PUT files straight to storage (presign_upload and friends)
+    supports_direct_upload = False
+    
+    def save(self, temp_path: str, filename: str) -> str:
+        """Take ownership of a fully written temp file and store it as `filename`"""
         raise NotImplementedError
     
     def delete(self, file_key: str) -> bool:
@@ -20,68 +49,368 @@ class StorageDriver:
     
     def get_url(self, file_key: str) -> str:
         raise NotImplementedError
+    
+    def local_path(self, file_key: str) -> str:
+        """Filesystem path to read a stored file from"""
+        raise NotImplementedError
+    
+    def fetch(self, file_key: str) -> Tuple[str, bool]:
+        """(local path with the file's bytes, whether it is a temp copy the caller removes)"""
+        return self.local_path(file_key), False
+    
+    def download_url(self, file_key: str) -> Optional[str]:
+        """URL the file can be fetched from directly, bypassing the API; None to serve it from the API"""
+        return None
+    
+    def exists(self, file_key: str) -> bool:
+        """Whether the stored file is there (hot tier only for local storage)"""
+        raise NotImplementedError
+
+
+def shard_dirs(file_key: str) -> Tuple[str, str]:
+    """
+    Two directory levels for a key, from its first four hex characters (keys
+    are content hashes or uuids, so they are already evenly spread); any other
+    key is spread by a hash of its name instead
+    """
+    prefix = file_key[:4].lower()
+    if len(prefix) < 4 or prefix.strip(HEX_DIGITS):
+        prefix = hashlib.sha256(file_key.encode()).hexdigest()[:4]
+    return prefix[:2], prefix[2:]
 
 
 class LocalStorageDriver(StorageDriver):
-    """Local filesystem storage driver"""
+    """
+    Local filesystem storage driver. Files live at <UPLOAD_DIR>/ab/cd/<key>
+    (see shard_dirs) so no directory grows past a few hundred entries; files
+    from the old flat layout are still found until `python -m
+    app.services.upload_files reshard` has moved them.
+    """
     
     def __init__(self, upload_dir: str):
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(parents=True, exist_ok=True)
+        # Same filesystem as the uploads, so save() is an atomic rename
+        self.staging_dir = self.upload_dir / ".incoming"
+        self.staging_dir.mkdir(exist_ok=True)
+    
+    def sharded_path(self, file_key: str) -> Path:
+        return self.upload_dir.joinpath(*shard_dirs(file_key), file_key)
     
-    def save(self, file_content: bytes, filename: str) -> str:
-        file_path = self.upload_dir / filename
-        with open(file_path, "wb") as f:
-            f.write(file_content)
+    def save(self, temp_path: str, filename: str) -> str:
+        path = self.sharded_path(filename)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, path)
         return filename
     
     def delete(self, file_key: str) -> bool:
-        file_path = self.upload_dir / file_key
-        if file_path.exists():
-            file_path.unlink()
-            return True
-        return False
+        deleted = False
+        for file_path in (self.sharded_path(file_key), self.upload_dir / file_key):
+            if file_path.exists():
+                file_path.unlink()
+                deleted = True
+        return deleted
     
     def get_url(self, file_key: str, base_url: str = "") -> str:
         return f"{base_url}/api/uploads/{file_key}"
+    
+    def local_path(self, file_key: str) -> str:
+        return str(self._find(file_key) or self.sharded_path(file_key))
+    
+    def _find(self, file_key: str) -> Optional[Path]:
+        sharded = self.sharded_path(file_key)
+        if sharded.is_file():
+            return sharded
+        legacy = self.upload_dir / file_key
+        if legacy.is_file():
+            return legacy
+        # Moved by a reshard between the two checks
+        return sharded if sharded.is_file() else None
+    
+    def exists(self, file_key: str) -> bool:
+        return self.resolve(file_key) is not None
+    
+    def resolve(self, file_key: str) -> Optional[Path]:
+        """Path of a stored file, or None if it is missing or the key isn't a plain, non-hidden file name"""
+        if not file_key or file_key.startswith(".") or "/" in file_key or "\\" in file_key:
+            return None
+        path = self._find(file_key)
+        return path.resolve() if path else None
 
 
 def get_storage_driver() -> StorageDriver:
     """Get the configured storage driver"""
-    if settings.UPLOAD_DRIVER == "local":
-        return LocalStorageDriver(settings.UPLOAD_DIR)
-    # Add S3 driver here in future
+    if settings.UPLOAD_DRIVER == "s3":
+        from .storage_s3 import S3StorageDriver
+        return S3StorageDriver(settings.S3_BUCKET, settings.S3_PREFIX)
     return LocalStorageDriver(settings.UPLOAD_DIR)
 
 
-async def save_receipt_file(file: UploadFile, base_url: str = "") -> tuple[str, str]:
+def receipt_response(receipt: Receipt) -> ReceiptResponse:
+    """ReceiptResponse with signed file links; only for callers already checked against the order"""
+    response = ReceiptResponse.model_validate(receipt)
+    return response.model_copy(update={
+        "file_url": sign_upload_url(response.file_url),
+        "thumbnail_url": sign_upload_url(response.thumbnail_url),
+        "preview_url": sign_upload_url(response.preview_url),
+    })
+
+
+def file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_MB}MB"
+    )
+
+
+def spool_upload(source: BinaryIO, staging_dir: Optional[Path], max_bytes: int) -> Tuple[str, int, str]:
     """
-    Save uploaded receipt file
-    Returns: (file_url, file_key)
+    Copy an upload into a temp file CHUNK_SIZE bytes at a time, hashing as it
+    goes; (temp path, size, sha256 hex). Stops and removes the temp file as
+    soon as the size passes `max_bytes`. Blocking: run it in the threadpool.
     """
-    # Validate extension
-    ext = Path(file.filename).suffix.lower()
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=staging_dir, prefix="upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := source.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise file_too_large()
+                digest.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, size, digest.hexdigest()
+
+
+def add_file_reference(db: Session, sha256: str, file_key: str, size: int) -> Tuple[str, int]:
+    """
+    Count one more reference to this content, registering it under `file_key`
+    if it is new; (stored file key, references). Inside the caller's
+    transaction: a concurrent upload of the same content waits on the row
+    until the caller commits, by which time the file is in place.
+    """
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(StoredFile).values(sha256=sha256, file_key=file_key, size=size, ref_count=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["sha256"], set_={"ref_count": StoredFile.ref_count + 1}
+    ).returning(StoredFile.file_key, StoredFile.ref_count)
+    row = db.execute(stmt).one()
+    return row.file_key, row.ref_count
+
+
+async def stored_copy_missing(db: AsyncSession, driver: StorageDriver, file_key: str) -> bool:
+    """
+    Whether content being deduplicated has lost its file despite its
+    stored_files row (an orphan sweep that raced an earlier upload); the
+    upload then stores it again instead of pointing at nothing
+    """
+    if await run_in_threadpool(driver.exists, file_key):
+        return False
+    archived = await db.scalar(select(ArchivedFile.id).where(ArchivedFile.file_key == file_key))
+    if archived is None:
+        logger.warning(f"Stored file {file_key} was missing; storing the upload again")
+    return archived is None
+
+
+def receipt_extension(filename: str) -> str:
+    ext = Path(filename).suffix.lower()
     if ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
         )
+    return ext
+
+
+async def save_receipt_file(db: AsyncSession, file: UploadFile, base_url: str = "") -> Tuple[str, str, str]:
+    """
+    Save uploaded receipt file, once per distinct content. Adds the file
+    reference to `db`; the caller commits it with the receipt.
+    Returns: (file_url, file_key, sha256 of the content)
+    """
+    ext = receipt_extension(file.filename)
     
-    # Read and validate size
-    content = await file.read()
-    if len(content) > MAX_SIZE_BYTES:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_MB}MB"
-        )
-    
-    # Generate unique filename
-    unique_id = str(uuid.uuid4())
-    filename = f"{unique_id}{ext}"
-    
-    # Save file
+    # Stream to a temp file off the event loop, then store it under its content
+    # hash unless the same bytes are already stored
     driver = get_storage_driver()
-    file_key = driver.save(content, filename)
+    temp_path, size, sha256 = await run_in_threadpool(spool_upload, file.file, driver.staging_dir, MAX_SIZE_BYTES)
+    try:
+        file_key, references = await db.run_sync(add_file_reference, sha256, f"{sha256}{ext}", size)
+        if references == 1 or await stored_copy_missing(db, driver, file_key):
+            await run_in_threadpool(driver.save, temp_path, file_key)
+            UPLOAD_BYTES.labels("receipt").inc(size)
+        else:
+            UPLOAD_DEDUPLICATED.labels("receipt").inc()
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
     file_url = driver.get_url(file_key, base_url)
     
-    return file_url, file_key
+    return file_url, file_key, sha256
+
+
+# ----- Direct uploads (client PUTs to the bucket) -----
+
+def direct_upload_driver() -> StorageDriver:
+    driver = get_storage_driver()
+    if not driver.supports_direct_upload:
+        raise HTTPException(status_code=404, detail="Direct uploads are not enabled")
+    return driver
+
+
+async def create_direct_upload(owner: str, filename: str, size: int, sha256: str) -> dict:
+    """Presigned PUT for a receipt of this size and SHA-256; the client then calls complete_direct_upload"""
+    ext = receipt_extension(filename)
+    if size > MAX_SIZE_BYTES:
+        raise file_too_large()
+    driver = direct_upload_driver()
+    upload_key, url, headers = await run_in_threadpool(driver.presign_upload, owner, ext, size, sha256)
+    return {"upload_key": upload_key, "upload_url": url, "headers": headers,
+            "expires_in": settings.S3_PRESIGN_SECONDS}
+
+
+async def complete_direct_upload(db: AsyncSession, owner: str, upload_key: str, base_url: str = "") -> Tuple[str, str, str]:
+    """
+    save_receipt_file for a file the client has PUT to storage: checks it and
+    moves it to its content address (or drops it if that content is stored).
+    Returns: (file_url, file_key, sha256 of the content)
+    """
+    driver = direct_upload_driver()
+    if not upload_key.startswith(f"{driver.INCOMING}{owner}/") or ".." in upload_key:
+        raise HTTPException(status_code=400, detail="Unknown upload")
+    ext = receipt_extension(upload_key)
+    found = await run_in_threadpool(driver.inspect_upload, upload_key)
+    if found is None:
+        raise HTTPException(status_code=400, detail="Upload not found; PUT the file first")
+    size, sha256 = found
+    if size > MAX_SIZE_BYTES:
+        await run_in_threadpool(driver.delete, upload_key)
+        raise file_too_large()
+    if sha256 is None:
+        sha256 = await run_in_threadpool(driver.hash_upload, upload_key)
+    
+    file_key, references = await db.run_sync(add_file_reference, sha256, f"{sha256}{ext}", size)
+    if references == 1 or await stored_copy_missing(db, driver, file_key):
+        await run_in_threadpool(driver.adopt_upload, upload_key, file_key)
+        UPLOAD_BYTES.labels("receipt").inc(size)
+    else:
+        await run_in_threadpool(driver.delete, upload_key)
+        UPLOAD_DEDUPLICATED.labels("receipt").inc()
+    return driver.get_url(file_key, base_url), file_key, sha256
+
+
+# ----- Thumbnails and previews -----
+
+_rendition_jobs = set()  # keeps scheduled jobs referenced until they finish
+
+
+def schedule_renditions(sha256: str):
+    """Give receipts with this content a thumbnail and preview, in the background once the upload has committed"""
+    task = asyncio.create_task(fill_renditions(sha256))
+    _rendition_jobs.add(task)
+    task.add_done_callback(_rendition_jobs.discard)
+
+
+async def fill_renditions(sha256: str):
+    try:
+        await _fill_renditions(sha256)
+    except Exception as e:
+        THUMBNAIL_JOBS.labels("failed").inc()
+        logger.warning(f"Receipt thumbnails for {sha256} failed: {e}")
+
+
+async def fetch_rendition_source(driver: StorageDriver, file_key: str) -> Tuple[str, bool]:
+    """driver.fetch, except content moved to the archive segments is read back into a temp file"""
+    if await run_in_threadpool(driver.exists, file_key):
+        return await run_in_threadpool(driver.fetch, file_key)
+    async with async_session() as db:
+        entry = await db.scalar(select(ArchivedFile).where(ArchivedFile.file_key == file_key))
+    if entry is None:
+        raise FileNotFoundError(f"Stored file {file_key} is missing")
+    
+    def restore() -> str:
+        content = ReceiptArchive().read(entry)
+        fd, path = tempfile.mkstemp(dir=driver.staging_dir, prefix="render-", suffix=Path(file_key).suffix)
+        with os.fdopen(fd, "wb") as out:
+            out.write(content)
+        return path
+    
+    return await run_in_threadpool(restore), True
+
+
+async def _fill_renditions(sha256: str):
+    # Short sessions on either side of the render, so no connection waits on it
+    async with async_session() as db:
+        stored = await db.scalar(select(StoredFile).where(StoredFile.sha256 == sha256))
+    if stored is None:
+        return
+    
+    if stored.thumbnail_key is None:
+        driver = get_storage_driver()
+        source, temporary = await fetch_rendition_source(driver, stored.file_key)
+        try:
+            rendered = await thumbnail_renderer.render(
+                source, stored.file_key.endswith(".pdf"),
+                str(driver.staging_dir) if driver.staging_dir else None,
+            )
+        finally:
+            if temporary:
+                os.unlink(source)
+        if rendered is None:
+            return
+        try:
+            preview_key = await run_in_threadpool(driver.save, rendered[0], f"{sha256}.preview.webp")
+            thumbnail_key = await run_in_threadpool(driver.save, rendered[1], f"{sha256}.thumb.webp")
+        finally:
+            for path in rendered:
+                if os.path.exists(path):
+                    os.unlink(path)
+        THUMBNAIL_JOBS.labels("rendered").inc()
+    else:
+        preview_key, thumbnail_key = stored.preview_key, stored.thumbnail_key
+        THUMBNAIL_JOBS.labels("reused").inc()
+    
+    async with async_session() as db:
+        await db.execute(
+            update(StoredFile).where(StoredFile.sha256 == sha256)
+            .values(thumbnail_key=thumbnail_key, preview_key=preview_key)
+        )
+        receipts = await db.scalars(
+            select(Receipt).where(Receipt.content_hash == sha256, Receipt.thumbnail_url.is_(None))
+        )
+        for receipt in receipts.all():
+            # Same host prefix as the receipt's own file URL
+            base = receipt.file_url[:-len(receipt.file_key)]
+            receipt.thumbnail_url = base + thumbnail_key
+            receipt.preview_url = base + preview_key
+        await db.commit()
+
+
+async def requeue_renditions(limit: int = None, min_age_seconds: float = 300):
+    """
+    Catch-up for rendition jobs that never ran or never finished: the queue
+    was full, the render failed or the worker restarted. Re-runs them one at a
+    time for content still referenced by a receipt that lacks them; run
+    periodically by the upload GC. Returns how many were retried.
+    """
+    # Skip content young enough that its own upload's job may still be running
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=min_age_seconds)
+    async with async_session() as db:
+        pending = (await db.scalars(
+            select(StoredFile.sha256)
+            .where(
+                StoredFile.created_at < cutoff,
+                exists().where(Receipt.file_key == StoredFile.file_key, Receipt.thumbnail_url.is_(None)),
+            )
+            .order_by(StoredFile.id)
+            .limit(limit or settings.UPLOAD_GC_BATCH)
+        )).all()
+    for sha256 in pending:
+        await fill_renditions(sha256)
+    return len(pending)
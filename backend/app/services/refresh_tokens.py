@@ -0,0 +1,235 @@
+"""
+Refresh-token rotation with reuse detection.
+
+Refresh tokens carry a `jti` and a `fam` (family) claim and are recorded in
+refresh_tokens. Each refresh revokes the presented token and issues the next
+one in its family. Presenting a token that was already rotated means it was
+copied: the whole family is revoked (and the user's access tokens with it).
+The exception is a repeat within REFRESH_REUSE_GRACE_SECONDS, which is a
+client firing parallel refreshes rather than theft.
+
+Revoked JTIs are kept in memory (RevokedJtis), loaded at startup and topped
+up every REFRESH_REVOCATION_SYNC_SECONDS from rows revoked since the last
+sync, so checking a token never needs a query. The same sync carries
+logout-everywhere and reuse revocations to this worker's access-token cache.
+Expired rows are deleted separately, every REFRESH_TOKEN_PURGE_SECONDS.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from ..core.config import settings
+from ..core.security import create_refresh_token
+from ..core.token_cache import token_cache
+from ..db.migrations import take_startup_lock
+from ..db.session import SessionLocal
+from ..models.refresh_token import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+# Revocations that also cut off the user's outstanding access tokens
+USER_WIDE_REASONS = ("logout_all", "reuse")
+
+# Rows are picked up by revoked_at, stamped by whichever worker revoked them;
+# re-reading a window behind the watermark covers clock skew and slow commits
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def epoch(naive_utc: datetime) -> float:
+    return naive_utc.replace(tzinfo=timezone.utc).timestamp()
+
+
+class RevokedJtis:
+    """
+    Revoked, not yet expired refresh-token ids for this worker:
+    16-byte jti -> (expires_at, revoked_at, rotated), all epoch seconds
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.watermark: Optional[datetime] = None
+
+    def get(self, jti: str) -> Optional[tuple]:
+        return self._entries.get(bytes.fromhex(jti))
+
+    def add(self, jti: str, expires_at: float, revoked_at: float, rotated: bool):
+        with self._lock:
+            self._entries[bytes.fromhex(jti)] = (expires_at, revoked_at, rotated)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def sync(self, db: Session):
+        """Pull revocations since the last sync (every unexpired one on the first call)"""
+        now = utcnow()
+        query = select(
+            RefreshToken.jti, RefreshToken.user_id, RefreshToken.expires_at,
+            RefreshToken.revoked_at, RefreshToken.revoke_reason,
+        ).where(RefreshToken.revoked_at.is_not(None), RefreshToken.expires_at > now)
+        if self.watermark is not None:
+            query = query.where(RefreshToken.revoked_at >= self.watermark - SYNC_OVERLAP)
+        rows = db.execute(query).all()
+
+        newest = self.watermark or now
+        for row in rows:
+            self.add(row.jti, epoch(row.expires_at), epoch(row.revoked_at), row.revoke_reason == "rotated")
+            if row.revoke_reason in USER_WIDE_REASONS:
+                token_cache.revoke_user(row.user_id, at=epoch(row.revoked_at))
+            newest = max(newest, row.revoked_at)
+        with self._lock:
+            cutoff = time.time()
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > cutoff}
+        self.watermark = newest
+
+
+revoked_jtis = RevokedJtis()
+
+
+def issue_refresh_token(db: Session, user_id: int, claims: dict, family: Optional[str] = None) -> Tuple[str, str]:
+    """Record and sign a new refresh token, starting a new family unless one is given; (token, jti). Caller commits."""
+    jti = uuid.uuid4().hex
+    family = family or uuid.uuid4().hex
+    now = utcnow()
+    db.add(RefreshToken(
+        jti=jti, family=family, user_id=user_id, issued_at=now,
+        expires_at=now + timedelta(days=settings.JWT_REFRESH_EXPIRES_DAYS),
+    ))
+    return create_refresh_token({**claims, "jti": jti, "fam": family}), jti
+
+
+def start_session(db: Session, user_id: int, claims: dict) -> str:
+    """First refresh token of a login"""
+    token, _ = issue_refresh_token(db, user_id, claims)
+    db.commit()
+    return token
+
+
+def revoke_family(db: Session, family: str, reason: str):
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family == family, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=utcnow(), revoke_reason=reason)
+    )
+    db.commit()
+    revoked_jtis.sync(db)
+
+
+def revoke_user_sessions(db: Session, user_id: int):
+    """Log the user out everywhere"""
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=utcnow(), revoke_reason="logout_all")
+    )
+    db.commit()
+    token_cache.revoke_user(user_id)
+    revoked_jtis.sync(db)
+
+
+def within_grace(revoked_at: float, rotated: bool) -> bool:
+    """A just-rotated token presented again: parallel refreshes from one client, not a copy"""
+    return rotated and time.time() - revoked_at <= settings.REFRESH_REUSE_GRACE_SECONDS
+
+
+def reuse_detected(db: Session, family: str):
+    db.rollback()
+    revoke_family(db, family, "reuse")
+    logger.warning(f"Refresh token reuse detected, revoked family {family}")
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token already used; please sign in again"
+    )
+
+
+def rotate_refresh_token(db: Session, payload: dict, claims: dict) -> str:
+    """
+    Revoke the presented token and issue its successor in the same family.
+    The revocation check is in memory; the database is only read when the
+    conditional update finds the token already gone (another worker got there
+    first, or it was revoked since the last sync).
+    """
+    jti, family = payload["jti"], payload["fam"]
+    revoked = revoked_jtis.get(jti)
+    if revoked is not None and not within_grace(revoked[1], revoked[2]):
+        reuse_detected(db, family)
+
+    token, new_jti = issue_refresh_token(db, int(payload["sub"]), claims, family)
+    now = utcnow()
+    rotated = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.jti == jti, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now, revoke_reason="rotated", replaced_by=new_jti)
+    ).rowcount
+    if not rotated:
+        row = db.scalar(select(RefreshToken).where(RefreshToken.jti == jti))
+        family_ended = db.scalar(
+            select(RefreshToken.id).where(
+                RefreshToken.family == family,
+                RefreshToken.revoke_reason.in_(("logout", "logout_all", "reuse"))
+            ).limit(1)
+        )
+        if row is None or family_ended or not within_grace(epoch(row.revoked_at), row.revoke_reason == "rotated"):
+            reuse_detected(db, family)
+    db.commit()
+    if rotated:
+        revoked_jtis.add(jti, payload["exp"], epoch(now), True)
+    return token
+
+
+def purge_expired_refresh_tokens(db: Session) -> int:
+    """
+    Delete expired rows under the database-wide lock, so workers purge one at a
+    time instead of stacking up on the write lock; returns how many went
+    """
+    take_startup_lock(db.connection())
+    removed = db.execute(delete(RefreshToken).where(RefreshToken.expires_at < utcnow())).rowcount
+    db.commit()
+    return removed
+
+
+async def run_revocation_sync(interval_seconds: int):
+    """Background task started from the app lifespan; reads only"""
+    def job():
+        db = SessionLocal()
+        try:
+            revoked_jtis.sync(db)
+        finally:
+            db.close()
+
+    while True:
+        try:
+            await run_in_threadpool(job)
+        except Exception as e:
+            logger.error(f"Refresh token revocation sync failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+async def run_refresh_token_purge(interval_seconds: int):
+    """Background task started from the app lifespan; first purge one interval after boot"""
+    def job():
+        db = SessionLocal()
+        try:
+            return purge_expired_refresh_tokens(db)
+        finally:
+            db.close()
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            removed = await run_in_threadpool(job)
+            if removed:
+                logger.info(f"Purged {removed} expired refresh tokens")
+        except Exception as e:
+            logger.error(f"Refresh token purge failed: {e}")
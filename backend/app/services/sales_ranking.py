@@ -0,0 +1,279 @@
+import asyncio
+import heapq
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..models.order import Order, OrderItem
+from ..models.pack import Pack, PackVariant
+from ..models.product import Product
+from ..models.sales import SalesDaily
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = (7, 30, 90)
+ITEM_TYPES = ("product", "pack_variant")
+
+ItemKey = Tuple[str, int]  # (item_type, item_id)
+
+
+def today_utc() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+class SalesRanking:
+    """
+    In-memory rolling sales counters with a cached top-K per window.
+
+    Counters are kept as daily buckets per item so a window total is just the
+    sum of its last N buckets. Checkouts in this worker are added incrementally
+    and patched into the cached top-K in place; `load` replaces everything
+    from the sales_daily table, which is how buckets age out of a window and
+    how sales from other workers are picked up.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._lock = threading.Lock()
+        self._buckets: Dict[ItemKey, Dict[date, List[int]]] = {}
+        self._names: Dict[ItemKey, str] = {}
+        self._top: Dict[Tuple[str, int], List[dict]] = {}
+        self._as_of: date = today_utc()
+
+    def load(self, rows, names: Dict[ItemKey, str], as_of: date):
+        buckets: Dict[ItemKey, Dict[date, List[int]]] = defaultdict(dict)
+        for item_type, item_id, day, qty, revenue in rows:
+            buckets[(item_type, item_id)][day] = [qty, revenue]
+        with self._lock:
+            self._buckets = dict(buckets)
+            self._names = names
+            self._as_of = as_of
+            self._top = {}
+
+    def add(self, key: ItemKey, name: str, day: date, qty: int, revenue: int):
+        with self._lock:
+            bucket = self._buckets.setdefault(key, {}).setdefault(day, [0, 0])
+            bucket[0] += qty
+            bucket[1] += revenue
+            self._names.setdefault(key, name)
+            self._update_top(key, day, qty)
+
+    def _update_top(self, key: ItemKey, day: date, qty: int):
+        """
+        Patch the cached rankings that include `key` and `day` with the key's
+        new totals. A sale can only move the key up, so it's re-placed in the
+        list; a cancellation in a full list could let an unlisted item
+        overtake it, so that list alone is dropped and re-ranked on next read.
+        """
+        for (item_type, window), ranked in list(self._top.items()):
+            if item_type != key[0] or day < self._start(window):
+                continue
+            listed = any(r["item_id"] == key[1] for r in ranked)
+            if qty < 0 and listed and len(ranked) >= self.size:
+                del self._top[(item_type, window)]
+                continue
+            units, revenue = self._totals(key, window)
+            ranked = [r for r in ranked if r["item_id"] != key[1]]
+            if units > 0:
+                ranked.append(self._entry(key, units, revenue))
+                ranked.sort(key=lambda r: (r["units_sold"], r["revenue"]), reverse=True)
+            self._top[(item_type, window)] = ranked[:self.size]
+
+    def _start(self, window: int) -> date:
+        return self._as_of - timedelta(days=window - 1)
+
+    def _totals(self, key: ItemKey, window: int) -> Tuple[int, int]:
+        start = self._start(window)
+        qty = revenue = 0
+        for day, (q, r) in self._buckets.get(key, {}).items():
+            if day >= start:
+                qty += q
+                revenue += r
+        return qty, revenue
+
+    def _entry(self, key: ItemKey, qty: int, revenue: int) -> dict:
+        return {
+            "item_type": key[0],
+            "item_id": key[1],
+            "name": self._names.get(key, ""),
+            "units_sold": qty,
+            "revenue": revenue,
+        }
+
+    def _rank(self, item_type: str, window: int) -> List[dict]:
+        totals = []
+        for key in self._buckets:
+            if key[0] != item_type:
+                continue
+            qty, revenue = self._totals(key, window)
+            if qty > 0:
+                totals.append((qty, revenue, key))
+        return [
+            self._entry(key, qty, revenue)
+            for qty, revenue, key in heapq.nlargest(self.size, totals, key=lambda t: (t[0], t[1]))
+        ]
+
+    def top(self, window: int, limit: int, item_type: Optional[str] = None) -> List[dict]:
+        types = [item_type] if item_type else list(ITEM_TYPES)
+        with self._lock:
+            ranked = []
+            for t in types:
+                if (t, window) not in self._top:
+                    self._top[(t, window)] = self._rank(t, window)
+                ranked.extend(self._top[(t, window)])
+        if len(types) > 1:
+            ranked.sort(key=lambda r: (r["units_sold"], r["revenue"]), reverse=True)
+        return ranked[:limit]
+
+
+sales_ranking = SalesRanking(settings.TOP_SELLERS_SIZE)
+
+
+def _insert(bind):
+    if bind.dialect.name == "postgresql":
+        return postgresql.insert(SalesDaily)
+    return sqlite.insert(SalesDaily)
+
+
+def _sales_key(product_id: Optional[int], pack_variant_id: Optional[int]) -> Optional[ItemKey]:
+    if pack_variant_id:
+        return ("pack_variant", pack_variant_id)
+    if product_id:
+        return ("product", product_id)
+    return None  # Pack lines from before pack_variant_id was recorded
+
+
+def _apply_sales(db: Session, entries: List[tuple]):
+    for (item_type, item_id), _, day, qty, revenue in entries:
+        stmt = _insert(db.get_bind()).values(item_type=item_type, item_id=item_id, day=day, qty=qty, revenue=revenue)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["item_type", "item_id", "day"],
+            set_={"qty": SalesDaily.qty + qty, "revenue": SalesDaily.revenue + revenue},
+        )
+        db.execute(stmt)
+
+
+def record_sales(db: Session, order_items: List[dict], day: Optional[date] = None) -> List[tuple]:
+    """
+    Add checkout lines to today's sales buckets inside the caller's transaction.
+    Returns entries to hand to `publish_sales` once the transaction commits.
+    """
+    day = day or today_utc()
+    entries = []
+    for item in order_items:
+        key = _sales_key(item.get("product_id"), item.get("pack_variant_id"))
+        if key:
+            entries.append((key, item["name_snapshot"], day, item["qty"], item["line_total"]))
+    _apply_sales(db, entries)
+    return entries
+
+
+def record_status_change(db: Session, order: Order, old_status: str, new_status: str) -> List[tuple]:
+    """
+    Take a cancelled order's lines back out of its day's buckets (or put them
+    back when it's un-cancelled), inside the caller's transaction; returns
+    entries for `publish_sales`. Days already aged out of every window are
+    left alone.
+    """
+    if (old_status == "cancelled") == (new_status == "cancelled"):
+        return []
+    sign = 1 if old_status == "cancelled" else -1
+    day = order.created_at.date()
+    if day < today_utc() - timedelta(days=max(WINDOWS) - 1):
+        return []
+    entries = []
+    for item in order.items:
+        key = _sales_key(item.product_id, item.pack_variant_id)
+        if key:
+            entries.append((key, item.name_snapshot, day, sign * item.qty, sign * item.line_total))
+    _apply_sales(db, entries)
+    return entries
+
+
+def publish_sales(entries: List[tuple]):
+    """Apply committed sales entries to this worker's in-memory ranking"""
+    for key, name, day, qty, revenue in entries:
+        sales_ranking.add(key, name, day, qty, revenue)
+
+
+def backfill_sales_daily(conn: Connection, since: date) -> int:
+    """
+    Build buckets from order history. Run once, by migration 0006 under the
+    startup lock; each bucket is set to its history total, so checkouts
+    already recorded in sales_daily are not counted twice.
+    """
+    day_col = func.date(Order.created_at)
+    rows = conn.execute(
+        select(OrderItem.product_id, OrderItem.pack_variant_id, day_col, func.sum(OrderItem.qty), func.sum(OrderItem.line_total))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.created_at >= datetime.combine(since, datetime.min.time()), Order.status != "cancelled")
+        .group_by(OrderItem.product_id, OrderItem.pack_variant_id, day_col)
+    ).all()
+    count = 0
+    for product_id, pack_variant_id, day, qty, revenue in rows:
+        key = _sales_key(product_id, pack_variant_id)
+        if not key:
+            continue
+        item_type, item_id = key
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        stmt = _insert(conn).values(item_type=item_type, item_id=item_id, day=day, qty=qty, revenue=revenue)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=["item_type", "item_id", "day"],
+            set_={"qty": stmt.excluded.qty, "revenue": stmt.excluded.revenue},
+        ))
+        count += 1
+    return count
+
+
+def refresh_sales_ranking(db: Session):
+    """
+    Periodic job: drop buckets older than the longest window and reload the
+    in-memory ranking from the database.
+    """
+    as_of = today_utc()
+    since = as_of - timedelta(days=max(WINDOWS) - 1)
+
+    db.query(SalesDaily).filter(SalesDaily.day < since).delete(synchronize_session=False)
+    db.commit()
+
+    rows = (
+        db.query(SalesDaily.item_type, SalesDaily.item_id, SalesDaily.day, SalesDaily.qty, SalesDaily.revenue)
+        .filter(SalesDaily.day >= since)
+        .all()
+    )
+
+    names: Dict[ItemKey, str] = {}
+    for pid, name in db.query(Product.id, Product.name).all():
+        names[("product", pid)] = name
+    for vid, vname, pname in db.query(PackVariant.id, PackVariant.name, Pack.name).join(Pack, Pack.id == PackVariant.pack_id).all():
+        names[("pack_variant", vid)] = f"{pname} - {vname}"
+
+    sales_ranking.load(rows, names, as_of)
+    logger.info(f"Sales ranking refreshed: {len(rows)} daily buckets")
+
+
+def _refresh_job():
+    db = SessionLocal()
+    try:
+        refresh_sales_ranking(db)
+    finally:
+        db.close()
+
+
+async def run_sales_ranking_refresher(interval_seconds: int):
+    """Background task started from the app lifespan; first refresh runs immediately"""
+    while True:
+        try:
+            await run_in_threadpool(_refresh_job)
+        except Exception as e:
+            logger.error(f"Sales ranking refresh failed: {e}")
+        await asyncio.sleep(interval_seconds)
@@ -1,6 +1,7 @@
-import africastalking
 import logging
+import time
 from typing import Optional
+from ..core.metrics import SMS_FAILURES, SMS_LATENCY
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,9 @@ class SMSService:
         
         if username and api_key:
             try:
+                # Imported on first use: the SDK drags in requests and its HTTP
+                # stack, which deployments without SMS credentials never need
+                import africastalking
                 africastalking.initialize(username=username, api_key=api_key)
                 self.sms = africastalking.SMS
                 self.initialized = True
@@ -53,15 +57,19 @@ class SMSService:
             logger.warning("SMS service not initialized, skipping SMS")
             return {"success": False, "error": "SMS service not configured"}
         
+        start = time.perf_counter()
         try:
             formatted_phone = self.format_phone_number(phone_number)
             response = self.sms.send(message, [formatted_phone])
+            SMS_LATENCY.observe(time.perf_counter() - start)
             
             logger.info(f"SMS sent to {formatted_phone}: {response}")
             
             # Check response
             if response.get('SMSMessageData', {}).get('Recipients'):
                 recipient = response['SMSMessageData']['Recipients'][0]
+                if recipient.get('status') != 'Success':
+                    SMS_FAILURES.inc()
                 return {
                     "success": recipient.get('status') == 'Success',
                     "message_id": recipient.get('messageId'),
@@ -72,6 +80,8 @@ class SMSService:
             return {"success": True, "response": response}
         
         except Exception as e:
+            SMS_LATENCY.observe(time.perf_counter() - start)
+            SMS_FAILURES.inc()
             logger.error(f"Failed to send SMS to {phone_number}: {str(e)}")
             return {"success": False, "error": str(e)}
     
@@ -109,6 +119,12 @@ class SMSService:
             message = f"{base_msg} Please upload a valid receipt."
         return self.send_sms(phone, message)
 
+    
+    def send_low_stock_alert(self, phone: str, product_name: str, stock_qty: int, threshold: int) -> dict:
+        """Send admin alert when a product runs low on stock"""
+        message = f"FoodNova stock alert: {product_name} is down to {stock_qty} (reorder at {threshold}). Please restock."
+        return self.send_sms(phone, message)
+
 
 # Global SMS service instance (initialized in main.py)
 sms_service: Optional[SMSService] = None
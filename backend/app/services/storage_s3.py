@@ -0,0 +1,184 @@
+"""
+S3-compatible receipt storage (AWS S3, MinIO, R2, ...), selected with
+UPLOAD_DRIVER=s3. Needs boto3 (`pip install boto3`).
+
+One client per process is shared by every request and thread, with a
+connection pool S3_MAX_POOL_CONNECTIONS wide. Files over
+S3_MULTIPART_THRESHOLD_MB go up as parallel multipart uploads. Clients can
+also PUT a receipt straight into the bucket with a presigned URL, so the
+bytes never pass through an API worker: those land under incoming/<user>/
+and are copied to their content address inside the bucket when the upload
+is completed; ones never completed are removed by the upload GC
+(sweep_incoming). Files are downloaded from presigned GET URLs the same way.
+"""
+import base64
+import hashlib
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from mimetypes import guess_type
+from pathlib import Path
+from typing import Optional, Tuple
+from ..core.config import settings
+from ..core.file_serving import CACHE_CONTROL
+from .receipts import CHUNK_SIZE, StorageDriver
+
+MB = 1024 * 1024
+
+
+@lru_cache(maxsize=None)
+def s3_client(endpoint_url: str, region: str, access_key_id: str, secret_access_key: str, pool_size: int):
+    """Shared, thread-safe client; empty credentials fall back to the default AWS chain"""
+    import boto3
+    from botocore.config import Config
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint_url or None,
+        region_name=region,
+        aws_access_key_id=access_key_id or None,
+        aws_secret_access_key=secret_access_key or None,
+        config=Config(
+            signature_version="s3v4",
+            max_pool_connections=pool_size,
+            retries={"max_attempts": 3, "mode": "standard"},
+        ),
+    )
+
+
+def content_type(filename: str) -> str:
+    return guess_type(filename)[0] or "application/octet-stream"
+
+
+class S3StorageDriver(StorageDriver):
+    """Receipts in an S3 bucket, under S3_PREFIX"""
+
+    supports_direct_upload = True
+    INCOMING = "incoming/"
+
+    def __init__(self, bucket: str, prefix: str = ""):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = s3_client(
+            settings.S3_ENDPOINT_URL, settings.S3_REGION, settings.S3_ACCESS_KEY_ID,
+            settings.S3_SECRET_ACCESS_KEY, settings.S3_MAX_POOL_CONNECTIONS,
+        )
+
+    def _key(self, file_key: str) -> str:
+        return self.prefix + file_key
+
+    def _transfer_config(self):
+        from boto3.s3.transfer import TransferConfig
+        return TransferConfig(
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD_MB * MB,
+            multipart_chunksize=settings.S3_MULTIPART_CHUNK_MB * MB,
+            max_concurrency=4,
+        )
+
+    def save(self, temp_path: str, filename: str) -> str:
+        self.client.upload_file(
+            temp_path, self.bucket, self._key(filename),
+            ExtraArgs={"ContentType": content_type(filename), "CacheControl": CACHE_CONTROL},
+            Config=self._transfer_config(),
+        )
+        os.unlink(temp_path)
+        return filename
+
+    def delete(self, file_key: str) -> bool:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(file_key))
+        return True
+
+    def get_url(self, file_key: str, base_url: str = "") -> str:
+        # Still the API route: it checks the signed link, then redirects to the bucket
+        return f"{base_url}/api/uploads/{file_key}"
+
+    def fetch(self, file_key: str) -> Tuple[str, bool]:
+        fd, path = tempfile.mkstemp(prefix="fetch-", suffix=Path(file_key).suffix)
+        os.close(fd)
+        self.client.download_file(self.bucket, self._key(file_key), path, Config=self._transfer_config())
+        return path, True
+
+    def exists(self, file_key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(file_key))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def download_url(self, file_key: str) -> Optional[str]:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(file_key), "ResponseCacheControl": CACHE_CONTROL},
+            ExpiresIn=settings.S3_PRESIGN_SECONDS,
+        )
+
+    # ----- Direct uploads -----
+
+    def presign_upload(self, owner: str, ext: str, size: int, sha256: str) -> Tuple[str, str, dict]:
+        """
+        (upload key, PUT URL, headers the client must send). Length and
+        checksum are signed, so S3 refuses any other size or content.
+        """
+        upload_key = f"{self.INCOMING}{owner}/{uuid.uuid4().hex}{ext}"
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket, "Key": self._key(upload_key), "ContentType": content_type(upload_key),
+                "ContentLength": size, "ChecksumSHA256": checksum,
+            },
+            ExpiresIn=settings.S3_PRESIGN_SECONDS,
+        )
+        return upload_key, url, {"Content-Type": content_type(upload_key), "x-amz-checksum-sha256": checksum}
+
+    def inspect_upload(self, upload_key: str) -> Optional[Tuple[int, Optional[str]]]:
+        """(size, sha256 hex if the store kept the checksum) of a direct upload; None if it isn't there"""
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(upload_key), ChecksumMode="ENABLED")
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        checksum = head.get("ChecksumSHA256")
+        return head["ContentLength"], base64.b64decode(checksum).hex() if checksum else None
+
+    def hash_upload(self, upload_key: str) -> str:
+        """SHA-256 of a direct upload, read back from the bucket (stores that don't keep checksums)"""
+        digest = hashlib.sha256()
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(upload_key))["Body"]
+        for chunk in body.iter_chunks(CHUNK_SIZE):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def adopt_upload(self, upload_key: str, file_key: str):
+        """Move a direct upload to its final key, copying inside the bucket"""
+        self.client.copy(
+            {"Bucket": self.bucket, "Key": self._key(upload_key)}, self.bucket, self._key(file_key),
+            ExtraArgs={"ContentType": content_type(file_key), "CacheControl": CACHE_CONTROL, "MetadataDirective": "REPLACE"},
+            Config=self._transfer_config(),
+        )
+        self.delete(upload_key)
+
+    def sweep_incoming(self, grace_seconds: float, dry_run: bool = False) -> Tuple[int, int]:
+        """
+        Delete direct uploads older than the grace period that were never
+        completed (completing moves them out of incoming/); returns (listed,
+        removed). Safe to run from several workers at once: deletes are
+        idempotent.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+        listed = removed = 0
+        pages = self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self._key(self.INCOMING))
+        for page in pages:  # At most 1000 keys each, the delete_objects limit
+            objects = page.get("Contents", [])
+            stale = [{"Key": o["Key"]} for o in objects if o["LastModified"] < cutoff]
+            if stale and not dry_run:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": stale, "Quiet": True})
+            listed += len(objects)
+            removed += len(stale)
+        return listed, removed
@@ -0,0 +1,389 @@
+"""
+Upload directory maintenance for the local storage driver (and, for the s3
+driver, the gc of abandoned direct uploads).
+
+reshard: moves files from the old flat UPLOAD_DIR layout into the sharded
+one (see receipts.shard_dirs). Safe to run while the API serves: each move is
+an atomic rename and lookups fall back to the flat path until it happens.
+
+gc: removes files no receipt references. Files are streamed from a directory
+walk and checked against the database UPLOAD_GC_BATCH at a time, each batch
+in its own short session. A content file is live while a receipt has its key;
+a thumbnail or preview while its stored_files row belongs to live content.
+Only files older than UPLOAD_GC_GRACE_HOURS are touched, which covers uploads
+that are on disk but whose receipt hasn't committed yet; a dead file's
+stored_files row is deleted first so a re-upload of the same content stores
+it afresh instead of pointing at the file being removed, and only files whose
+row that DELETE actually removed (or that no row or receipt knows) are
+unlinked, so content re-referenced mid-sweep stays. Stale temp files in
+.incoming (a crashed upload or render) go after the same grace period. The
+API runs it every UPLOAD_GC_INTERVAL_SECONDS; a lock file keeps it to one
+worker at a time per upload directory. With the s3 driver, gc instead removes
+direct uploads left in the bucket's incoming/ prefix past the grace period.
+After its sweep, the worker that ran it also retries thumbnail and preview
+jobs that were skipped or lost (receipts.requeue_renditions).
+
+archive: moves cold files to the archive segments (services.receipt_archive):
+receipts whose every order is delivered and older than
+UPLOAD_ARCHIVE_AFTER_DAYS, with their previews (thumbnails stay hot, they are
+what the admin lists show). Entries are fsynced and indexed before the hot
+copy is removed, so a crash leaves a file in both tiers, never in neither.
+The API runs it every UPLOAD_ARCHIVE_INTERVAL_SECONDS. reindex rebuilds
+missing archived_files rows from the segment headers.
+
+    python -m app.services.upload_files reshard
+    python -m app.services.upload_files gc [--dry-run]
+    python -m app.services.upload_files archive
+    python -m app.services.upload_files reindex
+"""
+import argparse
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import delete, exists, insert, or_, select
+from sqlalchemy.orm import Session, aliased
+from starlette.concurrency import run_in_threadpool
+from ..core.config import settings
+from ..core.metrics import UPLOAD_GC_FILES
+from ..db.session import SessionLocal
+from ..models.archived_file import ArchivedFile
+from ..models.order import Order
+from ..models.receipt import Receipt
+from ..models.stored_file import StoredFile
+from .receipt_archive import ReceiptArchive
+from .receipts import LocalStorageDriver, get_storage_driver, requeue_renditions
+from .. import models  # noqa: F401  (the CLI maps every model, as the app does)
+
+logger = logging.getLogger(__name__)
+
+# Wait after startup before the first sweep, so it doesn't compete with boot
+GC_STARTUP_DELAY_SECONDS = 60
+
+
+def reshard_uploads(driver: LocalStorageDriver) -> int:
+    """Move flat-layout files to their sharded paths; returns how many moved"""
+    moved = 0
+    with os.scandir(driver.upload_dir) as entries:
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                continue
+            target = driver.sharded_path(entry.name)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(entry.path, target)
+            moved += 1
+    return moved
+
+
+def iter_stored_files(root: str) -> Iterator[Tuple[str, str, float]]:
+    """(key, path, mtime) of every stored file, sharded or flat; hidden entries are skipped"""
+    pending = [root]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.name, entry.path, entry.stat(follow_symlinks=False).st_mtime
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def live_keys(db: Session, keys: List[str]) -> Set[str]:
+    """The subset of `keys` still referenced by a receipt, directly or as a rendition of its content"""
+    live = set(db.scalars(select(Receipt.file_key).where(Receipt.file_key.in_(keys))))
+    content_in_use = exists().where(Receipt.file_key == StoredFile.file_key)
+    for column in (StoredFile.thumbnail_key, StoredFile.preview_key):
+        live.update(db.scalars(select(column).where(column.in_(keys), content_in_use)))
+    return live
+
+
+def claim_dead_keys(db: Session, keys: List[str]) -> Set[str]:
+    """
+    The files safe to unlink, given `keys` that live_keys found unreferenced,
+    decided in the caller's transaction: content whose stored_files row this
+    actually deletes (RETURNING) with that row's renditions, which may be
+    outside `keys`, and files in `keys` that no stored_files row or receipt
+    knows at all. An upload that referenced the content since live_keys ran
+    keeps both its row and its file.
+    """
+    in_keys = StoredFile.file_key.in_(keys)
+    # A deduplicating upload holds its row until its receipt commits; once we
+    # hold the rows, the DELETE is a new statement that sees that receipt
+    # (Postgres READ COMMITTED; SQLite serializes writers anyway)
+    db.execute(select(StoredFile.id).where(in_keys).with_for_update())
+    deleted = db.execute(
+        delete(StoredFile)
+        .where(in_keys, ~exists().where(Receipt.file_key == StoredFile.file_key))
+        .returning(StoredFile.file_key, StoredFile.thumbnail_key, StoredFile.preview_key)
+    ).all()
+    claimed = {key for row in deleted for key in row if key}
+
+    known = set(db.scalars(select(Receipt.file_key).where(Receipt.file_key.in_(keys))))
+    for column in (StoredFile.file_key, StoredFile.thumbnail_key, StoredFile.preview_key):
+        known.update(db.scalars(select(column).where(column.in_(keys))))
+    return claimed | {key for key in keys if key not in known}
+
+
+def remove_if_older(path: str, cutoff: float) -> bool:
+    """Unlink unless the file was (re)written since `cutoff`, e.g. re-uploaded while the sweep ran"""
+    try:
+        if os.stat(path).st_mtime >= cutoff:
+            return False
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def collect_orphans(
+    driver: LocalStorageDriver,
+    session_factory: Callable[[], Session] = SessionLocal,
+    grace_seconds: float = None,
+    batch_size: int = None,
+    dry_run: bool = False,
+) -> dict:
+    """One GC sweep; returns counts of files checked and removed"""
+    grace_seconds = settings.UPLOAD_GC_GRACE_HOURS * 3600 if grace_seconds is None else grace_seconds
+    cutoff = time.time() - grace_seconds
+    counts = {"checked": 0, "orphans": 0, "stale_temp": 0}
+
+    old_files = (f for f in iter_stored_files(str(driver.upload_dir)) if f[2] < cutoff)
+    for batch in batched(old_files, batch_size or settings.UPLOAD_GC_BATCH):
+        counts["checked"] += len(batch)
+        db = session_factory()
+        try:
+            live = live_keys(db, [key for key, _, _ in batch])
+            dead = [(key, path) for key, path, _ in batch if key not in live]
+            if dead and not dry_run:
+                claimed = claim_dead_keys(db, [key for key, _ in dead])
+                db.commit()
+                dead = [(key, path) for key, path in dead if key in claimed]
+                # Renditions of content deleted here whose files fell in another batch
+                for key in claimed - {key for key, _ in dead}:
+                    path = driver.resolve(key)
+                    if path is not None:
+                        dead.append((key, str(path)))
+        finally:
+            db.close()
+        for key, path in dead:
+            if dry_run:
+                logger.info(f"Upload GC would remove {key}")
+                counts["orphans"] += 1
+            elif remove_if_older(path, cutoff):
+                counts["orphans"] += 1
+                UPLOAD_GC_FILES.labels("orphan").inc()
+
+    with os.scandir(driver.staging_dir) as entries:
+        stale = [e.path for e in entries if e.is_file(follow_symlinks=False) and e.stat().st_mtime < cutoff]
+    for path in stale:
+        if dry_run:
+            counts["stale_temp"] += 1
+        elif remove_if_older(path, cutoff):
+            counts["stale_temp"] += 1
+            UPLOAD_GC_FILES.labels("stale_temp").inc()
+    return counts
+
+
+def sweep_once(driver: LocalStorageDriver, **kwargs) -> dict:
+    """collect_orphans under a lock file in the upload dir; None if another worker is sweeping"""
+    with open(driver.upload_dir / ".gc.lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        return collect_orphans(driver, **kwargs)
+
+
+def sweep_incoming(driver, grace_seconds: float = None, dry_run: bool = False) -> dict:
+    """Stale direct uploads in the bucket (s3 driver); same counts as collect_orphans"""
+    grace_seconds = settings.UPLOAD_GC_GRACE_HOURS * 3600 if grace_seconds is None else grace_seconds
+    checked, removed = driver.sweep_incoming(grace_seconds, dry_run=dry_run)
+    if not dry_run:
+        UPLOAD_GC_FILES.labels("stale_temp").inc(removed)
+    return {"checked": checked, "orphans": 0, "stale_temp": removed}
+
+
+def sweep(driver, **kwargs) -> Optional[dict]:
+    if isinstance(driver, LocalStorageDriver):
+        return sweep_once(driver, **kwargs)
+    return sweep_incoming(driver, **kwargs)
+
+
+async def run_upload_gc(interval_seconds: int):
+    """Background task started from the app lifespan"""
+    await asyncio.sleep(min(GC_STARTUP_DELAY_SECONDS, interval_seconds))
+    while True:
+        try:
+            counts = await run_in_threadpool(sweep, get_storage_driver())
+            if counts and (counts["orphans"] or counts["stale_temp"]):
+                logger.info(f"Upload GC removed {counts['orphans']} orphaned and {counts['stale_temp']} stale temp files")
+            if counts is not None:  # The worker that swept also retries missing thumbnails
+                retried = await requeue_renditions()
+                if retried:
+                    logger.info(f"Upload GC retried thumbnails for {retried} stored files")
+        except Exception as e:
+            logger.error(f"Upload GC failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+def cold_keys(db: Session, cutoff: datetime, after_key: str, limit: int) -> List[str]:
+    """
+    Next `limit` receipt file keys after `after_key` that aren't archived yet
+    and whose every receipt is on a delivered order placed before `cutoff`
+    (deduplicated content can be shared with a recent order)
+    """
+    other, other_order = aliased(Receipt), aliased(Order)
+    still_warm = exists().where(
+        other.file_key == Receipt.file_key, other_order.id == other.order_id,
+        or_(other_order.status != "delivered", other_order.created_at >= cutoff),
+    )
+    return list(db.scalars(
+        select(Receipt.file_key)
+        .join(Order, Order.id == Receipt.order_id)
+        .where(
+            Order.status == "delivered", Order.created_at < cutoff, Receipt.file_key > after_key,
+            ~still_warm, ~exists().where(ArchivedFile.file_key == Receipt.file_key),
+        )
+        .distinct().order_by(Receipt.file_key).limit(limit)
+    ))
+
+
+def archive_cold_files(
+    driver: LocalStorageDriver,
+    archive: ReceiptArchive = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+    after_days: int = None,
+    batch_size: int = None,
+) -> Optional[dict]:
+    """One tiering run; None if another process is writing the archive"""
+    archive = archive or ReceiptArchive()
+    after_days = settings.UPLOAD_ARCHIVE_AFTER_DAYS if after_days is None else after_days
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=after_days)
+    counts = {"files": 0, "bytes": 0, "stored_bytes": 0}
+
+    with archive.writer() as writer:
+        if writer is None:
+            return None
+        after_key = ""
+        while True:
+            db = session_factory()
+            try:
+                keys = cold_keys(db, cutoff, after_key, batch_size or settings.UPLOAD_GC_BATCH)
+                if not keys:
+                    break
+                after_key = keys[-1]
+                previews = db.scalars(select(StoredFile.preview_key).where(
+                    StoredFile.file_key.in_(keys), StoredFile.preview_key.is_not(None),
+                    ~exists().where(ArchivedFile.file_key == StoredFile.preview_key),
+                ))
+                rows, moved = [], []
+                for key in dict.fromkeys([*keys, *previews]):
+                    path = driver.resolve(key)
+                    if path is None:
+                        continue
+                    rows.append(writer.append(key, path.read_bytes()))
+                    moved.append(path)
+                writer.sync()
+                if rows:
+                    db.execute(insert(ArchivedFile), rows)
+                    db.commit()
+            finally:
+                db.close()
+            for path, row in zip(moved, rows):
+                path.unlink(missing_ok=True)
+                counts["files"] += 1
+                counts["bytes"] += row["size"]
+                counts["stored_bytes"] += row["stored_size"]
+    return counts
+
+
+def reindex_archive(archive: ReceiptArchive = None, session_factory: Callable[[], Session] = SessionLocal) -> int:
+    """Add archived_files rows for segment entries the index is missing; returns how many"""
+    archive = archive or ReceiptArchive()
+    added = 0
+    db = session_factory()
+    try:
+        for segment in archive.segments():
+            for batch in batched(archive.iter_entries(segment), 500):
+                keys = [entry["file_key"] for entry in batch]
+                known = set(db.scalars(select(ArchivedFile.file_key).where(ArchivedFile.file_key.in_(keys))))
+                rows = []
+                for entry in batch:
+                    # A key archived twice (a run that crashed before indexing): the first copy wins
+                    if entry["file_key"] not in known:
+                        known.add(entry["file_key"])
+                        rows.append(entry)
+                if rows:
+                    db.execute(insert(ArchivedFile), rows)
+                    db.commit()
+                    added += len(rows)
+    finally:
+        db.close()
+    return added
+
+
+async def run_upload_archiver(interval_seconds: int):
+    """Background task started from the app lifespan (local storage only)"""
+    await asyncio.sleep(min(GC_STARTUP_DELAY_SECONDS, interval_seconds))
+    while True:
+        try:
+            counts = await run_in_threadpool(archive_cold_files, get_storage_driver())
+            if counts and counts["files"]:
+                logger.info(
+                    f"Archived {counts['files']} cold upload files, "
+                    f"{counts['bytes'] // 1024} KB stored as {counts['stored_bytes'] // 1024} KB"
+                )
+        except Exception as e:
+            logger.error(f"Upload archiving failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FoodNova upload directory maintenance")
+    parser.add_argument("command", choices=["reshard", "gc", "archive", "reindex"])
+    parser.add_argument("--dry-run", action="store_true", help="gc: list orphans without removing anything")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    driver = get_storage_driver()
+    if not isinstance(driver, LocalStorageDriver) and args.command != "gc":
+        parser.error("only the local storage driver keeps an upload directory")
+    if args.command == "reshard":
+        print(f"Moved {reshard_uploads(driver)} file(s) into the sharded layout")
+        return
+    if args.command == "reindex":
+        print(f"Indexed {reindex_archive()} archived file(s)")
+        return
+    if args.command == "archive":
+        counts = archive_cold_files(driver)
+        if counts is None:
+            print("Another process is already writing the archive")
+            return
+        print(f"Archived {counts['files']} file(s), {counts['bytes']} bytes stored as {counts['stored_bytes']}")
+        return
+    counts = sweep(driver, dry_run=args.dry_run)
+    if counts is None:
+        print("Another process is already sweeping this upload directory")
+        return
+    verb = "would remove" if args.dry_run else "removed"
+    print(f"Checked {counts['checked']} file(s); {verb} {counts['orphans']} orphaned, "
+          f"{counts['stale_temp']} stale temp file(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Cached user profiles (id, email, full name, role, is_active).
+
+get_current_user checks is_active on every authenticated request and
+/auth/me, /auth/refresh and the SMS paths need names and emails; with the
+profile cached none of them touch the users table. Entries expire after
+USER_CACHE_TTL_SECONDS and are dropped as soon as this process commits a
+change to the user, so the TTL only bounds how long other workers can serve
+a stale profile. Disabling a user also revokes their access tokens here.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.metrics import USER_CACHE_LOOKUPS
+from ..core.token_cache import token_cache
+from ..db.session import async_session
+from ..models.user import User
+from ..schemas.auth import UserResponse
+
+
+class UserProfileCache:
+    """Thread-safe LRU of user profiles with a TTL"""
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # user id -> (profile, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[UserResponse]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[user_id]
+                entry = None
+            if entry is None:
+                USER_CACHE_LOOKUPS.labels("miss").inc()
+                return None
+            self._entries.move_to_end(user_id)
+        USER_CACHE_LOOKUPS.labels("hit").inc()
+        return entry[0]
+
+    def put(self, user: User) -> UserResponse:
+        profile = UserResponse.model_validate(user)
+        if self.maxsize > 0:
+            with self._lock:
+                self._entries[user.id] = (profile, time.monotonic() + self.ttl_seconds)
+                self._entries.move_to_end(user.id)
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return profile
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_profiles = UserProfileCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+
+async def get_user_profile(user_id: int) -> Optional[UserResponse]:
+    """
+    Profile from the cache, or from the database on a miss (None if the user
+    doesn't exist). Opens its own session: a route that already holds one
+    must use `db.run_sync(load_user_profile, user_id)` instead, or it can
+    wait forever on a connection (or SQLite writer slot) it is holding.
+    """
+    profile = user_profiles.get(user_id)
+    if profile is None:
+        async with async_session() as db:
+            user = await db.get(User, user_id)
+            if user is not None:
+                profile = user_profiles.put(user)
+    return profile
+
+
+def load_user_profile(db: Session, user_id: int) -> Optional[UserResponse]:
+    """get_user_profile for sync routes, reusing the route's session on a miss"""
+    profile = user_profiles.get(user_id)
+    if profile is None:
+        user = db.get(User, user_id)
+        if user is not None:
+            profile = user_profiles.put(user)
+    return profile
+
+
+# Users changed in a session's transaction (id -> revoke their access tokens),
+# acted on once it commits: dropping the entry at flush would let a read in
+# between cache the old row again, and a rollback must not revoke anything
+STALE_USERS = "stale_user_profiles"
+
+
+def _mark_stale(target: User, revoke: bool):
+    session = Session.object_session(target)
+    stale = session.info.setdefault(STALE_USERS, {})
+    stale[target.id] = stale.get(target.id, False) or revoke
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target: User):
+    _mark_stale(target, inspect(target).attrs.is_active.history.has_changes() and target.is_active is False)
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target: User):
+    _mark_stale(target, True)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    for user_id, revoke in session.info.pop(STALE_USERS, {}).items():
+        user_profiles.invalidate(user_id)
+        if revoke:
+            token_cache.revoke_user(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(STALE_USERS, None)
@@ -0,0 +1,126 @@
+"""
+Cold start of the API process: import time, time to first request, RSS.
+
+Each measurement uses a fresh interpreter, as an autoscaled container would:
+
+  import    `import app.main` wall time (median of --runs), checked against
+            --budget-ms, plus any optional integration that got imported
+            eagerly (those should load on first use)
+  boot      uvicorn started on an empty database (schema + seed) and again on
+            the same, already seeded, database: time until /health answers,
+            time until the first catalog request succeeds, and the worker's
+            RSS after that request (Linux only)
+
+Usage (from backend/):
+    python -m benchmarks.cold_start --runs 7 --budget-ms 800
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+PORT = 8798
+
+# Loaded on first use; importing app.main must not pull them in
+LAZY_MODULES = ("africastalking", "requests", "passlib", "bcrypt", "jose", "cryptography")
+
+IMPORT_PROBE = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import app.main\n"
+    "elapsed = (time.perf_counter() - start) * 1000\n"
+    f"eager = [m for m in {LAZY_MODULES!r} if m in sys.modules]\n"
+    "print(f'{elapsed:.1f} {\",\".join(eager)}')\n"
+)
+
+
+def measure_import(env: dict) -> tuple:
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=env, check=True, capture_output=True, text=True)
+    elapsed, _, eager = out.stdout.strip().splitlines()[-1].partition(" ")
+    return float(elapsed), [m for m in eager.split(",") if m]
+
+
+def rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+
+
+def wait_for(url: str, deadline: float) -> bool:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.01)
+    return False
+
+
+def measure_boot(env: dict) -> dict:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + 60
+        if not wait_for(f"http://127.0.0.1:{PORT}/health", deadline):
+            raise RuntimeError("server did not start")
+        ready = time.perf_counter()
+        wait_for(f"http://127.0.0.1:{PORT}/api/products", deadline)
+        first = time.perf_counter()
+        return {
+            "ready_ms": round((ready - start) * 1000),
+            "first_request_ms": round((first - start) * 1000),
+            "rss_mb": rss_mb(proc.pid),
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters for the import measurement")
+    parser.add_argument("--budget-ms", type=float, default=800, help="Fail if the median import exceeds this")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="foodnova-cold-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'cold.db')}",
+        UPLOAD_DIR=os.path.join(tmpdir, "uploads"),
+    )
+    try:
+        samples, eager = [], []
+        for _ in range(args.runs):
+            elapsed, eager = measure_import(env)
+            samples.append(elapsed)
+        median = statistics.median(samples)
+        print(f"import app.main   median {median:.0f} ms  min {min(samples):.0f} ms  "
+              f"max {max(samples):.0f} ms  (budget {args.budget_ms:.0f} ms)")
+        print(f"eager optional    {', '.join(eager) or 'none'}")
+
+        print(f"\n{'boot':<14}{'ready ms':>10}{'first req ms':>14}{'RSS MB':>9}")
+        for label in ("empty db", "seeded db"):
+            r = measure_boot(env)
+            print(f"{label:<14}{r['ready_ms']:>10}{r['first_request_ms']:>14}{str(r['rss_mb']):>9}")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if median > args.budget_ms or eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+HTTP load test for the order, catalog and receipt routes, sync vs async DB path.
+
+Boots uvicorn twice on a fresh SQLite file, once with DB_ASYNC=false and once
+with DB_ASYNC=true, and drives each with a closed-loop client at increasing
+concurrency. The mix is mostly catalog reads (products, packs, a pack's
+detail) with order history and order lookups, plus checkouts and receipt
+reads from a registered customer.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --concurrency 16 64 256 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from app.core.config import settings
+
+PORT = 8799
+
+
+class Client:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams (the server always sends Content-Length)"""
+
+    def __init__(self, token: str):
+        self.token = token
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, body: dict = None) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", PORT)
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {self.token}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+        )
+        self.writer.write(head.encode() + payload)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        await self.reader.readexactly(length)
+        return int(status_line.split()[1])
+
+
+def http_json(method: str, path: str, body: dict = None, token: str = None):
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{PORT}{path}", method=method,
+        data=json.dumps(body).encode() if body is not None else None,
+        headers={"Content-Type": "application/json", **({"Authorization": f"Bearer {token}"} if token else {})},
+    )
+    with urllib.request.urlopen(req) as resp:
+        return json.loads(resp.read())
+
+
+def start_server(db_url: str, db_async: bool, upload_dir: str) -> subprocess.Popen:
+    # One account drives every checkout here, so per-account rate limits would dominate the numbers
+    env = dict(os.environ, DATABASE_URL=db_url, UPLOAD_DIR=upload_dir, DB_ASYNC=str(db_async).lower(),
+               RATE_LIMIT_ENABLED="false")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{PORT}/health")
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def prepare(tag: str) -> dict:
+    """Register a customer, top up stock and place one order to read back"""
+    email = f"load_{tag}_{int(time.time())}@example.com"
+    http_json("POST", "/api/auth/register", {"email": email, "password": "loadtest123", "full_name": "Load Test"})
+    token = http_json("POST", "/api/auth/login", {"email": email, "password": "loadtest123"})["access_token"]
+    admin = http_json("POST", "/api/auth/login", {"email": settings.ADMIN_EMAIL, "password": settings.ADMIN_PASSWORD})["access_token"]
+    products = http_json("GET", "/api/products")
+    http_json("PATCH", "/api/admin/inventory/stock", {"items": [{"product_id": p["id"], "stock_qty": 10**9} for p in products]}, admin)
+    packs = http_json("GET", "/api/packs")
+    order = http_json("POST", "/api/orders", {
+        "items": [{"product_id": products[0]["id"], "qty": 1}], "delivery_address": "Load St", "phone": "0800000000",
+    }, token)
+    return {"token": token, "product_ids": [p["id"] for p in products],
+            "pack_ids": [p["id"] for p in packs], "order_id": order["id"]}
+
+
+async def run_level(ctx: dict, concurrency: int, seconds: float) -> dict:
+    order_id = ctx["order_id"]
+    mix = [
+        ("GET", "/api/products", None),
+        ("GET", "/api/products", None),
+        ("GET", "/api/categories", None),
+        ("GET", "/api/packs", None),
+        ("GET", f"/api/packs/{ctx['pack_ids'][0]}" if ctx["pack_ids"] else "/api/packs", None),
+        ("GET", "/api/orders/my", None),
+        ("GET", f"/api/orders/{order_id}", None),
+        ("GET", f"/api/orders/{order_id}/receipt", None),  # 404 until a receipt exists; still a full DB round trip
+        ("POST", "/api/orders", "checkout"),
+    ]
+    latencies, errors = [], 0
+    stop_at = time.perf_counter() + seconds
+
+    async def user():
+        nonlocal errors
+        client = Client(ctx["token"])
+        while time.perf_counter() < stop_at:
+            method, path, body = random.choice(mix)
+            if body == "checkout":
+                body = {"items": [{"product_id": random.choice(ctx["product_ids"]), "qty": 1}],
+                        "delivery_address": "Load St", "phone": "0800000000"}
+            start = time.perf_counter()
+            try:
+                code = await client.request(method, path, body)
+            except (OSError, asyncio.IncompleteReadError):
+                errors += 1
+                client = Client(ctx["token"])
+                continue
+            latencies.append(time.perf_counter() - start)
+            if code >= 500:
+                errors += 1
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 1)
+    return {"rps": round(len(latencies) / seconds, 1), "p50_ms": pick(0.50), "p99_ms": pick(0.99), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{'mode':<7}{'clients':>8}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for db_async in (False, True):
+        tmpdir = tempfile.mkdtemp(prefix="foodnova-load-")
+        server = start_server(f"sqlite:///{os.path.join(tmpdir, 'load.db')}", db_async, os.path.join(tmpdir, "uploads"))
+        try:
+            ctx = prepare("async" if db_async else "sync")
+            for concurrency in args.concurrency:
+                r = asyncio.run(run_level(ctx, concurrency, args.seconds))
+                mode = "async" if db_async else "sync"
+                print(f"{mode:<7}{concurrency:>8}{r['rps']:>9}{r['p50_ms']:>9}{r['p99_ms']:>9}{r['errors']:>8}")
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
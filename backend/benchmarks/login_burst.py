@@ -0,0 +1,68 @@
+"""
+Catalog latency during a login burst.
+
+Boots uvicorn on a fresh SQLite file and runs a few catalog readers on
+/api/products alongside many clients logging in back to back. With bcrypt in
+the password hashing pool, readers keep flowing and logins beyond
+PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE are refused with 503.
+
+Usage (from backend/):
+    python -m benchmarks.login_burst --readers 4 --logins 60 --seconds 6
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from app.core.config import settings
+from .load_test import Client, start_server
+
+
+async def run(readers: int, logins: int, seconds: float) -> dict:
+    latencies, codes = [], {}
+    stop_at = time.perf_counter() + seconds
+    credentials = {"email": settings.ADMIN_EMAIL, "password": settings.ADMIN_PASSWORD}
+
+    async def reader():
+        client = Client("")
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            await client.request("GET", "/api/products")
+            latencies.append(time.perf_counter() - start)
+
+    async def login():
+        client = Client("")
+        while time.perf_counter() < stop_at:
+            code = await client.request("POST", "/api/auth/login", credentials)
+            codes[code] = codes.get(code, 0) + 1
+
+    await asyncio.gather(*(reader() for _ in range(readers)), *(login() for _ in range(logins)))
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 1)
+    return {"reads": len(latencies), "p50_ms": pick(0.50), "p99_ms": pick(0.99), "logins": codes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--logins", type=int, default=60)
+    parser.add_argument("--seconds", type=float, default=6)
+    args = parser.parse_args()
+
+    print(f"{'mode':<7}{'reads':>7}{'p50 ms':>9}{'p99 ms':>9}  logins by status")
+    for db_async in (False, True):
+        tmpdir = tempfile.mkdtemp(prefix="foodnova-login-")
+        server = start_server(f"sqlite:///{os.path.join(tmpdir, 'login.db')}", db_async, os.path.join(tmpdir, "uploads"))
+        try:
+            r = asyncio.run(run(args.readers, args.logins, args.seconds))
+            mode = "async" if db_async else "sync"
+            print(f"{mode:<7}{r['reads']:>7}{r['p50_ms']:>9}{r['p99_ms']:>9}  {dict(sorted(r['logins'].items()))}")
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
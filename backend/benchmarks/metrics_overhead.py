@@ -0,0 +1,131 @@
+"""
+Cost of the Prometheus instrumentation per request.
+
+  in-process  a trivial ASGI app called directly, bare vs wrapped in
+              MetricsMiddleware; the difference is the per-request cost of
+              the counters, histogram and in-progress gauge, checked against
+              --budget-us
+  http        uvicorn on a fresh SQLite file with METRICS_ENABLED=false and
+              =true, driven at full load on /api/products and /health;
+              req/s and p50/p99 for both
+
+Usage (from backend/):
+    python -m benchmarks.metrics_overhead --requests 200000 --concurrency 64 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from app.core.metrics import MetricsMiddleware
+from .load_test import PORT, Client
+
+
+async def endpoint():
+    pass
+
+
+async def trivial_app(scope, receive, send):
+    scope["endpoint"] = endpoint
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+class FakeApp:
+    routes = []
+
+
+def per_request_us(app, n: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/bench", "app": FakeApp()}
+
+    async def send(message):
+        pass
+
+    async def drive():
+        start = time.perf_counter()
+        for _ in range(n):
+            await app(dict(scope), None, send)
+        return time.perf_counter() - start
+
+    return asyncio.run(drive()) * 1e6 / n
+
+
+def start_server(tmpdir: str, metrics: bool) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+        UPLOAD_DIR=os.path.join(tmpdir, "uploads"),
+        METRICS_ENABLED=str(metrics).lower(),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{PORT}/health")
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+async def run_http(concurrency: int, seconds: float) -> dict:
+    latencies, errors = [], 0
+    stop_at = time.perf_counter() + seconds
+
+    async def user():
+        nonlocal errors
+        client = Client("")
+        while time.perf_counter() < stop_at:
+            path = random.choice(("/api/products", "/health"))
+            start = time.perf_counter()
+            code = await client.request("GET", path)
+            latencies.append(time.perf_counter() - start)
+            if code >= 500:
+                errors += 1
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 2)
+    return {"rps": round(len(latencies) / seconds, 1), "p50_ms": pick(0.50), "p99_ms": pick(0.99), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200_000, help="In-process calls per variant")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--budget-us", type=float, default=50, help="Fail if the in-process overhead exceeds this")
+    args = parser.parse_args()
+
+    bare = per_request_us(trivial_app, args.requests)
+    wrapped = per_request_us(MetricsMiddleware(trivial_app), args.requests)
+    overhead = wrapped - bare
+    print(f"in-process   bare {bare:.1f} us  instrumented {wrapped:.1f} us  "
+          f"overhead {overhead:.1f} us/request  (budget {args.budget_us:.0f} us)")
+
+    print(f"\n{'metrics':<9}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for metrics in (False, True):
+        tmpdir = tempfile.mkdtemp(prefix="foodnova-metrics-")
+        server = start_server(tmpdir, metrics)
+        try:
+            r = asyncio.run(run_http(args.concurrency, args.seconds))
+            print(f"{'on' if metrics else 'off':<9}{r['rps']:>9}{r['p50_ms']:>9}{r['p99_ms']:>9}{r['errors']:>8}")
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if overhead > args.budget_us:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
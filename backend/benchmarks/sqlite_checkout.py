@@ -0,0 +1,143 @@
+"""
+Checkout throughput on SQLite, with and without the production profile.
+
+Runs the same workload twice against a fresh database file: several worker
+processes, each with a pool of threads placing checkouts (order + items +
+stock decrement + payment + sales counters, one transaction) while other
+threads keep reading the catalog.
+
+Usage (from backend/):
+    python -m benchmarks.sqlite_checkout --workers 4 --threads 8 --seconds 10
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def run_worker(seconds: float, threads: int, readers: int) -> dict:
+    """Executed in a child process with DATABASE_URL / SQLITE_PROFILE already set"""
+    from sqlalchemy.exc import OperationalError
+    from app.db.session import SessionLocal, read_session
+    from app.models import Order, OrderItem, Payment, Product
+    from app.services.inventory import reduce_stock
+    from app.services.sales_ranking import record_sales
+
+    stop_at = time.perf_counter() + seconds
+    lock = threading.Lock()
+    result = {"checkouts": 0, "locked_errors": 0, "other_errors": 0, "reads": 0, "read_latencies": []}
+
+    def checkout_loop():
+        while time.perf_counter() < stop_at:
+            db = SessionLocal()
+            try:
+                product = db.query(Product).filter(Product.is_active == True).first()
+                order = Order(user_id=1, total_amount=product.price, delivery_address="Bench", phone="0800", status="pending")
+                db.add(order)
+                db.flush()
+                item = {"product_id": product.id, "pack_variant_id": None, "name_snapshot": product.name,
+                        "unit_price": product.price, "qty": 1, "line_total": product.price}
+                db.add(OrderItem(order_id=order.id, **item))
+                db.add(Payment(order_id=order.id, method="etransfer", status="pending"))
+                record_sales(db, [item])
+                reduce_stock(db, product.id, 1)  # commits
+                with lock:
+                    result["checkouts"] += 1
+            except OperationalError as e:
+                db.rollback()
+                with lock:
+                    key = "locked_errors" if "locked" in str(e) else "other_errors"
+                    result[key] += 1
+            finally:
+                db.close()
+
+    def read_loop():
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            db = read_session()
+            try:
+                db.query(Product).filter(Product.is_active == True).all()
+            except OperationalError:
+                with lock:
+                    result["other_errors"] += 1
+                continue
+            finally:
+                db.close()
+            with lock:
+                result["reads"] += 1
+                result["read_latencies"].append(time.perf_counter() - start)
+
+    pool = [threading.Thread(target=checkout_loop) for _ in range(threads)]
+    pool += [threading.Thread(target=read_loop) for _ in range(readers)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return result
+
+
+def seed(db_url: str, profile: str):
+    env = dict(os.environ, DATABASE_URL=db_url, SQLITE_PROFILE=profile)
+    code = (
+        "from app.db.session import SessionLocal\n"
+        "from app.db.init_db import init_db\n"
+        "from app.models import Product\n"
+        "db = SessionLocal(); init_db(db)\n"
+        "db.query(Product).update({Product.stock_qty: 10**9}); db.commit(); db.close()\n"
+    )
+    subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True)
+
+
+def run_profile(profile: str, args) -> dict:
+    tmpdir = tempfile.mkdtemp(prefix="foodnova-bench-")
+    db_url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    seed(db_url, profile)
+
+    env = dict(os.environ, DATABASE_URL=db_url, SQLITE_PROFILE=profile)
+    code = (
+        "import json, sys\n"
+        "from benchmarks.sqlite_checkout import run_worker\n"
+        f"print(json.dumps(run_worker({args.seconds}, {args.threads}, {args.readers})))\n"
+    )
+    procs = [
+        subprocess.Popen([sys.executable, "-c", code], env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        for _ in range(args.workers)
+    ]
+    totals = {"checkouts": 0, "locked_errors": 0, "other_errors": 0, "reads": 0}
+    latencies = []
+    for p in procs:
+        out, _ = p.communicate()
+        data = json.loads(out.decode().strip().splitlines()[-1])
+        latencies.extend(data.pop("read_latencies"))
+        for key in totals:
+            totals[key] += data[key]
+
+    shutil.rmtree(tmpdir, ignore_errors=True)
+    latencies.sort()
+    totals["checkouts_per_sec"] = round(totals["checkouts"] / args.seconds, 1)
+    totals["read_p99_ms"] = round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2) if latencies else None
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Processes (uvicorn workers)")
+    parser.add_argument("--threads", type=int, default=8, help="Checkout threads per worker")
+    parser.add_argument("--readers", type=int, default=4, help="Catalog reader threads per worker")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.threads} checkout threads + {args.readers} readers, {args.seconds}s each\n")
+    print(f"{'profile':<12}{'checkouts/s':>12}{'locked':>8}{'errors':>8}{'reads':>8}{'read p99 ms':>13}")
+    for profile in ("default", "production"):
+        r = run_profile(profile, args)
+        print(f"{profile:<12}{r['checkouts_per_sec']:>12}{r['locked_errors']:>8}{r['other_errors']:>8}{r['reads']:>8}{str(r['read_p99_ms']):>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Server memory and event-loop stalls during parallel receipt uploads.
+
+Boots uvicorn on a fresh SQLite file, places one order and uploads the same
+receipt to it from several clients at once while a prober times /health.
+Reports the server's peak resident memory over its idle baseline (VmHWM from
+/proc, so Linux only) and the slowest /health response during the uploads.
+
+Usage (from backend/):
+    python -m benchmarks.upload_memory --uploads 10 --mb 9
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from .load_test import PORT, prepare, start_server
+
+
+def memory_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+async def upload(token: str, order_id: int, size: int) -> int:
+    """POST a multipart receipt of `size` bytes, written 64 KB at a time"""
+    boundary = uuid.uuid4().hex
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"receipt.pdf\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    writer.write((
+        f"POST /api/orders/{order_id}/receipt HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n"
+        f"Content-Type: multipart/form-data; boundary={boundary}\r\n"
+        f"Content-Length: {len(head) + size + len(tail)}\r\nConnection: close\r\n\r\n"
+    ).encode() + head)
+    block = b"\0" * 65536
+    for offset in range(0, size, len(block)):
+        writer.write(block[:size - offset])
+        await writer.drain()
+    writer.write(tail)
+    await writer.drain()
+    status_line = await reader.readline()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+async def probe(stop: asyncio.Event) -> float:
+    """Slowest /health round trip until `stop` is set"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+        writer.write(b"GET /health HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+        await reader.read()
+        writer.close()
+        worst = max(worst, time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+    return worst
+
+
+async def run(ctx: dict, uploads: int, size: int) -> dict:
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(stop))
+    start = time.perf_counter()
+    codes = await asyncio.gather(*(upload(ctx["token"], ctx["order_id"], size) for _ in range(uploads)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    worst = await prober
+    return {"seconds": round(elapsed, 2), "health_max_ms": round(worst * 1000, 1),
+            "codes": {c: codes.count(c) for c in set(codes)}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=10)
+    parser.add_argument("--mb", type=float, default=9)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="foodnova-upload-")
+    server = start_server(f"sqlite:///{os.path.join(tmpdir, 'upload.db')}", True, os.path.join(tmpdir, "uploads"))
+    try:
+        ctx = prepare("upload")
+        baseline = memory_kb(server.pid, "VmRSS")
+        r = asyncio.run(run(ctx, args.uploads, int(args.mb * 1024 * 1024)))
+        peak = memory_kb(server.pid, "VmHWM")
+        print(f"{args.uploads} x {args.mb} MB uploads in {r['seconds']} s, status {r['codes']}")
+        print(f"server RSS {baseline // 1024} MB idle, peak +{(peak - baseline) // 1024} MB")
+        print(f"slowest /health during uploads: {r['health_max_ms']} ms")
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
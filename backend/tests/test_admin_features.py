@@ -5,10 +5,22 @@ Tests: Categories, Packs, Order Status (including Delivered)
 import pytest
 import requests
 import os
+import csv
+import io
+import re
+import time
+from datetime import datetime
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
 
 
+def query_count(response):
+    """Statements the request executed, from its Server-Timing header"""
+    match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers.get("Server-Timing", ""))
+    assert match, f"no db timing in {response.headers.get('Server-Timing')!r}"
+    return int(match.group(1))
+
+
 class TestAdminAuth:
     """Admin authentication tests"""
     
@@ -279,6 +291,518 @@ class TestAdminOrders:
             assert get_response.json()["status"] == "delivered"
 
 
+class TestAdminInventory:
+    """Low-stock feed and bulk stock updates"""
+    
+    @pytest.fixture(scope="class")
+    def admin_token(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@foodnova.com",
+            "password": "Admin123!"
+        })
+        return response.json()["access_token"]
+    
+    @pytest.fixture(scope="class")
+    def low_product_id(self, admin_token):
+        response = requests.post(
+            f"{BASE_URL}/api/admin/products",
+            headers={"Authorization": f"Bearer {admin_token}"},
+            json={"name": "TEST_Low Stock Beans", "price": 1200, "stock_qty": 3, "reorder_threshold": 5}
+        )
+        assert response.status_code == 200
+        assert response.json()["reorder_threshold"] == 5
+        return response.json()["id"]
+    
+    def test_low_stock_feed_lists_product(self, admin_token, low_product_id):
+        """Product at/below its threshold appears in the feed"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/inventory/low-stock",
+            headers={"Authorization": f"Bearer {admin_token}"}
+        )
+        assert response.status_code == 200
+        ids = [p["id"] for p in response.json()]
+        assert low_product_id in ids
+    
+    def test_restock_removes_from_feed(self, admin_token, low_product_id):
+        """Bulk restock above the threshold clears the product from the feed"""
+        response = requests.patch(
+            f"{BASE_URL}/api/admin/inventory/stock",
+            headers={"Authorization": f"Bearer {admin_token}"},
+            json={"items": [{"product_id": low_product_id, "stock_qty": 50}]}
+        )
+        assert response.status_code == 200
+        assert response.json()[0]["stock_qty"] == 50
+        
+        feed = requests.get(
+            f"{BASE_URL}/api/admin/inventory/low-stock",
+            headers={"Authorization": f"Bearer {admin_token}"}
+        ).json()
+        assert low_product_id not in [p["id"] for p in feed]
+    
+    def test_bulk_update_unknown_product(self, admin_token):
+        """Unknown product ids are rejected without touching stock"""
+        response = requests.patch(
+            f"{BASE_URL}/api/admin/inventory/stock",
+            headers={"Authorization": f"Bearer {admin_token}"},
+            json={"items": [{"product_id": 999999, "stock_qty": 1}]}
+        )
+        assert response.status_code == 404
+    
+    def test_low_stock_requires_admin(self):
+        """Feed is admin-only"""
+        response = requests.get(f"{BASE_URL}/api/admin/inventory/low-stock")
+        assert response.status_code in [401, 403]
+
+
+class TestTopSellers:
+    """Best-seller rankings fed by checkout"""
+    
+    @pytest.fixture(scope="class")
+    def admin_token(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@foodnova.com",
+            "password": "Admin123!"
+        })
+        return response.json()["access_token"]
+    
+    @pytest.fixture(scope="class")
+    def customer_token(self):
+        email = f"test_buyer_{datetime.now().strftime('%H%M%S%f')}@example.com"
+        requests.post(f"{BASE_URL}/api/auth/register", json={
+            "email": email,
+            "password": "Buyer123!",
+            "full_name": "TEST Buyer"
+        })
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": email,
+            "password": "Buyer123!"
+        })
+        return response.json()["access_token"]
+    
+    def test_checkout_updates_top_sellers(self, customer_token):
+        """A placed order shows up in the 7-day ranking"""
+        product = requests.get(f"{BASE_URL}/api/products").json()[0]
+        response = requests.post(
+            f"{BASE_URL}/api/orders",
+            headers={"Authorization": f"Bearer {customer_token}"},
+            json={
+                "items": [{"product_id": product["id"], "qty": 1}],
+                "delivery_address": "1 Test Street, Lagos",
+                "phone": "08012345678"
+            }
+        )
+        assert response.status_code == 200
+        
+        top = requests.get(f"{BASE_URL}/api/products/top", params={"window": 7, "item_type": "product"})
+        assert top.status_code == 200
+        entry = next(t for t in top.json() if t["item_id"] == product["id"])
+        assert entry["units_sold"] >= 1
+        assert "revenue" not in entry
+    
+    def test_cancelled_order_leaves_top_sellers(self, customer_token, admin_token):
+        """Cancelling an order takes its units back out of the ranking"""
+        product = requests.get(f"{BASE_URL}/api/products").json()[0]
+        
+        def units_sold():
+            top = requests.get(f"{BASE_URL}/api/products/top", params={"window": 7, "item_type": "product"}).json()
+            return next((t["units_sold"] for t in top if t["item_id"] == product["id"]), 0)
+        
+        order = requests.post(
+            f"{BASE_URL}/api/orders",
+            headers={"Authorization": f"Bearer {customer_token}"},
+            json={
+                "items": [{"product_id": product["id"], "qty": 2}],
+                "delivery_address": "1 Test Street, Lagos",
+                "phone": "08012345678"
+            }
+        ).json()
+        before = units_sold()
+        response = requests.patch(
+            f"{BASE_URL}/api/admin/orders/{order['id']}",
+            headers={"Authorization": f"Bearer {admin_token}"},
+            json={"status": "cancelled"}
+        )
+        assert response.status_code == 200
+        assert units_sold() == before - 2
+    
+    def test_invalid_window_rejected(self):
+        response = requests.get(f"{BASE_URL}/api/products/top", params={"window": 14})
+        assert response.status_code == 400
+    
+    def test_admin_report_has_all_windows(self, admin_token):
+        response = requests.get(
+            f"{BASE_URL}/api/admin/reports/top-sellers",
+            headers={"Authorization": f"Bearer {admin_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data.keys()) == {"7d", "30d", "90d"}
+        if data["7d"]:
+            assert "revenue" in data["7d"][0]
+
+
+class TestAdminExports:
+    """Streaming CSV export of order lines"""
+    
+    @pytest.fixture(scope="class")
+    def admin_token(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@foodnova.com",
+            "password": "Admin123!"
+        })
+        return response.json()["access_token"]
+    
+    def test_export_orders_csv(self, admin_token):
+        """Export streams a CSV with one row per order line"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/exports/orders.csv",
+            headers={"Authorization": f"Bearer {admin_token}"},
+            params={"from": "2020-01-01", "to": datetime.now().strftime("%Y-%m-%d")},
+            stream=True
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0][:3] == ["order_id", "created_at", "order_status"]
+        for row in rows[1:]:
+            assert len(row) == len(rows[0])
+            assert row[0].isdigit()
+    
+    def test_export_rejects_inverted_range(self, admin_token):
+        response = requests.get(
+            f"{BASE_URL}/api/admin/exports/orders.csv",
+            headers={"Authorization": f"Bearer {admin_token}"},
+            params={"from": "2025-02-01", "to": "2025-01-01"}
+        )
+        assert response.status_code == 400
+
+
+class TestAdminMetrics:
+    """Runtime metrics endpoint"""
+    
+    @pytest.fixture(scope="class")
+    def admin_token(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@foodnova.com",
+            "password": "Admin123!"
+        })
+        return response.json()["access_token"]
+    
+    def test_pool_metrics(self, admin_token):
+        response = requests.get(
+            f"{BASE_URL}/api/admin/metrics",
+            headers={"Authorization": f"Bearer {admin_token}"}
+        )
+        assert response.status_code == 200
+        primary = response.json()["db_pool"]["primary"]
+        assert primary["checkouts"] >= 1
+        assert "checkout_wait_max_ms" in primary
+        assert "in_use" in primary
+    
+    def test_metrics_require_admin(self):
+        response = requests.get(f"{BASE_URL}/api/admin/metrics")
+        assert response.status_code in [401, 403]
+
+
+class TestQueryBudgets:
+    """Statement counts per route stay flat as rows grow (no per-row queries)"""
+    
+    @pytest.fixture(scope="class")
+    def admin_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@foodnova.com",
+            "password": "Admin123!"
+        })
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    @pytest.mark.parametrize("path,budget", [
+        ("/api/products", 2),
+        ("/api/categories", 1),
+        ("/api/packs", 2),
+    ])
+    def test_public_routes(self, path, budget):
+        response = requests.get(f"{BASE_URL}{path}")
+        assert response.status_code == 200
+        assert query_count(response) <= budget
+    
+    def test_pack_detail(self):
+        pack_id = requests.get(f"{BASE_URL}/api/packs").json()[0]["id"]
+        response = requests.get(f"{BASE_URL}/api/packs/{pack_id}")
+        assert response.status_code == 200
+        assert query_count(response) <= 4
+    
+    @pytest.mark.parametrize("path,budget", [
+        ("/api/admin/orders", 1),
+        ("/api/admin/products", 1),
+        ("/api/admin/packs", 4),
+    ])
+    def test_admin_lists(self, admin_headers, path, budget):
+        response = requests.get(f"{BASE_URL}{path}", headers=admin_headers)
+        assert response.status_code == 200
+        assert query_count(response) <= budget
+    
+    def test_admin_order_detail(self, admin_headers):
+        orders = requests.get(f"{BASE_URL}/api/admin/orders", headers=admin_headers).json()
+        if not orders:
+            pytest.skip("No orders to inspect")
+        response = requests.get(f"{BASE_URL}/api/admin/orders/{orders[0]['id']}", headers=admin_headers)
+        assert response.status_code == 200
+        assert query_count(response) <= 4
+
+
+class TestPrometheusMetrics:
+    """Prometheus text endpoint"""
+    
+    @pytest.fixture(scope="class")
+    def customer_headers(self):
+        email = f"test_metrics_{datetime.now().strftime('%H%M%S%f')}@example.com"
+        requests.post(f"{BASE_URL}/api/auth/register", json={
+            "email": email,
+            "password": "Buyer123!",
+            "full_name": "TEST Metrics"
+        })
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": email,
+            "password": "Buyer123!"
+        })
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    def scrape(self):
+        response = requests.get(f"{BASE_URL}/metrics")
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/plain")
+        return response.text
+    
+    def test_requests_labelled_by_route_template(self):
+        pack_id = requests.get(f"{BASE_URL}/api/packs").json()[0]["id"]
+        requests.get(f"{BASE_URL}/api/packs/{pack_id}")
+        text = self.scrape()
+        assert 'foodnova_http_requests_total{method="GET",route="/api/packs/{pack_id}",status="200"}' in text
+        assert 'foodnova_http_request_duration_seconds_bucket{le="0.005",method="GET",route="/api/packs"}' in text
+        assert f'route="/api/packs/{pack_id}"' not in text
+        assert "foodnova_http_requests_in_progress" in text
+    
+    def test_pool_gauges(self):
+        text = self.scrape()
+        assert 'foodnova_db_pool_in_use{engine="primary"}' in text
+        assert 'foodnova_db_pool_checkouts_total{engine="primary"}' in text
+    
+    def test_checkout_outcomes(self, customer_headers):
+        product = requests.get(f"{BASE_URL}/api/products").json()[0]
+        order = {"delivery_address": "1 Test Street, Lagos", "phone": "08012345678"}
+        response = requests.post(f"{BASE_URL}/api/orders", headers=customer_headers, json={
+            **order, "items": [{"product_id": product["id"], "qty": 10**9}]
+        })
+        assert response.status_code == 400
+        response = requests.post(f"{BASE_URL}/api/orders", headers=customer_headers, json={
+            **order, "items": [{"product_id": 10**9, "qty": 1}]
+        })
+        assert response.status_code == 400
+        text = self.scrape()
+        assert 'foodnova_checkouts_total{outcome="out_of_stock"}' in text
+        assert 'foodnova_checkouts_total{outcome="validation_error"}' in text
+
+
+class TestRateLimits:
+    """Login buckets refuse a credential-stuffing burst"""
+    
+    def test_login_limited_per_account(self):
+        email = f"test_stuffing_{datetime.now().strftime('%H%M%S%f')}@example.com"
+        codes = [
+            requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": "guess"}).status_code
+            for _ in range(25)
+        ]
+        assert codes[0] == 401
+        assert codes[-1] == 429
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": "guess"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+
+class TestRegistration:
+    """Customer sign-up"""
+    
+    def test_concurrent_duplicate_registration(self):
+        """Requests racing past the email check: one account, the rest get 400 rather than a 500"""
+        from concurrent.futures import ThreadPoolExecutor
+        email = f"test_race_{datetime.now().strftime('%H%M%S%f')}@example.com"
+        body = {"email": email, "password": "Race1234!", "full_name": "TEST Race"}
+        with ThreadPoolExecutor(3) as pool:
+            responses = list(pool.map(lambda _: requests.post(f"{BASE_URL}/api/auth/register", json=body), range(3)))
+        assert sorted(r.status_code for r in responses) == [200, 400, 400]
+        assert all(r.json()["detail"] == "Email already registered" for r in responses if r.status_code == 400)
+
+
+class TestRefreshTokens:
+    """Refresh rotation, logout and logout everywhere"""
+    
+    @pytest.fixture
+    def session(self):
+        email = f"test_session_{datetime.now().strftime('%H%M%S%f')}@example.com"
+        requests.post(f"{BASE_URL}/api/auth/register", json={
+            "email": email,
+            "password": "Session123!",
+            "full_name": "TEST Session"
+        })
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": email,
+            "password": "Session123!"
+        })
+        return response.json()
+    
+    def test_refresh_rotates(self, session):
+        response = requests.post(f"{BASE_URL}/api/auth/refresh", json={"refresh_token": session["refresh_token"]})
+        assert response.status_code == 200
+        assert response.json()["refresh_token"] != session["refresh_token"]
+    
+    def test_logout_revokes_refresh_and_access(self, session):
+        headers = {"Authorization": f"Bearer {session['access_token']}"}
+        response = requests.post(f"{BASE_URL}/api/auth/logout", headers=headers,
+                                 json={"refresh_token": session["refresh_token"]})
+        assert response.status_code == 200
+        response = requests.post(f"{BASE_URL}/api/auth/refresh", json={"refresh_token": session["refresh_token"]})
+        assert response.status_code == 401
+        assert requests.get(f"{BASE_URL}/api/auth/me", headers=headers).status_code == 401
+    
+    def test_logout_all(self, session):
+        headers = {"Authorization": f"Bearer {session['access_token']}"}
+        assert requests.post(f"{BASE_URL}/api/auth/logout-all", headers=headers).status_code == 200
+        assert requests.get(f"{BASE_URL}/api/auth/me", headers=headers).status_code == 401
+        response = requests.post(f"{BASE_URL}/api/auth/refresh", json={"refresh_token": session["refresh_token"]})
+        assert response.status_code == 401
+
+
+class TestReceipts:
+    """Receipt uploads and their admin review"""
+    
+    @pytest.fixture(scope="class")
+    def admin_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@foodnova.com",
+            "password": "Admin123!"
+        })
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    @pytest.fixture(scope="class")
+    def customer_headers(self):
+        email = f"test_receipts_{datetime.now().strftime('%H%M%S%f')}@example.com"
+        requests.post(f"{BASE_URL}/api/auth/register", json={
+            "email": email,
+            "password": "Receipt123!",
+            "full_name": "TEST Receipts"
+        })
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": email,
+            "password": "Receipt123!"
+        })
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    def place_order(self, headers):
+        product = requests.get(f"{BASE_URL}/api/products").json()[0]
+        response = requests.post(f"{BASE_URL}/api/orders", headers=headers, json={
+            "items": [{"product_id": product["id"], "qty": 1}],
+            "delivery_address": "1 Test Street, Lagos",
+            "phone": "08012345678"
+        })
+        assert response.status_code == 200
+        return response.json()["id"]
+    
+    def upload(self, headers, order_id, content, filename="receipt.png"):
+        return requests.post(
+            f"{BASE_URL}/api/orders/{order_id}/receipt", headers=headers,
+            files={"file": (filename, content, "image/png")}
+        )
+    
+    def test_reused_receipt_flagged_for_review(self, customer_headers, admin_headers):
+        content = f"TEST receipt {datetime.now().isoformat()}".encode()
+        first_order = self.place_order(customer_headers)
+        second_order = self.place_order(customer_headers)
+        first = self.upload(customer_headers, first_order, content)
+        second = self.upload(customer_headers, second_order, content)
+        assert first.status_code == 200 and second.status_code == 200
+        assert first.json()["file_url"].split("?")[0] == second.json()["file_url"].split("?")[0]
+        
+        detail = requests.get(f"{BASE_URL}/api/admin/orders/{second_order}", headers=admin_headers).json()
+        assert detail["receipt"]["reused_on_orders"] == [first_order]
+        detail = requests.get(f"{BASE_URL}/api/admin/orders/{first_order}", headers=admin_headers).json()
+        assert detail["receipt"]["reused_on_orders"] == [second_order]
+    
+    def test_thumbnail_and_preview_rendered(self, customer_headers, admin_headers):
+        from PIL import Image
+        image = io.BytesIO()
+        Image.new("RGB", (2400, 1800), (datetime.now().microsecond % 256, 80, 160)).save(image, "JPEG")
+        order_id = self.place_order(customer_headers)
+        response = self.upload(customer_headers, order_id, image.getvalue(), "photo.jpg")
+        assert response.status_code == 200
+        
+        for _ in range(100):
+            receipt = requests.get(f"{BASE_URL}/api/orders/{order_id}/receipt", headers=customer_headers).json()
+            if receipt["thumbnail_url"]:
+                break
+            time.sleep(0.1)
+        assert receipt["thumbnail_url"].split("?")[0].endswith(".thumb.webp")
+        thumbnail = requests.get(receipt["thumbnail_url"])
+        assert thumbnail.status_code == 200
+        assert Image.open(io.BytesIO(thumbnail.content)).size == (256, 192)
+        assert Image.open(io.BytesIO(requests.get(receipt["preview_url"]).content)).size == (1600, 1200)
+        
+        detail = requests.get(f"{BASE_URL}/api/admin/orders/{order_id}", headers=admin_headers).json()
+        assert detail["receipt"]["thumbnail_url"].split("?")[0] == receipt["thumbnail_url"].split("?")[0]
+        
+        # Cached after the first view, fetched in pieces, and only through a signed link
+        url = detail["receipt"]["file_url"]
+        full = requests.get(url)
+        assert "immutable" in full.headers["Cache-Control"]
+        assert requests.get(url, headers={"If-None-Match": full.headers["ETag"]}).status_code == 304
+        part = requests.get(url, headers={"Range": "bytes=0-99"})
+        assert part.status_code == 206
+        assert part.content == full.content[:100]
+        assert requests.get(url.split("?")[0]).status_code == 403
+    
+    def test_oversized_upload_refused_unread(self, customer_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/orders/1/receipt",
+            headers={**customer_headers, "Content-Type": "multipart/form-data; boundary=x",
+                     "Content-Length": str(100 * 1024 * 1024)},
+            data=b"",
+        )
+        assert response.status_code == 413
+    
+    def test_review_queue_pages_pending_receipts(self, customer_headers, admin_headers):
+        order_id = self.place_order(customer_headers)
+        assert self.upload(customer_headers, order_id, f"queue {time.time()}".encode()).status_code == 200
+        
+        found, cursor = None, None
+        for _ in range(50):
+            params = {"status": "submitted", "limit": 5, **({"cursor": cursor} if cursor else {})}
+            response = requests.get(f"{BASE_URL}/api/admin/receipts", params=params, headers=admin_headers)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page["items"]) <= 5
+            found = found or next((r for r in page["items"] if r["order_id"] == order_id), None)
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert found["status"] == "submitted"
+        assert found["order_total"] > 0
+        assert found["customer_name"]
+        assert requests.get(found["file_url"]).status_code == 200
+        assert requests.get(f"{BASE_URL}/api/admin/receipts", params={"cursor": "bad"}, headers=admin_headers).status_code == 400
+        assert requests.get(f"{BASE_URL}/api/admin/receipts", headers=customer_headers).status_code == 403
+    
+    def test_direct_upload_needs_s3(self, customer_headers):
+        # The local driver has no bucket to presign for; clients check first and use multipart
+        assert requests.get(f"{BASE_URL}/api/uploads/capabilities").json() == {"direct_upload": False}
+        order_id = self.place_order(customer_headers)
+        # Refused before the per-account receipt limit (20/minute) is charged
+        for _ in range(25):
+            response = requests.post(
+                f"{BASE_URL}/api/orders/{order_id}/receipt/upload-url", headers=customer_headers,
+                json={"filename": "r.png", "size": 10, "sha256": "0" * 64},
+            )
+            assert response.status_code == 404
+
+
 class TestPublicEndpoints:
     """Test public endpoints work correctly"""
     
@@ -335,5 +859,11 @@ def cleanup_test_data():
             for pack in packs:
                 if pack["name"].startswith("TEST_"):
                     requests.delete(f"{BASE_URL}/api/admin/packs/{pack['id']}", headers=headers)
+            
+            # Deactivate test products
+            products = requests.get(f"{BASE_URL}/api/admin/products", headers=headers).json()
+            for product in products:
+                if product["name"].startswith("TEST_") and product["is_active"]:
+                    requests.delete(f"{BASE_URL}/api/admin/products/{product['id']}", headers=headers)
     except Exception as e:
         print(f"Cleanup failed: {e}")
@@ -0,0 +1,98 @@
+"""
+Async database path tests
+Runs place_order through a real AsyncSession (aiosqlite) and through the
+threadpool adapter used when DB_ASYNC is off; no server required.
+"""
+import asyncio
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.session import SyncSessionAdapter, create_async_db_engine, create_db_engine, to_async_url
+from app.models import Category, Order, OrderItem, Payment, Product, User
+from app.schemas.order import OrderCreate
+from app.services.orders import place_order
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    engine = create_db_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add(User(id=1, email="buyer@example.com", full_name="Buyer", password_hash="x", role="customer"))
+        db.add(Category(id=1, name="Grains"))
+        db.add(Product(id=1, name="Rice", price=500, stock_qty=12, reorder_threshold=10, category_id=1))
+        db.commit()
+    yield url
+    engine.dispose()
+
+
+def cart(qty: int) -> OrderCreate:
+    return OrderCreate(items=[{"product_id": 1, "qty": qty}], delivery_address="1 Test St", phone="0800")
+
+
+class TestAsyncUrl:
+    """Driver swap for the async engine"""
+
+    def test_sqlite_uses_aiosqlite(self):
+        assert to_async_url("sqlite:////tmp/x.db").drivername == "sqlite+aiosqlite"
+
+    def test_postgres_uses_asyncpg(self):
+        assert to_async_url("postgresql://u:p@db/app").drivername == "postgresql+asyncpg"
+        assert to_async_url("postgresql+psycopg2://u:p@db/app").drivername == "postgresql+asyncpg"
+
+    def test_psycopg3_is_kept(self):
+        assert to_async_url("postgresql+psycopg://u:p@db/app").drivername == "postgresql+psycopg"
+
+
+class TestPlaceOrder:
+    """Checkout in one transaction on both session flavours"""
+
+    def test_async_session(self, db_url):
+        async def run():
+            engine = create_async_db_engine(db_url)
+            try:
+                async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                    order, sales, crossed = await db.run_sync(place_order, 1, cart(3))
+                    await db.commit()
+                    assert [i.qty for i in order.items] == [3]
+                    assert [p.stock_qty for p in crossed] == [9]
+                    assert len(sales) == 1
+                    assert await db.scalar(select(Product.stock_qty).where(Product.id == 1)) == 9
+                    assert await db.scalar(select(func.count(Payment.id))) == 1
+            finally:
+                await engine.dispose()
+        asyncio.run(run())
+
+    def test_sync_adapter(self, db_url):
+        engine = create_db_engine(db_url)
+
+        async def run():
+            db = SyncSessionAdapter(sessionmaker(bind=engine, expire_on_commit=False)())
+            try:
+                order, _, _ = await db.run_sync(place_order, 1, cart(2))
+                await db.commit()
+                assert (await db.get(Order, order.id)).total_amount == 1000
+            finally:
+                await db.close()
+        asyncio.run(run())
+        engine.dispose()
+
+    def test_insufficient_stock_writes_nothing(self, db_url):
+        async def run():
+            engine = create_async_db_engine(db_url)
+            try:
+                async with async_sessionmaker(engine)() as db:
+                    with pytest.raises(HTTPException) as exc:
+                        await db.run_sync(place_order, 1, cart(50))
+                    assert exc.value.status_code == 400
+                    await db.rollback()
+                    assert await db.scalar(select(func.count(OrderItem.id))) == 0
+                    assert await db.scalar(select(Product.stock_qty).where(Product.id == 1)) == 12
+            finally:
+                await engine.dispose()
+        asyncio.run(run())
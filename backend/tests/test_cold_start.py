@@ -0,0 +1,24 @@
+"""
+Cold-start guard
+Importing the app must not load optional integrations; they load on first use.
+Timing lives in benchmarks/cold_start.py, which is too noisy for a test.
+"""
+import subprocess
+import sys
+
+from benchmarks.cold_start import LAZY_MODULES
+
+
+def test_optional_integrations_are_not_imported_at_startup():
+    probe = (
+        "import sys\n"
+        "import app.main\n"
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", probe], check=True, capture_output=True, text=True)
+    assert out.stdout.strip() == ""
+
+
+def test_password_hashing_loads_on_first_use():
+    from app.core.security import hash_password, verify_password
+    assert verify_password("secret123", hash_password("secret123"))
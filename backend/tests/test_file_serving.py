@@ -0,0 +1,113 @@
+"""
+Upload serving tests
+Signed links, path resolution, conditional and range responses; no server required.
+"""
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.core import signed_urls
+from app.core.file_serving import RangeNotSatisfiable, immutable_file_response, parse_range
+from app.core.signed_urls import sign_upload_url, verify_upload_signature
+from app.services.receipts import LocalStorageDriver
+
+
+def query(url: str) -> dict:
+    return dict(part.split("=") for part in url.split("?", 1)[1].split("&"))
+
+
+def test_signed_link_verifies_for_its_key_only():
+    params = query(sign_upload_url("http://api/api/uploads/abc.png"))
+    assert verify_upload_signature("abc.png", int(params["exp"]), params["sig"])
+    assert not verify_upload_signature("abd.png", int(params["exp"]), params["sig"])
+    assert not verify_upload_signature("abc.png", int(params["exp"]) + 1, params["sig"])
+
+
+def test_signed_link_is_stable_within_a_window_and_expires(monkeypatch):
+    url = "http://api/api/uploads/abc.png"
+    assert sign_upload_url(url) == sign_upload_url(url)
+    params = query(sign_upload_url(url))
+    later = int(params["exp"]) + 1
+    monkeypatch.setattr(signed_urls.time, "time", lambda: later)
+    assert not verify_upload_signature("abc.png", int(params["exp"]), params["sig"])
+    assert sign_upload_url(None) is None
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=50-10", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 1000)
+
+
+def test_resolve_stays_inside_upload_root(tmp_path):
+    driver = LocalStorageDriver(str(tmp_path / "uploads"))
+    (tmp_path / "uploads" / "ok.png").write_bytes(b"x")
+    assert driver.resolve("ok.png") == (tmp_path / "uploads" / "ok.png").resolve()
+    assert driver.resolve("../secret.db") is None
+    assert driver.resolve("/etc/passwd") is None
+    assert driver.resolve(".incoming/upload-1.part") is None
+    assert driver.resolve(".") is None
+
+
+def serve(path, key, headers=()):
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(k.encode(), v.encode()) for k, v in headers]}
+    response = immutable_file_response(Request(scope), path, key)
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(response(scope, None, send))
+    head = dict(messages[0]["headers"])
+    return messages[0]["status"], head, b"".join(m.get("body", b"") for m in messages[1:])
+
+
+def test_full_response_is_cacheable(tmp_path):
+    path = tmp_path / "abc.pdf"
+    path.write_bytes(b"0123456789" * 50000)
+    status, headers, body = serve(path, "abc.pdf")
+    assert status == 200
+    assert body == path.read_bytes()
+    assert headers[b"etag"] == b'"abc.pdf"'
+    assert b"immutable" in headers[b"cache-control"]
+    assert headers[b"content-type"] == b"application/pdf"
+
+
+def test_if_none_match_is_304(tmp_path):
+    path = tmp_path / "abc.pdf"
+    path.write_bytes(b"x")
+    status, headers, body = serve(path, "abc.pdf", [("if-none-match", 'W/"x", "abc.pdf"')])
+    assert status == 304
+    assert body == b""
+
+
+def test_range_is_206(tmp_path):
+    path = tmp_path / "abc.pdf"
+    path.write_bytes(bytes(range(256)) * 4000)
+    status, headers, body = serve(path, "abc.pdf", [("range", "bytes=1000-300999")])
+    assert status == 206
+    assert headers[b"content-range"] == b"bytes 1000-300999/1024000"
+    assert body == path.read_bytes()[1000:301000]
+
+    status, headers, _ = serve(path, "abc.pdf", [("range", "bytes=2000000-")])
+    assert status == 416
+    assert headers[b"content-range"] == b"bytes */1024000"
+
+    # A stale If-Range gets the whole file
+    status, _, body = serve(path, "abc.pdf", [("range", "bytes=0-9"), ("if-range", '"other"')])
+    assert status == 200 and len(body) == 1024000
@@ -0,0 +1,44 @@
+"""
+Password hashing pool tests
+Real bcrypt in a spawned process pool; no server required.
+"""
+import asyncio
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.core.passwords import PasswordHasher, _verify
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify_in_pool(hasher):
+    async def run():
+        hashed = await hasher.hash("secret123")
+        return await hasher.verify("secret123", hashed), await hasher.verify("wrong", hashed)
+
+    assert asyncio.run(run()) == ((True, False), (False, False))
+    assert hasher.pending == 0
+
+
+def test_full_queue_rejected_with_503(hasher):
+    async def run():
+        return await asyncio.gather(hasher.hash("one"), hasher.hash("two"), return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert first.startswith("$2b$")
+    assert isinstance(second, HTTPException)
+    assert second.status_code == 503
+    assert second.headers["Retry-After"] == "1"
+    assert hasher.pending == 0
+
+
+def test_hash_at_old_cost_needs_rehash():
+    old = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret123")
+    assert _verify("secret123", old) == (True, True)
+    assert _verify("wrong", old) == (False, False)
@@ -0,0 +1,63 @@
+"""
+Query statistics and N+1 detection tests
+In-memory SQLite and a bare ASGI app; no server required.
+"""
+import asyncio
+import logging
+from sqlalchemy import text
+
+from app.core.server_timing import ServerTimingMiddleware
+from app.db.query_stats import track_queries, untracked, warn_repeated_queries
+from app.db.session import create_db_engine
+
+
+def test_counts_statements_and_time():
+    engine = create_db_engine("sqlite://")
+    with track_queries() as stats, engine.connect() as conn:
+        for i in range(3):
+            conn.execute(text("SELECT :i"), {"i": i})
+        conn.execute(text("SELECT 42"))
+    assert stats.count == 4
+    assert stats.duration > 0
+    assert stats.repeated(2) == [("SELECT ?", 3)]
+
+
+def test_untracked_statements_are_excluded():
+    engine = create_db_engine("sqlite://")
+    with track_queries() as stats, engine.connect() as conn:
+        with untracked():
+            conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+    assert stats.count == 1
+
+
+def test_repeated_shape_is_reported(caplog):
+    engine = create_db_engine("sqlite://")
+    with track_queries() as stats, engine.connect() as conn:
+        for i in range(12):
+            conn.execute(text("SELECT :i"), {"i": i})
+    with caplog.at_level(logging.WARNING, logger="app.db.query_stats"):
+        warn_repeated_queries(stats, 10, "GET /api/things")
+    assert "Possible N+1 in GET /api/things: statement ran 12 times" in caplog.text
+
+
+def test_middleware_adds_server_timing_header():
+    engine = create_db_engine("sqlite://")
+
+    async def app(scope, receive, send):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/x", "headers": []}
+    asyncio.run(ServerTimingMiddleware(app)(scope, None, send))
+    headers = dict(messages[0]["headers"])
+    assert b'desc="2 queries"' in headers[b"server-timing"]
+    assert b"app;dur=" in headers[b"server-timing"]
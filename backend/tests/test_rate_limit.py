@@ -0,0 +1,98 @@
+"""
+Rate limiter tests
+Token buckets in memory and in a fake Redis; no server required.
+"""
+import time
+import pytest
+from fastapi import HTTPException
+
+from app.core import rate_limit
+from app.core.rate_limit import MemoryBuckets, RateLimiter, RedisBuckets, parse_limit
+
+
+def test_parse_limit():
+    assert parse_limit("20/minute") == (20, 20 / 60)
+    assert parse_limit("5/second") == (5, 5)
+
+
+def test_burst_then_reject():
+    buckets = MemoryBuckets()
+    assert [buckets.take("k", 3, 1)[0] for _ in range(4)] == [True, True, True, False]
+    allowed, wait = buckets.take("k", 3, 1)
+    assert not allowed and 0 < wait <= 1
+
+
+def test_refill():
+    buckets = MemoryBuckets()
+    buckets.take("k", 1, 20)
+    assert not buckets.take("k", 1, 20)[0]
+    time.sleep(0.06)
+    assert buckets.take("k", 1, 20)[0]
+
+
+def test_full_buckets_swept(monkeypatch):
+    buckets = MemoryBuckets()
+    monkeypatch.setattr(MemoryBuckets, "SWEEP_SECONDS", 0)
+    buckets.take("old", 1, 1000)
+    time.sleep(0.01)
+    buckets.take("new", 5, 1)
+    assert list(buckets._buckets) == ["new"]
+
+
+def test_limiter_raises_429_with_retry_after(monkeypatch):
+    limiter = RateLimiter()
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_ENABLED", True)
+    limiter.check("login", "account", "a@example.com", "1/hour")
+    with pytest.raises(HTTPException) as exc:
+        limiter.check("login", "account", "a@example.com", "1/hour")
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) > 3000
+    limiter.check("login", "account", "b@example.com", "1/hour")
+
+
+def test_redis_buckets_shared_between_workers(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr("redis.Redis.from_url", lambda url, **kw: fakeredis.FakeRedis(server=server))
+    worker_a, worker_b = RedisBuckets("redis://test"), RedisBuckets("redis://test")
+    assert worker_a.take("k", 2, 1)[0]
+    assert worker_b.take("k", 2, 1)[0]
+    allowed, wait = worker_a.take("k", 2, 1)
+    assert not allowed and 0 < wait <= 1
+
+
+def test_redis_outage_falls_back_to_memory(monkeypatch):
+    pytest.importorskip("redis")
+    buckets = RedisBuckets("redis://127.0.0.1:1")
+    assert [buckets.take("k", 1, 1)[0] for _ in range(2)] == [True, False]
+
+
+def test_redis_outage_backs_off_before_probing_again(monkeypatch, caplog):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr("redis.Redis.from_url", lambda url, **kw: fakeredis.FakeRedis(server=server))
+    buckets = RedisBuckets("redis://test")
+    calls = []
+    script = buckets.script
+    monkeypatch.setattr(buckets, "script", lambda **kw: calls.append(1) or script(**kw))
+    clock = [1000.0]
+    monkeypatch.setattr("app.core.rate_limit.time.monotonic", lambda: clock[0])
+
+    server.connected = False
+    with caplog.at_level("WARNING", logger="app.core.rate_limit"):
+        for _ in range(5):
+            assert buckets.take("k", 10, 1)[0]
+        assert len(calls) == 1  # the rest skipped Redis
+        clock[0] += RedisBuckets.RETRY_SECONDS + 1
+        buckets.take("k", 10, 1)
+        assert len(calls) == 2  # one probe, still down
+        server.connected = True
+        clock[0] += RedisBuckets.RETRY_SECONDS + 1
+        buckets.take("k", 10, 1)
+        buckets.take("k", 10, 1)
+        assert len(calls) == 4
+    assert [r.getMessage().split(",")[0] for r in caplog.records] == [
+        "Rate limit backend unavailable", "Rate limit backend reachable again",
+    ]
@@ -0,0 +1,69 @@
+"""
+Read-replica routing tests
+Uses two local SQLite files as primary and replica; no server required.
+"""
+import shutil
+import time
+from datetime import timedelta
+import pytest
+from sqlalchemy import update
+
+from app.db.base import Base
+from app.db.session import create_db_engine
+from app.db.replica import ReplicaMonitor, write_heartbeat, utcnow_naive
+from app.models import ReplicaHeartbeat
+
+
+@pytest.fixture
+def databases(tmp_path):
+    primary_path = tmp_path / "primary.db"
+    replica_path = tmp_path / "replica.db"
+    primary = create_db_engine(f"sqlite:///{primary_path}")
+    Base.metadata.create_all(bind=primary)
+    write_heartbeat(primary)
+    # "Replicate" by copying the primary file
+    shutil.copy(primary_path, replica_path)
+    replica = create_db_engine(f"sqlite:///{replica_path}")
+    yield primary, replica, replica_path
+    primary.dispose()
+    replica.dispose()
+
+
+class TestReplicaMonitor:
+    """Replica health and lag checks"""
+    
+    def test_fresh_replica_is_usable(self, databases):
+        _, replica, _ = databases
+        monitor = ReplicaMonitor(replica, max_lag_seconds=30, check_seconds=0)
+        assert monitor.is_usable()
+        assert monitor.lag_seconds < 30
+    
+    def test_lagging_replica_falls_back(self, databases):
+        _, replica, _ = databases
+        with replica.begin() as conn:
+            conn.execute(update(ReplicaHeartbeat).values(beat_at=utcnow_naive() - timedelta(minutes=5)))
+        monitor = ReplicaMonitor(replica, max_lag_seconds=30, check_seconds=0)
+        assert not monitor.is_usable()
+        assert monitor.lag_seconds >= 300
+    
+    def test_unavailable_replica_falls_back(self, databases, tmp_path):
+        missing = create_db_engine(f"sqlite:///{tmp_path / 'nope' / 'replica.db'}")
+        monitor = ReplicaMonitor(missing, max_lag_seconds=30, check_seconds=0)
+        assert not monitor.is_usable()
+        assert monitor.lag_seconds is None
+    
+    def test_replica_without_heartbeat_falls_back(self, tmp_path):
+        empty = create_db_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+        Base.metadata.create_all(bind=empty)
+        monitor = ReplicaMonitor(empty, max_lag_seconds=30, check_seconds=0)
+        assert not monitor.is_usable()
+    
+    def test_check_result_is_cached(self, databases):
+        _, replica, _ = databases
+        monitor = ReplicaMonitor(replica, max_lag_seconds=30, check_seconds=60)
+        assert monitor.is_usable()
+        with replica.begin() as conn:
+            conn.execute(update(ReplicaHeartbeat).values(beat_at=utcnow_naive() - timedelta(minutes=5)))
+        assert monitor.is_usable()  # Still within the check interval
+        monitor._checked_at = time.monotonic() - 61
+        assert not monitor.is_usable()
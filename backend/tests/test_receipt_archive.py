@@ -0,0 +1,174 @@
+"""
+Receipt archive tests
+Archive segments, the tiering job, reindexing and serving archived files by
+offset; a scratch SQLite file and upload dir, no server required.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.requests import Request
+
+from app.core.file_serving import archived_file_response
+from app.db.base import Base
+from app.db.session import create_db_engine
+from app.models.archived_file import ArchivedFile
+from app.models.order import Order
+from app.models.receipt import Receipt
+from app.models.stored_file import StoredFile
+from app.models.user import User
+from app.services.receipt_archive import ReceiptArchive
+from app.services.receipts import LocalStorageDriver
+from app.services.upload_files import archive_cold_files, reindex_archive
+
+PDF = b"%PDF-1.4 " + b"receipt line item " * 4000  # compresses well
+PHOTO = os.urandom(300_000)  # doesn't
+
+
+def test_entries_round_trip_and_roll_over(tmp_path):
+    archive = ReceiptArchive(tmp_path, segment_bytes=200_000)
+    with archive.writer() as writer:
+        with archive.writer() as second:
+            assert second is None  # one writer at a time
+        pdf = writer.append("a.pdf", PDF)
+        photo = writer.append("b.jpg", PHOTO)
+        tail = writer.append("c.pdf", b"tiny")
+    assert pdf["compressed"] and pdf["stored_size"] < len(PDF) // 10
+    assert not photo["compressed"] and photo["stored_size"] == len(PHOTO)
+    assert (pdf["segment"], photo["segment"], tail["segment"]) == (1, 1, 2)
+
+    rows = {r["file_key"]: ArchivedFile(**r) for r in (pdf, photo, tail)}
+    assert archive.read(rows["a.pdf"]) == PDF
+    assert archive.read(rows["b.jpg"]) == PHOTO
+    assert archive.read(rows["c.pdf"]) == b"tiny"
+    assert [e["file_key"] for s in archive.segments() for e in archive.iter_entries(s)] == ["a.pdf", "b.jpg", "c.pdf"]
+    assert list(archive.iter_entries(1))[1] == photo
+
+
+def test_corrupt_entry_is_detected(tmp_path):
+    archive = ReceiptArchive(tmp_path)
+    with archive.writer() as writer:
+        row = ArchivedFile(**writer.append("b.jpg", PHOTO))
+    with open(archive.segment_path(1), "r+b") as f:
+        f.seek(row.offset + 10)
+        f.write(b"\xff\xff")
+    with pytest.raises(IOError):
+        archive.read(row)
+
+
+@pytest.fixture
+def env(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    driver = LocalStorageDriver(str(tmp_path / "uploads"))
+    archive = ReceiptArchive(tmp_path / "cold")
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    with Session(engine) as db:
+        user = User(email="cold@example.com", password_hash="x", full_name="Cold")
+        db.add(user)
+        db.flush()
+
+        def receipt(key, status, age_days):
+            order = Order(user_id=user.id, total_amount=100, delivery_address="Lagos", phone="080",
+                          status=status, created_at=now - timedelta(days=age_days))
+            db.add(order)
+            db.flush()
+            db.add(Receipt(order_id=order.id, user_id=user.id, file_url="u", file_key=key))
+
+        receipt("aa01.pdf", "delivered", 120)  # cold
+        receipt("aa02.jpg", "delivered", 100)  # cold
+        receipt("bb01.pdf", "delivered", 30)   # too recent
+        receipt("bb02.pdf", "cancelled", 200)  # not delivered
+        receipt("cc01.jpg", "delivered", 150)  # same content also on a recent order
+        receipt("cc01.jpg", "pending", 1)
+        db.add(StoredFile(sha256="aa01", file_key="aa01.pdf", size=1, ref_count=1,
+                          thumbnail_key="aa01.thumb.webp", preview_key="aa01.preview.webp"))
+        db.commit()
+    contents = {"aa01.pdf": PDF, "aa02.jpg": PHOTO, "bb01.pdf": b"b1", "bb02.pdf": b"b2", "cc01.jpg": b"c1",
+                "aa01.thumb.webp": b"thumb", "aa01.preview.webp": b"preview"}
+    for key, content in contents.items():
+        path = driver.sharded_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    yield driver, archive, factory, contents
+    engine.dispose()
+
+
+def test_tiering_moves_only_cold_files(env):
+    driver, archive, factory, contents = env
+    counts = archive_cold_files(driver, archive, factory, after_days=90, batch_size=1)
+    archived = {"aa01.pdf", "aa02.jpg", "aa01.preview.webp"}
+    assert counts["files"] == 3
+    assert counts["stored_bytes"] < counts["bytes"]
+    for key in contents:
+        assert (driver.resolve(key) is None) == (key in archived), key
+
+    with factory() as db:
+        rows = {r.file_key: r for r in db.query(ArchivedFile)}
+    assert set(rows) == archived
+    for key in archived:
+        assert archive.read(rows[key]) == contents[key]
+
+    # Nothing left to do on the next run
+    assert archive_cold_files(driver, archive, factory, after_days=90)["files"] == 0
+
+
+def test_reindex_restores_lost_rows(env):
+    driver, archive, factory, _ = env
+    archive_cold_files(driver, archive, factory, after_days=90)
+    with factory() as db:
+        before = {r.file_key: (r.segment, r.offset, r.stored_size, r.compressed) for r in db.query(ArchivedFile)}
+        db.query(ArchivedFile).filter(ArchivedFile.file_key != "aa02.jpg").delete()
+        db.commit()
+    assert reindex_archive(archive, factory) == 2
+    assert reindex_archive(archive, factory) == 0
+    with factory() as db:
+        after = {r.file_key: (r.segment, r.offset, r.stored_size, r.compressed) for r in db.query(ArchivedFile)}
+    assert after == before
+
+
+def serve(archive, row, headers=()):
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(k.encode(), v.encode()) for k, v in headers]}
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def run():
+        response = await archived_file_response(
+            Request(scope), row.file_key, archive.segment_path(row.segment), row.offset, row.size,
+            load=(lambda: archive.read(row)) if row.compressed else None,
+        )
+        await response(scope, None, send)
+
+    asyncio.run(run())
+    return messages[0]["status"], dict(messages[0]["headers"]), b"".join(m.get("body", b"") for m in messages[1:])
+
+
+@pytest.mark.parametrize("key, content", [("a.pdf", PDF), ("b.jpg", PHOTO)])
+def test_archived_files_serve_like_hot_ones(tmp_path, key, content):
+    archive = ReceiptArchive(tmp_path)
+    with archive.writer() as writer:
+        writer.append("first.pdf", b"another entry before it")
+        row = ArchivedFile(**writer.append(key, content))
+
+    status, headers, body = serve(archive, row)
+    assert status == 200 and body == content
+    assert headers[b"etag"] == f'"{key}"'.encode()
+    assert b"immutable" in headers[b"cache-control"]
+    assert int(headers[b"content-length"]) == len(content)
+
+    status, headers, body = serve(archive, row, [("range", "bytes=100-199")])
+    if row.compressed:
+        # Sent whole: a range would mean decompressing the entry again per request
+        assert b"accept-ranges" not in headers
+        assert status == 200 and body == content
+    else:
+        assert headers[b"accept-ranges"] == b"bytes"
+        assert status == 206 and body == content[100:200]
+        assert headers[b"content-range"] == f"bytes 100-199/{len(content)}".encode()
+
+    assert serve(archive, row, [("if-none-match", f'"{key}"')])[0] == 304
@@ -0,0 +1,91 @@
+"""
+Receipt queue tests
+Keyset pagination, joined fields and the index behind the admin review
+queue; a scratch SQLite file, no server required.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db.base import Base
+from app.db.session import create_db_engine
+from app.models.order import Order
+from app.models.receipt import Receipt
+from app.models.user import User
+from app.services.receipt_queue import decode_cursor, encode_cursor, receipt_queue
+
+START = datetime(2026, 1, 1, 9, 0)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'queue.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        customer = User(email="ada@example.com", password_hash="x", full_name="Ada Obi")
+        session.add(customer)
+        session.flush()
+        for i in range(7):
+            order = Order(user_id=customer.id, total_amount=1000 * (i + 1), delivery_address="Lagos", phone="080")
+            session.add(order)
+            session.flush()
+            session.add(Receipt(
+                order_id=order.id, user_id=customer.id, file_url=f"http://api/api/uploads/{i}.png",
+                file_key=f"{i}.png", content_hash="same" if i in (1, 4) else f"hash{i}",
+                # Pairs of receipts share a timestamp, so pages must break ties on id
+                uploaded_at=START + timedelta(minutes=i // 2),
+                status="approved" if i == 6 else "submitted",
+            ))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def test_pages_cover_the_queue_once_in_upload_order(db):
+    seen, cursor = [], None
+    while True:
+        page = receipt_queue(db, "submitted", 2, cursor)
+        seen.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert [r["order_id"] for r in seen] == [1, 2, 3, 4, 5, 6]
+    assert [r["uploaded_at"] for r in seen] == sorted(r["uploaded_at"] for r in seen)
+
+
+def test_items_carry_order_customer_and_reuse(db):
+    items = receipt_queue(db, "submitted", 10)["items"]
+    first = items[0]
+    assert first["order_total"] == 1000
+    assert first["order_status"] == "pending"
+    assert first["customer_name"] == "Ada Obi"
+    assert first["file_url"].startswith("http://api/api/uploads/0.png?exp=")
+    assert first["thumbnail_url"] is None
+    assert [r["order_id"] for r in items if r["reused"]] == [2, 5]
+    assert [r["order_id"] for r in receipt_queue(db, "approved", 10)["items"]] == [7]
+
+
+def test_last_page_has_no_cursor(db):
+    page = receipt_queue(db, "submitted", 6)
+    assert len(page["items"]) == 6
+    assert page["next_cursor"] is None
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(START, 42)) == (START, 42)
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_queue_walks_the_status_index(db):
+    plan = db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT id FROM receipts WHERE status = 'submitted' "
+        "AND (uploaded_at, id) > ('2026-01-01 09:00:00', 1) ORDER BY uploaded_at, id LIMIT 51"
+    )).all()
+    details = " ".join(row[-1] for row in plan)
+    assert "ix_receipts_status_uploaded_at" in details
+    assert "TEMP B-TREE" not in details
@@ -0,0 +1,144 @@
+"""
+Receipt upload tests
+Chunked spooling, size limits, content-hash dedupe and the body-size
+middleware; a scratch SQLite file, no server required.
+"""
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from sqlalchemy.orm import Session
+
+from app.core.body_limit import BodySizeLimitMiddleware
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import SyncSessionAdapter, create_db_engine
+from app.models.stored_file import StoredFile
+from app.services import receipts
+
+
+class CountingReader(io.BytesIO):
+    """Records the largest single read"""
+
+    largest = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.largest = max(self.largest, len(chunk))
+        return chunk
+
+
+def test_spool_hashes_and_reads_in_chunks(tmp_path):
+    content = os.urandom(receipts.CHUNK_SIZE * 3 + 17)
+    source = CountingReader(content)
+    temp_path, size, sha256 = receipts.spool_upload(source, tmp_path, len(content))
+    assert size == len(content)
+    assert sha256 == hashlib.sha256(content).hexdigest()
+    assert source.largest == receipts.CHUNK_SIZE
+    with open(temp_path, "rb") as f:
+        assert f.read() == content
+
+
+def test_spool_stops_at_limit_and_cleans_up(tmp_path):
+    source = CountingReader(b"x" * (receipts.CHUNK_SIZE * 10))
+    with pytest.raises(HTTPException) as exc:
+        receipts.spool_upload(source, tmp_path, receipts.CHUNK_SIZE * 2)
+    assert exc.value.status_code == 400
+    assert source.tell() == receipts.CHUNK_SIZE * 3  # stopped at the chunk that crossed the limit
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.fixture
+def upload_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'uploads.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def save(db: Session, content: bytes, filename: str = "receipt.pdf"):
+    upload = UploadFile(io.BytesIO(content), filename=filename)
+    result = asyncio.run(receipts.save_receipt_file(SyncSessionAdapter(db), upload, "http://api"))
+    db.commit()
+    return result
+
+
+def test_save_receipt_file_stores_by_content_hash(upload_db, tmp_path):
+    content = b"%PDF-1.4 receipt"
+    sha256 = hashlib.sha256(content).hexdigest()
+    file_url, file_key, content_hash = save(upload_db, content)
+    assert content_hash == sha256
+    assert file_key == f"{sha256}.pdf"
+    assert file_url == f"http://api/api/uploads/{file_key}"
+    assert (tmp_path / "uploads" / sha256[:2] / sha256[2:4] / file_key).read_bytes() == content
+    assert list((tmp_path / "uploads" / ".incoming").iterdir()) == []
+
+
+def test_identical_uploads_are_stored_once(upload_db, tmp_path):
+    first = save(upload_db, b"same screenshot", "a.png")
+    second = save(upload_db, b"same screenshot", "b.jpg")
+    other = save(upload_db, b"another screenshot", "c.png")
+    assert second[1] == first[1]  # the first upload's key, extension included
+    assert other[1] != first[1]
+    stored = {f.sha256: f for f in upload_db.query(StoredFile)}
+    assert stored[first[2]].ref_count == 2
+    assert stored[other[2]].ref_count == 1
+    stored_files = [p for p in (tmp_path / "uploads").rglob("*") if p.is_file() and ".incoming" not in p.parts]
+    assert sorted(p.name for p in stored_files) == sorted([first[1], other[1]])
+
+
+def test_dedup_upload_restores_a_missing_file(upload_db, tmp_path):
+    _, file_key, _ = save(upload_db, b"lost screenshot", "a.png")
+    receipts.get_storage_driver().resolve(file_key).unlink()  # e.g. a GC sweep that raced an upload
+    assert save(upload_db, b"lost screenshot", "b.png")[1] == file_key
+    assert receipts.get_storage_driver().resolve(file_key).read_bytes() == b"lost screenshot"
+    assert upload_db.query(StoredFile).one().ref_count == 2
+
+
+async def run_middleware(headers, chunks):
+    messages, reads = [], []
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            reads.append(len(message.get("body", b"")))
+            if not message.get("more_body"):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    pending = list(chunks)
+
+    async def receive():
+        body = pending.pop(0)
+        return {"type": "http.request", "body": body, "more_body": bool(pending)}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/x", "headers": headers}
+    await BodySizeLimitMiddleware(app, max_bytes=100)(scope, receive, send)
+    return messages, reads
+
+
+def test_middleware_refuses_large_content_length_unread():
+    messages, reads = asyncio.run(run_middleware([(b"content-length", b"101")], [b"x" * 101]))
+    assert messages[0]["status"] == 413
+    assert reads == []
+
+
+def test_middleware_stops_streamed_body_at_limit():
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(run_middleware([], [b"x" * 60, b"x" * 60, b"x" * 60]))
+    assert exc.value.status_code == 413
+
+
+def test_middleware_passes_bodies_within_limit():
+    messages, reads = asyncio.run(run_middleware([(b"content-length", b"100")], [b"x" * 50, b"x" * 50]))
+    assert messages[0]["status"] == 200
+    assert reads == [50, 50]
@@ -0,0 +1,100 @@
+"""
+Refresh-token rotation tests
+Rotation, reuse detection, revocation sync and the expiry purge on a scratch
+SQLite file; no server required.
+"""
+import time
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.security import decode_token
+from app.core.token_cache import TokenCache
+from app.db.base import Base
+from app.db.session import create_db_engine
+from app.models import RefreshToken, User
+from app.services import refresh_tokens
+from app.services.refresh_tokens import (
+    RevokedJtis, purge_expired_refresh_tokens, revoke_family, revoke_user_sessions, rotate_refresh_token,
+    start_session,
+)
+
+CLAIMS = {"sub": "1", "email": "ada@example.com", "role": "customer"}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(refresh_tokens, "revoked_jtis", RevokedJtis())
+    monkeypatch.setattr(refresh_tokens, "token_cache", TokenCache(maxsize=10))
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'tokens.db'}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add(User(id=1, email="ada@example.com", full_name="Ada", password_hash="x", role="customer"))
+        db.commit()
+        yield db
+
+
+def rotate(db, token):
+    return rotate_refresh_token(db, decode_token(token), CLAIMS)
+
+
+def test_rotation_revokes_presented_token(db):
+    first = start_session(db, 1, CLAIMS)
+    second = rotate(db, first)
+    old, new = decode_token(first), decode_token(second)
+    assert old["fam"] == new["fam"] and old["jti"] != new["jti"]
+    row = db.scalar(select(RefreshToken).where(RefreshToken.jti == old["jti"]))
+    assert row.revoke_reason == "rotated" and row.replaced_by == new["jti"]
+    assert refresh_tokens.revoked_jtis.get(old["jti"])[2] is True
+
+
+def test_parallel_refresh_within_grace_allowed(db):
+    first = start_session(db, 1, CLAIMS)
+    rotate(db, first)
+    assert decode_token(rotate(db, first))["fam"] == decode_token(first)["fam"]
+
+
+def test_reuse_revokes_family(db, monkeypatch):
+    monkeypatch.setattr(refresh_tokens.settings, "REFRESH_REUSE_GRACE_SECONDS", 0)
+    first = start_session(db, 1, CLAIMS)
+    second = rotate(db, first)
+    time.sleep(0.01)
+    with pytest.raises(HTTPException) as exc:
+        rotate(db, first)
+    assert exc.value.status_code == 401
+    # The legitimate successor is gone too, and the user's access tokens with it
+    with pytest.raises(HTTPException):
+        rotate(db, second)
+    assert refresh_tokens.token_cache.is_revoked(b"k", {"sub": "1", "iat": time.time() - 1})
+
+
+def test_logged_out_family_not_rescued_by_grace(db):
+    first = start_session(db, 1, CLAIMS)
+    rotate(db, first)
+    revoke_family(db, decode_token(first)["fam"], "logout")
+    with pytest.raises(HTTPException):
+        rotate(db, first)
+
+
+def test_other_workers_pick_up_revocations(db):
+    phone, laptop = start_session(db, 1, CLAIMS), start_session(db, 1, CLAIMS)
+    other_worker = RevokedJtis()
+    other_worker.sync(db)
+    assert len(other_worker) == 0
+    revoke_user_sessions(db, 1)
+    other_worker.sync(db)
+    assert other_worker.get(decode_token(phone)["jti"]) is not None
+    assert other_worker.get(decode_token(laptop)["jti"]) is not None
+
+
+def test_purge_drops_only_expired_rows(db):
+    start_session(db, 1, CLAIMS)
+    expired = start_session(db, 1, CLAIMS)
+    row = db.scalar(select(RefreshToken).where(RefreshToken.jti == decode_token(expired)["jti"]))
+    row.expires_at = row.issued_at - timedelta(seconds=1)
+    db.commit()
+    assert purge_expired_refresh_tokens(db) == 1
+    assert purge_expired_refresh_tokens(db) == 0
+    assert db.query(RefreshToken).count() == 1
@@ -0,0 +1,175 @@
+"""
+S3 storage tests
+The S3 driver, multipart uploads, the presigned direct-upload flow and the
+cleanup of abandoned uploads against an in-process moto server; no API
+server required.
+"""
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+pytest.importorskip("boto3")
+moto_server = pytest.importorskip("moto.server")
+import requests
+
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import SyncSessionAdapter, create_db_engine
+from app.models.stored_file import StoredFile
+from app.services import receipts
+from app.services.storage_s3 import S3StorageDriver, s3_client
+from app.services.upload_files import sweep_incoming
+
+MOTO_PORT = 8799
+BUCKET = "receipts"
+
+
+@pytest.fixture(scope="module")
+def s3_endpoint():
+    server = moto_server.ThreadedMotoServer(port=MOTO_PORT, verbose=False)
+    server.start()
+    yield f"http://127.0.0.1:{MOTO_PORT}"
+    server.stop()
+
+
+@pytest.fixture
+def driver(s3_endpoint, monkeypatch, tmp_path):
+    for name, value in {
+        "UPLOAD_DRIVER": "s3", "S3_BUCKET": BUCKET, "S3_PREFIX": f"{tmp_path.name}/",
+        "S3_ENDPOINT_URL": s3_endpoint, "S3_ACCESS_KEY_ID": "test", "S3_SECRET_ACCESS_KEY": "test",
+        "S3_MULTIPART_THRESHOLD_MB": 5, "S3_MULTIPART_CHUNK_MB": 5,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    s3_client.cache_clear()
+    driver = receipts.get_storage_driver()
+    assert isinstance(driver, S3StorageDriver)
+    driver.client.create_bucket(Bucket=BUCKET)
+    yield driver
+    s3_client.cache_clear()
+
+
+def write_temp(tmp_path, content: bytes) -> str:
+    path = tmp_path / "spooled"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_save_fetch_and_download_url(driver, tmp_path):
+    content = b"%PDF-1.4 receipt"
+    temp_path = write_temp(tmp_path, content)
+    assert driver.save(temp_path, "abc.pdf") == "abc.pdf"
+    assert not os.path.exists(temp_path)
+
+    local, temporary = driver.fetch("abc.pdf")
+    assert temporary
+    with open(local, "rb") as f:
+        assert f.read() == content
+    os.unlink(local)
+
+    response = requests.get(driver.download_url("abc.pdf"))
+    assert response.status_code == 200
+    assert response.content == content
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_large_files_go_up_in_parts(driver, tmp_path):
+    content = os.urandom(11 * 1024 * 1024)
+    driver.save(write_temp(tmp_path, content), "big.pdf")
+    head = driver.client.head_object(Bucket=BUCKET, Key=driver._key("big.pdf"))
+    assert head["ContentLength"] == len(content)
+    assert head["ETag"].strip('"').endswith("-3")  # 5 + 5 + 1 MB parts
+    assert head["ContentType"] == "application/pdf"
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 's3.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def direct_upload(db: Session, owner: str, content: bytes, filename: str = "receipt.png"):
+    sha256 = hashlib.sha256(content).hexdigest()
+    upload = asyncio.run(receipts.create_direct_upload(owner, filename, len(content), sha256))
+    assert upload["upload_key"].startswith(f"incoming/{owner}/")
+    put = requests.put(upload["upload_url"], data=content, headers=upload["headers"])
+    assert put.status_code == 200
+    result = asyncio.run(receipts.complete_direct_upload(SyncSessionAdapter(db), owner, upload["upload_key"], "http://api"))
+    db.commit()
+    return upload["upload_key"], result
+
+
+def bucket_keys(driver) -> list:
+    listing = driver.client.list_objects_v2(Bucket=BUCKET, Prefix=driver.prefix)
+    return sorted(o["Key"][len(driver.prefix):] for o in listing.get("Contents", []))
+
+
+def test_direct_upload_is_moved_to_its_content_address(driver, db):
+    content = b"screenshot bytes"
+    sha256 = hashlib.sha256(content).hexdigest()
+    upload_key, (file_url, file_key, content_hash) = direct_upload(db, "7", content)
+    assert content_hash == sha256
+    assert file_key == f"{sha256}.png"
+    assert file_url == f"http://api/api/uploads/{file_key}"
+    assert bucket_keys(driver) == [file_key]
+
+    # The same bytes again: one stored object, two references
+    _, second = direct_upload(db, "7", content, "again.png")
+    assert second[1] == file_key
+    assert bucket_keys(driver) == [file_key]
+    assert db.query(StoredFile).one().ref_count == 2
+
+
+def test_direct_upload_restores_a_missing_object(driver, db):
+    _, (_, file_key, _) = direct_upload(db, "7", b"lost bytes")
+    driver.delete(file_key)
+    assert not driver.exists(file_key)
+    direct_upload(db, "7", b"lost bytes")
+    assert bucket_keys(driver) == [file_key]
+
+
+def test_complete_refuses_other_owners_and_missing_uploads(driver, db):
+    content = b"someone else's receipt"
+    upload = asyncio.run(receipts.create_direct_upload("7", "r.pdf", len(content), hashlib.sha256(content).hexdigest()))
+    requests.put(upload["upload_url"], data=content, headers=upload["headers"])
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(receipts.complete_direct_upload(SyncSessionAdapter(db), "8", upload["upload_key"]))
+    assert exc.value.detail == "Unknown upload"
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(receipts.complete_direct_upload(SyncSessionAdapter(db), "7", "incoming/7/missing.pdf"))
+    assert exc.value.status_code == 400
+
+
+def test_gc_removes_abandoned_direct_uploads(driver, db):
+    _, (_, file_key, _) = direct_upload(db, "7", b"completed")
+    content = b"never completed"
+    upload = asyncio.run(receipts.create_direct_upload("7", "r.pdf", len(content), hashlib.sha256(content).hexdigest()))
+    requests.put(upload["upload_url"], data=content, headers=upload["headers"])
+
+    assert sweep_incoming(driver, grace_seconds=3600) == {"checked": 1, "orphans": 0, "stale_temp": 0}
+    assert sweep_incoming(driver, grace_seconds=0, dry_run=True)["stale_temp"] == 1
+    assert bucket_keys(driver) == sorted([file_key, upload["upload_key"]])
+    assert sweep_incoming(driver, grace_seconds=0)["stale_temp"] == 1
+    assert bucket_keys(driver) == [file_key]
+
+
+def test_direct_upload_refuses_bad_type_and_size(driver):
+    with pytest.raises(HTTPException):
+        asyncio.run(receipts.create_direct_upload("7", "r.exe", 10, "0" * 64))
+    with pytest.raises(HTTPException):
+        asyncio.run(receipts.create_direct_upload("7", "r.pdf", receipts.MAX_SIZE_BYTES + 1, "0" * 64))
+
+
+def test_local_driver_has_no_direct_uploads(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_DRIVER", "local")
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(receipts.create_direct_upload("7", "r.pdf", 10, "0" * 64))
+    assert exc.value.status_code == 404
@@ -0,0 +1,94 @@
+"""
+Sales ranking tests
+The one-time sales_daily backfill and the in-memory ranking; a scratch
+SQLite file, no server required.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.db.base import Base
+from app.db.migrations import run_migrations
+from app.db.session import create_db_engine
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.models.sales import SalesDaily
+from app.models.user import User
+from app.services.sales_ranking import SalesRanking, record_sales, record_status_change, today_utc
+
+
+def test_backfill_runs_once_and_sets_history_totals(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'sales.db'}")
+    Base.metadata.create_all(engine)
+    today = today_utc()
+    now = datetime.combine(today, datetime.min.time()) + timedelta(hours=12)
+    with Session(engine) as db:
+        user = User(email="sales@example.com", password_hash="x", full_name="Sales")
+        product = Product(name="Rice", price=100, stock_qty=50)
+        db.add_all([user, product])
+        db.flush()
+        for status, qty, age in (("delivered", 2, 0), ("pending", 3, 0), ("cancelled", 5, 0), ("delivered", 1, 200)):
+            order = Order(user_id=user.id, total_amount=qty * 100, delivery_address="Lagos", phone="080",
+                          status=status, created_at=now - timedelta(days=age))
+            order.items = [OrderItem(product_id=product.id, name_snapshot="Rice", unit_price=100, qty=qty, line_total=qty * 100)]
+            db.add(order)
+        # The pending order's checkout was already recorded live before the backfill ran
+        product_id = product.id
+        record_sales(db, [{"product_id": product_id, "name_snapshot": "Rice", "qty": 3, "line_total": 300}], today)
+        db.commit()
+
+    run_migrations(engine, Base.metadata)
+    with Session(engine) as db:
+        assert [(r.day, r.qty, r.revenue) for r in db.query(SalesDaily)] == [(today, 5, 500)]
+        # Recorded as applied: later checkouts are never backfilled over
+        record_sales(db, [{"product_id": product_id, "name_snapshot": "Rice", "qty": 1, "line_total": 100}], today)
+        db.commit()
+    assert run_migrations(engine, Base.metadata) == []
+    with Session(engine) as db:
+        assert db.query(SalesDaily.qty).scalar() == 6
+    engine.dispose()
+
+
+def test_cancelling_takes_sales_back_out(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'sales.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        user = User(email="sales@example.com", password_hash="x", full_name="Sales")
+        product = Product(name="Rice", price=100, stock_qty=50)
+        db.add_all([user, product])
+        db.flush()
+        order = Order(user_id=user.id, total_amount=300, delivery_address="Lagos", phone="080")
+        order.items = [OrderItem(product_id=product.id, name_snapshot="Rice", unit_price=100, qty=3, line_total=300)]
+        db.add(order)
+        record_sales(db, [{"product_id": product.id, "name_snapshot": "Rice", "qty": 3, "line_total": 300}])
+        db.commit()
+
+        assert record_status_change(db, order, "pending", "paid") == []
+        entries = record_status_change(db, order, "paid", "cancelled")
+        assert [(e[0], e[3], e[4]) for e in entries] == [(("product", product.id), -3, -300)]
+        db.commit()
+        assert db.query(SalesDaily.qty, SalesDaily.revenue).one() == (0, 0)
+
+        record_status_change(db, order, "cancelled", "pending")
+        db.commit()
+        assert db.query(SalesDaily.qty, SalesDaily.revenue).one() == (3, 300)
+    engine.dispose()
+
+
+def test_ranking_cache_is_patched_in_place():
+    ranking = SalesRanking(size=2)
+    day = today_utc()
+    ranking.load([("product", 1, day, 5, 500), ("product", 2, day, 3, 300), ("product", 3, day, 1, 100)],
+                 {("product", i): f"P{i}" for i in (1, 2, 3)}, day)
+    assert [r["item_id"] for r in ranking.top(7, 10, "product")] == [1, 2]
+
+    ranking.add(("product", 3), "P3", day, 5, 500)  # overtakes both
+    assert ("product", 7) in ranking._top  # patched, not dropped
+    assert [(r["item_id"], r["units_sold"]) for r in ranking.top(7, 10, "product")] == [(3, 6), (1, 5)]
+    ranking.add(("product", 4), "P4", day - timedelta(days=20), 9, 900)  # outside the 7-day window
+    assert [r["item_id"] for r in ranking.top(7, 10, "product")] == [3, 1]
+    assert [r["item_id"] for r in ranking.top(30, 10, "product")] == [4, 3]
+
+    ranking.add(("product", 3), "P3", day, -5, -500)  # cancelled: 2 is back in the top two
+    assert [r["item_id"] for r in ranking.top(7, 10, "product")] == [1, 2]
+    assert ranking.top(7, 10, "product") == ranking._rank("product", 7)
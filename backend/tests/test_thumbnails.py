@@ -0,0 +1,119 @@
+"""
+Receipt thumbnail tests
+Rendering images and PDFs, the render pool's backlog limit and the catch-up
+for lost rendition jobs; a scratch SQLite file, no server required.
+"""
+import asyncio
+import hashlib
+import io
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+from PIL import Image
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.thumbnails import ThumbnailRenderer, _render, thumbnail_renderer
+from app.db.base import Base
+from app.db.session import SyncSessionAdapter, create_db_engine
+from app.models import ArchivedFile, Order, Receipt, StoredFile, User
+from app.services import receipts
+from app.services.receipt_archive import ReceiptArchive
+
+
+def test_photo_is_rotated_and_shrunk(tmp_path):
+    source = tmp_path / "photo.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: stored on its side, as phones do
+    Image.new("RGB", (4000, 3000), "white").save(source, exif=exif)
+
+    preview, thumbnail = _render(str(source), False, str(tmp_path), 1600, 256)
+    with Image.open(preview) as image:
+        assert image.format == "WEBP"
+        assert image.size == (1200, 1600)
+    with Image.open(thumbnail) as image:
+        assert image.size == (192, 256)
+
+
+def test_small_image_is_not_enlarged(tmp_path):
+    source = tmp_path / "small.png"
+    Image.new("RGB", (100, 50), "white").save(source)
+    preview, thumbnail = _render(str(source), False, str(tmp_path), 1600, 256)
+    with Image.open(preview) as image:
+        assert image.size == (100, 50)
+
+
+def test_pdf_first_page(tmp_path):
+    source = tmp_path / "receipt.pdf"
+    pages = [Image.new("RGB", (600, 800), "white"), Image.new("RGB", (800, 600), "black")]
+    pages[0].save(source, save_all=True, append_images=pages[1:])
+
+    preview, thumbnail = _render(str(source), True, str(tmp_path), 1600, 256)
+    with Image.open(preview) as image:
+        assert max(image.size) == 1600
+        assert image.width < image.height  # the portrait first page
+        assert image.getpixel((10, 10)) == (255, 255, 255)
+    with Image.open(thumbnail) as image:
+        assert max(image.size) == 256
+
+
+def test_full_queue_skips_without_starting_a_pool(tmp_path):
+    renderer = ThumbnailRenderer(workers=0, max_queue=0)
+    assert asyncio.run(renderer.render(str(tmp_path / "x.png"), False)) is None
+    assert renderer._executor is None
+
+
+def test_lost_jobs_are_requeued_including_archived_sources(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'renditions.db'}")
+    Base.metadata.create_all(engine)
+
+    @asynccontextmanager
+    async def scratch_session():
+        with Session(engine) as db:
+            yield SyncSessionAdapter(db)
+
+    monkeypatch.setattr(receipts, "async_session", scratch_session)
+    driver = receipts.get_storage_driver()
+    archive = ReceiptArchive(tmp_path / "cold")
+    monkeypatch.setattr(receipts, "ReceiptArchive", lambda: archive)
+
+    def png(color) -> bytes:
+        out = io.BytesIO()
+        Image.new("RGB", (400, 300), color).save(out, "PNG")
+        return out.getvalue()
+
+    old = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=1)
+    with Session(engine) as db:
+        user = User(email="thumbs@example.com", password_hash="x", full_name="Thumbs")
+        db.add(user)
+        db.flush()
+        order = Order(user_id=user.id, total_amount=100, delivery_address="Lagos", phone="080")
+        db.add(order)
+        db.flush()
+        for color, archived in (("red", False), ("blue", True)):
+            content = png(color)
+            sha = hashlib.sha256(content).hexdigest()
+            key = f"{sha}.png"
+            db.add(StoredFile(sha256=sha, file_key=key, size=len(content), ref_count=1, created_at=old))
+            db.add(Receipt(order_id=order.id, user_id=user.id, file_url=f"http://api/api/uploads/{key}",
+                           file_key=key, content_hash=sha))
+            if archived:
+                with archive.writer() as writer:
+                    db.add(ArchivedFile(**writer.append(key, content)))
+            else:
+                path = driver.sharded_path(key)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(content)
+        db.commit()
+
+    try:
+        assert asyncio.run(receipts.requeue_renditions(min_age_seconds=0)) == 2
+        assert asyncio.run(receipts.requeue_renditions(min_age_seconds=0)) == 0
+    finally:
+        thumbnail_renderer.shutdown()
+    with Session(engine) as db:
+        for receipt in db.query(Receipt):
+            assert receipt.thumbnail_url.endswith(".thumb.webp")
+            assert driver.resolve(receipt.thumbnail_url.rsplit("/", 1)[1]) is not None
+    engine.dispose()
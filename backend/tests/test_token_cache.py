@@ -0,0 +1,81 @@
+"""
+Verified-token cache tests
+Real JWTs through get_current_user; no server required.
+"""
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.core import security
+from app.core.security import create_access_token, create_refresh_token, get_current_user
+from app.core.token_cache import TokenCache, token_key
+from app.schemas.auth import UserResponse
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = TokenCache(maxsize=2)
+    monkeypatch.setattr(security, "token_cache", cache)
+
+    async def active_profile(user_id):
+        return UserResponse(id=user_id, email="u@example.com", full_name="U", role="customer", is_active=True)
+
+    monkeypatch.setattr(security, "get_user_profile", active_profile)
+    return cache
+
+
+def authenticate(token):
+    return asyncio.run(get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)))
+
+
+def test_payload_cached_after_first_use(cache, monkeypatch):
+    token = create_access_token({"sub": "1", "role": "customer"})
+    assert authenticate(token)["sub"] == "1"
+    monkeypatch.setattr(security, "decode_token", lambda t: pytest.fail("decoded again"))
+    assert authenticate(token)["sub"] == "1"
+
+
+def test_expired_entry_not_served(cache):
+    key = token_key("t")
+    cache.put(key, {"sub": "1", "exp": time.time() - 1})
+    assert cache.get(key) is None
+
+
+def test_least_recently_used_evicted(cache):
+    a, b, c = token_key("a"), token_key("b"), token_key("c")
+    exp = time.time() + 60
+    cache.put(a, {"sub": "1", "exp": exp})
+    cache.put(b, {"sub": "2", "exp": exp})
+    cache.get(a)
+    cache.put(c, {"sub": "3", "exp": exp})
+    assert cache.get(b) is None
+    assert cache.get(a) is not None and cache.get(c) is not None
+
+
+def test_refresh_token_rejected(cache):
+    with pytest.raises(HTTPException) as exc:
+        authenticate(create_refresh_token({"sub": "1"}))
+    assert exc.value.status_code == 401
+
+
+def test_revoked_token_rejected_even_when_cached(cache):
+    token = create_access_token({"sub": "1"})
+    payload = authenticate(token)
+    cache.revoke(token_key(token), payload["exp"])
+    with pytest.raises(HTTPException) as exc:
+        authenticate(token)
+    assert exc.value.detail == "Token has been revoked"
+
+
+def test_revoke_user_rejects_only_earlier_tokens(cache):
+    old = create_access_token({"sub": "7"})
+    authenticate(old)
+    time.sleep(0.002)
+    cache.revoke_user(7)
+    time.sleep(0.002)
+    new = create_access_token({"sub": "7"})
+    with pytest.raises(HTTPException):
+        authenticate(old)
+    assert authenticate(new)["sub"] == "7"
@@ -0,0 +1,147 @@
+"""
+Upload layout and GC tests
+Sharded paths, the flat-layout fallback and reshard, and the orphaned-file
+collector; a scratch SQLite file and upload dir, no server required.
+"""
+import os
+import time
+
+import pytest
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.base import Base
+from app.db.session import create_db_engine
+from app.models.order import Order
+from app.models.receipt import Receipt
+from app.models.stored_file import StoredFile
+from app.models.user import User
+from app.services import upload_files
+from app.services.receipts import LocalStorageDriver, add_file_reference, shard_dirs
+from app.services.upload_files import collect_orphans, reshard_uploads, sweep_once
+
+SHA_LIVE = "ab" * 32
+SHA_DEAD = "cd" * 32
+DAY = 86400
+
+
+def test_shard_dirs():
+    assert shard_dirs(f"{SHA_LIVE}.png") == ("ab", "ab")
+    assert shard_dirs("0f3e2a91-uuid.pdf") == ("0f", "3e")
+    # Keys that don't start with hex are spread by a hash of the name
+    first, second = shard_dirs("receipt.pdf")
+    assert len(first) == len(second) == 2
+    assert shard_dirs("receipt.pdf") == (first, second)
+
+
+def test_save_resolve_and_delete_sharded(tmp_path):
+    driver = LocalStorageDriver(str(tmp_path))
+    temp = tmp_path / ".incoming" / "upload-1.part"
+    temp.write_bytes(b"x")
+    key = f"{SHA_LIVE}.png"
+    driver.save(str(temp), key)
+    assert (tmp_path / "ab" / "ab" / key).read_bytes() == b"x"
+    assert driver.resolve(key) == (tmp_path / "ab" / "ab" / key).resolve()
+    assert driver.delete(key)
+    assert driver.resolve(key) is None
+
+
+def test_reshard_moves_flat_files_and_keeps_them_reachable(tmp_path):
+    driver = LocalStorageDriver(str(tmp_path))
+    keys = [f"{SHA_LIVE}.png", "1234abcd.pdf"]
+    for key in keys:
+        (tmp_path / key).write_bytes(key.encode())
+        assert driver.resolve(key) == (tmp_path / key).resolve()  # flat layout still served
+
+    assert reshard_uploads(driver) == 2
+    assert reshard_uploads(driver) == 0
+    for key in keys:
+        assert not (tmp_path / key).exists()
+        assert driver.resolve(key).read_bytes() == key.encode()
+    assert (tmp_path / ".incoming").is_dir()
+
+
+@pytest.fixture
+def gc_env(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'gc.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    driver = LocalStorageDriver(str(tmp_path / "uploads"))
+    with Session(engine) as db:
+        user = User(email="gc@example.com", password_hash="x", full_name="GC")
+        db.add(user)
+        db.flush()
+        order = Order(user_id=user.id, total_amount=100, delivery_address="Lagos", phone="080")
+        db.add(order)
+        db.flush()
+        db.add(Receipt(order_id=order.id, user_id=user.id, file_url="u", file_key=f"{SHA_LIVE}.png"))
+        db.add(Receipt(order_id=order.id, user_id=user.id, file_url="u", file_key="legacy-live.pdf"))
+        for sha in (SHA_LIVE, SHA_DEAD):
+            db.add(StoredFile(sha256=sha, file_key=f"{sha}.png", size=1, ref_count=1,
+                              thumbnail_key=f"{sha}.thumb.webp", preview_key=f"{sha}.preview.webp"))
+        db.commit()
+    yield driver, factory
+    engine.dispose()
+
+
+def put(driver, key, age, flat=False):
+    path = driver.upload_dir / key if flat else driver.sharded_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x")
+    os.utime(path, (time.time() - age, time.time() - age))
+    return path
+
+
+def test_gc_removes_only_old_unreferenced_files(gc_env):
+    driver, factory = gc_env
+    live = [put(driver, f"{SHA_LIVE}{suffix}", 2 * DAY) for suffix in (".png", ".thumb.webp", ".preview.webp")]
+    live.append(put(driver, "legacy-live.pdf", 2 * DAY, flat=True))
+    dead = [put(driver, f"{SHA_DEAD}{suffix}", 2 * DAY) for suffix in (".png", ".thumb.webp", ".preview.webp")]
+    dead.append(put(driver, "legacy-dead.pdf", 2 * DAY, flat=True))
+    young = put(driver, "ef01-just-uploaded.png", 60)
+    stale_temp = put(driver, ".incoming/upload-x.part", 2 * DAY, flat=True)
+    fresh_temp = put(driver, ".incoming/upload-y.part", 60, flat=True)
+
+    counts = collect_orphans(driver, factory, grace_seconds=DAY, batch_size=3)
+    assert counts == {"checked": 8, "orphans": 4, "stale_temp": 1}
+    assert all(p.exists() for p in live + [young, fresh_temp])
+    assert not any(p.exists() for p in dead + [stale_temp])
+    # The dead content's row is gone, so re-uploading it stores the file again
+    with factory() as db:
+        assert [f.sha256 for f in db.query(StoredFile)] == [SHA_LIVE]
+
+
+def test_gc_dry_run_and_lock(gc_env):
+    driver, factory = gc_env
+    dead = put(driver, f"{SHA_DEAD}.png", 2 * DAY)
+    assert collect_orphans(driver, factory, grace_seconds=DAY, dry_run=True)["orphans"] == 1
+    assert dead.exists()
+
+    import fcntl
+    with open(driver.upload_dir / ".gc.lock", "w") as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        assert sweep_once(driver, session_factory=factory, grace_seconds=DAY) is None
+    assert sweep_once(driver, session_factory=factory, grace_seconds=DAY)["orphans"] == 1
+    assert not dead.exists()
+
+
+def test_gc_keeps_content_reuploaded_mid_sweep(gc_env, monkeypatch):
+    """A dedup upload committing between the liveness check and the delete keeps its row and file"""
+    driver, factory = gc_env
+    dead = put(driver, f"{SHA_DEAD}.png", 2 * DAY)
+    snapshot = upload_files.live_keys
+
+    def live_keys_then_upload(db, keys):
+        live = snapshot(db, keys)
+        with factory() as other:
+            key, references = add_file_reference(other, SHA_DEAD, f"{SHA_DEAD}.png", 1)
+            assert references == 2  # deduplicated: the file on disk is not rewritten
+            order = other.query(Order).first()
+            other.add(Receipt(order_id=order.id, user_id=order.user_id, file_url="u", file_key=key))
+            other.commit()
+        return live
+
+    monkeypatch.setattr(upload_files, "live_keys", live_keys_then_upload)
+    assert collect_orphans(driver, factory, grace_seconds=DAY)["orphans"] == 0
+    assert dead.exists()
+    with factory() as db:
+        assert db.query(StoredFile).filter(StoredFile.sha256 == SHA_DEAD).one().ref_count == 2
@@ -0,0 +1,77 @@
+"""
+User profile cache tests
+Profiles loaded through a sync session on a scratch SQLite file; no server required.
+"""
+import time
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.core.token_cache import TokenCache, token_cache
+from app.db.base import Base
+from app.db.session import create_db_engine
+from app.models import User
+from app.services import user_profiles as user_profiles_module
+from app.services.user_profiles import UserProfileCache, load_user_profile, user_profiles
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'users.db'}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add(User(id=1, email="ada@example.com", full_name="Ada", password_hash="x", role="customer"))
+        db.commit()
+        user_profiles.clear()
+        yield db
+    user_profiles.clear()
+
+
+def test_second_lookup_served_from_cache(db):
+    assert load_user_profile(db, 1).full_name == "Ada"
+    db.get(User, 1).full_name = "Changed without flush"
+    assert load_user_profile(db, 1).full_name == "Ada"
+
+
+def test_update_invalidates(db):
+    load_user_profile(db, 1)
+    db.get(User, 1).full_name = "Ada Lovelace"
+    db.commit()
+    assert load_user_profile(db, 1).full_name == "Ada Lovelace"
+
+
+def test_disabling_user_revokes_tokens(db):
+    load_user_profile(db, 1)
+    db.get(User, 1).is_active = False
+    db.commit()
+    assert load_user_profile(db, 1).is_active is False
+    assert token_cache.is_revoked(b"any", {"sub": "1", "iat": time.time() - 1})
+
+
+def test_entries_expire():
+    cache = UserProfileCache(maxsize=10, ttl_seconds=0)
+    cache.put(User(id=5, email="e@example.com", full_name="E", role="customer", is_active=True))
+    assert cache.get(5) is None
+
+
+def test_missing_user(db):
+    assert load_user_profile(db, 999) is None
+
+
+def test_invalidated_on_commit_not_flush(db, monkeypatch):
+    tokens = TokenCache(maxsize=10)
+    monkeypatch.setattr(user_profiles_module, "token_cache", tokens)
+    load_user_profile(db, 1)
+    user = db.get(User, 1)
+    user.full_name = "Ada Lovelace"
+    user.is_active = False
+    db.flush()
+    user_profiles.put(User(id=1, email="ada@example.com", full_name="Ada", role="customer", is_active=True))
+    db.rollback()
+    assert not tokens.is_revoked(b"any", {"sub": "1", "iat": time.time() - 1})
+    assert load_user_profile(db, 1).full_name == "Ada"  # nothing committed, nothing dropped
+
+    db.get(User, 1).full_name = "Ada Lovelace"
+    db.flush()
+    user_profiles.put(User(id=1, email="ada@example.com", full_name="Ada", role="customer", is_active=True))
+    db.commit()
+    assert load_user_profile(db, 1).full_name == "Ada Lovelace"
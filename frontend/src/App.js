@@ -20,6 +20,7 @@ import AdminLogin from "./pages/AdminLogin";
 import AdminDashboard from "./pages/AdminDashboard";
 import AdminOrders from "./pages/AdminOrders";
 import AdminOrderDetail from "./pages/AdminOrderDetail";
+import AdminReceipts from "./pages/AdminReceipts";
 import AdminProducts from "./pages/AdminProducts";
 import AdminPacks from "./pages/AdminPacks";
 
@@ -91,6 +92,14 @@ function App() {
                     </AdminRoute>
                   }
                 />
+                <Route
+                  path="/admin/receipts"
+                  element={
+                    <AdminRoute>
+                      <AdminReceipts />
+                    </AdminRoute>
+                  }
+                />
                 <Route
                   path="/admin/products"
                   element={
@@ -14,6 +14,14 @@ export const login = async (email, password) => {
 };
 
 export const logout = () => {
+  // End the session server-side too (best effort; local tokens go either way)
+  const accessToken = localStorage.getItem('access_token');
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (accessToken && refreshToken) {
+    client
+      .post('/auth/logout', { refresh_token: refreshToken }, { headers: { Authorization: `Bearer ${accessToken}` } })
+      .catch(() => {});
+  }
   localStorage.removeItem('access_token');
   localStorage.removeItem('refresh_token');
 };
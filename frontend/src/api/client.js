@@ -18,6 +18,29 @@ client.interceptors.request.use((config) => {
   return config;
 });
 
+// One refresh at a time: refresh tokens rotate, so parallel 401s must share
+// the same refresh call instead of each replaying the old token
+let refreshing = null;
+
+const refreshAccessToken = () => {
+  if (!refreshing) {
+    refreshing = axios
+      .post(`${API_BASE}/api/auth/refresh`, {
+        refresh_token: localStorage.getItem('refresh_token'),
+      })
+      .then((response) => {
+        const { access_token, refresh_token: newRefresh } = response.data;
+        localStorage.setItem('access_token', access_token);
+        localStorage.setItem('refresh_token', newRefresh);
+        return access_token;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+};
+
 // Handle token refresh on 401
 client.interceptors.response.use(
   (response) => response,
@@ -30,13 +53,7 @@ client.interceptors.response.use(
       const refreshToken = localStorage.getItem('refresh_token');
       if (refreshToken) {
         try {
-          const response = await axios.post(`${API_BASE}/api/auth/refresh`, {
-            refresh_token: refreshToken,
-          });
-          
-          const { access_token, refresh_token: newRefresh } = response.data;
-          localStorage.setItem('access_token', access_token);
-          localStorage.setItem('refresh_token', newRefresh);
+          const access_token = await refreshAccessToken();
           
           originalRequest.headers.Authorization = `Bearer ${access_token}`;
           return client(originalRequest);
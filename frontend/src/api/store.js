@@ -40,7 +40,44 @@ export const getOrder = async (orderId) => {
   return response.data;
 };
 
+const sha256Hex = async (file) => {
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+};
+
+// Fetched once per page load; a failed lookup is retried on the next upload
+let uploadCapabilities = null;
+const getUploadCapabilities = () => {
+  if (!uploadCapabilities) {
+    uploadCapabilities = client
+      .get('/uploads/capabilities')
+      .then((response) => response.data)
+      .catch(() => {
+        uploadCapabilities = null;
+        return { direct_upload: false };
+      });
+  }
+  return uploadCapabilities;
+};
+
+// PUT straight to the bucket when the API takes direct uploads, else multipart through the API
 export const uploadReceipt = async (orderId, file) => {
+  let upload = null;
+  if (window.crypto?.subtle && (await getUploadCapabilities()).direct_upload) {
+    const response = await client.post(`/orders/${orderId}/receipt/upload-url`, {
+      filename: file.name,
+      size: file.size,
+      sha256: await sha256Hex(file),
+    });
+    upload = response.data;
+  }
+  if (upload) {
+    const put = await fetch(upload.upload_url, { method: 'PUT', headers: upload.headers, body: file });
+    if (!put.ok) throw new Error(`Upload failed (${put.status})`);
+    const response = await client.post(`/orders/${orderId}/receipt/complete`, { upload_key: upload.upload_key });
+    return response.data;
+  }
+
   const formData = new FormData();
   formData.append('file', file);
   const response = await client.post(`/orders/${orderId}/receipt`, formData, {
@@ -60,6 +97,13 @@ export const adminGetOrders = async () => {
   return response.data;
 };
 
+// Review queue, oldest first; pass the previous page's next_cursor for more
+export const adminGetReceipts = async (status = 'submitted', cursor = null) => {
+  const params = { status, ...(cursor ? { cursor } : {}) };
+  const response = await client.get('/admin/receipts', { params });
+  return response.data;
+};
+
 export const adminGetOrder = async (orderId) => {
   const response = await client.get(`/admin/orders/${orderId}`);
   return response.data;
@@ -5,7 +5,7 @@ import { Badge } from '../components/ui/badge';
 import { Button } from '../components/ui/button';
 import { 
   Package, ShoppingBag, TrendingUp, 
-  ArrowRight, Clock, AlertCircle, Layers 
+  ArrowRight, Clock, AlertCircle, Layers, Receipt 
 } from 'lucide-react';
 import { adminGetOrders, adminGetProducts, formatPrice } from '../api/store';
 
@@ -206,7 +206,7 @@ const AdminDashboard = () => {
         </div>
 
         {/* Quick Actions */}
-        <div className="mt-8 grid grid-cols-2 md:grid-cols-5 gap-4">
+        <div className="mt-8 grid grid-cols-2 md:grid-cols-6 gap-4">
           <Button variant="outline" className="h-auto py-4" asChild>
             <Link to="/admin/orders" className="flex flex-col items-center gap-2">
               <Package className="w-6 h-6" />
@@ -237,6 +237,12 @@ const AdminDashboard = () => {
               <span>Pending Orders</span>
             </Link>
           </Button>
+          <Button variant="outline" className="h-auto py-4" asChild>
+            <Link to="/admin/receipts" className="flex flex-col items-center gap-2">
+              <Receipt className="w-6 h-6" />
+              <span>Review Receipts</span>
+            </Link>
+          </Button>
         </div>
       </div>
     </div>
@@ -16,7 +16,7 @@ import {
 } from '../components/ui/select';
 import { 
   ArrowLeft, Package, MapPin, Phone, Clock, User, Mail,
-  FileImage, CheckCircle, XCircle, Loader2, ExternalLink
+  FileImage, CheckCircle, XCircle, Loader2, ExternalLink, AlertTriangle
 } from 'lucide-react';
 import { 
   adminGetOrder, adminUpdateOrderStatus, adminUpdateReceipt, 
@@ -273,7 +273,38 @@ const AdminOrderDetail = () => {
                         {order.receipt.status}
                       </Badge>
                     </div>
+
+                    {order.receipt.reused_on_orders?.length > 0 && (
+                      <Alert variant="destructive" data-testid="receipt-reused-alert">
+                        <AlertTriangle className="w-4 h-4" />
+                        <AlertDescription>
+                          This file was also uploaded for{' '}
+                          {order.receipt.reused_on_orders.map((id, i) => (
+                            <React.Fragment key={id}>
+                              {i > 0 && ', '}
+                              <Link to={`/admin/orders/${id}`} className="underline">#{id}</Link>
+                            </React.Fragment>
+                          ))}
+                        </AlertDescription>
+                      </Alert>
+                    )}
                     
+                    {order.receipt.thumbnail_url && (
+                      <a
+                        href={order.receipt.preview_url || order.receipt.file_url}
+                        target="_blank"
+                        rel="noopener noreferrer"
+                        data-testid="receipt-preview-link"
+                      >
+                        <img
+                          src={order.receipt.thumbnail_url}
+                          alt="Receipt thumbnail"
+                          className="w-full max-h-64 object-contain rounded-lg border bg-muted"
+                          loading="lazy"
+                        />
+                      </a>
+                    )}
+
                     <Button 
                       variant="outline" 
                       className="w-full" 
@@ -0,0 +1,175 @@
+import React, { useState, useEffect } from 'react';
+import { Link } from 'react-router-dom';
+import { Card, CardContent, CardHeader } from '../components/ui/card';
+import { Badge } from '../components/ui/badge';
+import { Button } from '../components/ui/button';
+import {
+  Select,
+  SelectContent,
+  SelectItem,
+  SelectTrigger,
+  SelectValue,
+} from '../components/ui/select';
+import {
+  Table,
+  TableBody,
+  TableCell,
+  TableHead,
+  TableHeader,
+  TableRow,
+} from '../components/ui/table';
+import { ArrowLeft, Eye, FileText, Receipt } from 'lucide-react';
+import { adminGetReceipts, formatPrice } from '../api/store';
+
+const statusColors = {
+  submitted: 'bg-yellow-100 text-yellow-800',
+  approved: 'bg-green-100 text-green-800',
+  rejected: 'bg-red-100 text-red-800',
+};
+
+const AdminReceipts = () => {
+  const [receipts, setReceipts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [filterStatus, setFilterStatus] = useState('submitted');
+
+  useEffect(() => {
+    const loadReceipts = async () => {
+      setLoading(true);
+      try {
+        const data = await adminGetReceipts(filterStatus);
+        setReceipts(data.items);
+        setNextCursor(data.next_cursor);
+      } catch (error) {
+        console.error('Failed to load receipts:', error);
+      }
+      setLoading(false);
+    };
+    loadReceipts();
+  }, [filterStatus]);
+
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const data = await adminGetReceipts(filterStatus, nextCursor);
+      setReceipts((current) => [...current, ...data.items]);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Failed to load receipts:', error);
+    }
+    setLoadingMore(false);
+  };
+
+  return (
+    <div className="min-h-screen py-8 px-4 bg-secondary/30" data-testid="admin-receipts-page">
+      <div className="max-w-7xl mx-auto">
+        <div className="flex items-center gap-4 mb-6">
+          <Button variant="ghost" size="icon" asChild>
+            <Link to="/admin">
+              <ArrowLeft className="w-5 h-5" />
+            </Link>
+          </Button>
+          <div>
+            <h1 className="text-3xl font-bold">Receipts</h1>
+            <p className="text-muted-foreground">Review payment receipts, oldest first</p>
+          </div>
+        </div>
+
+        <Card>
+          <CardHeader>
+            <div className="flex justify-end">
+              <Select value={filterStatus} onValueChange={setFilterStatus}>
+                <SelectTrigger className="w-full sm:w-40" data-testid="receipt-status-filter">
+                  <SelectValue placeholder="Filter by status" />
+                </SelectTrigger>
+                <SelectContent>
+                  <SelectItem value="submitted">Awaiting Review</SelectItem>
+                  <SelectItem value="approved">Approved</SelectItem>
+                  <SelectItem value="rejected">Rejected</SelectItem>
+                </SelectContent>
+              </Select>
+            </div>
+          </CardHeader>
+          <CardContent>
+            {loading ? (
+              <div className="space-y-3">
+                {[1, 2, 3, 4, 5].map((i) => (
+                  <div key={i} className="h-16 bg-muted animate-pulse rounded"></div>
+                ))}
+              </div>
+            ) : receipts.length === 0 ? (
+              <div className="text-center py-12">
+                <Receipt className="w-16 h-16 mx-auto text-muted-foreground mb-4" />
+                <p className="text-muted-foreground">No receipts found</p>
+              </div>
+            ) : (
+              <div className="overflow-x-auto">
+                <Table>
+                  <TableHeader>
+                    <TableRow>
+                      <TableHead>Receipt</TableHead>
+                      <TableHead>Order</TableHead>
+                      <TableHead>Customer</TableHead>
+                      <TableHead>Uploaded</TableHead>
+                      <TableHead>Total</TableHead>
+                      <TableHead>Status</TableHead>
+                      <TableHead className="text-right">Actions</TableHead>
+                    </TableRow>
+                  </TableHeader>
+                  <TableBody>
+                    {receipts.map((receipt) => (
+                      <TableRow key={receipt.id} data-testid={`receipt-row-${receipt.id}`}>
+                        <TableCell>
+                          <a href={receipt.file_url} target="_blank" rel="noopener noreferrer">
+                            {receipt.thumbnail_url ? (
+                              <img
+                                src={receipt.thumbnail_url}
+                                alt={`Receipt for order #${receipt.order_id}`}
+                                className="w-16 h-16 object-cover rounded"
+                                loading="lazy"
+                              />
+                            ) : (
+                              <FileText className="w-8 h-8 text-muted-foreground" />
+                            )}
+                          </a>
+                        </TableCell>
+                        <TableCell className="font-medium">#{receipt.order_id}</TableCell>
+                        <TableCell>{receipt.customer_name || '-'}</TableCell>
+                        <TableCell>{new Date(receipt.uploaded_at).toLocaleString()}</TableCell>
+                        <TableCell className="font-semibold">{formatPrice(receipt.order_total)}</TableCell>
+                        <TableCell>
+                          <div className="flex gap-2">
+                            <Badge className={statusColors[receipt.status]}>{receipt.status}</Badge>
+                            {receipt.reused && <Badge variant="destructive">reused</Badge>}
+                          </div>
+                        </TableCell>
+                        <TableCell className="text-right">
+                          <Button variant="ghost" size="sm" asChild data-testid={`review-receipt-${receipt.id}`}>
+                            <Link to={`/admin/orders/${receipt.order_id}`}>
+                              <Eye className="w-4 h-4 mr-1" />
+                              Review
+                            </Link>
+                          </Button>
+                        </TableCell>
+                      </TableRow>
+                    ))}
+                  </TableBody>
+                </Table>
+                {nextCursor && (
+                  <div className="text-center mt-4">
+                    <Button variant="outline" onClick={loadMore} disabled={loadingMore} data-testid="load-more-receipts">
+                      {loadingMore ? 'Loading...' : 'Load more'}
+                    </Button>
+                  </div>
+                )}
+              </div>
+            )}
+          </CardContent>
+        </Card>
+      </div>
+    </div>
+  );
+};
+
+export default AdminReceipts;